@@ -6,9 +6,15 @@ partner_kpi.py의 정확한 NaN 비율 + 실제 상세 레코드를 모두 포
 
 import sys
 import os
+import re
 import json
+import gzip
+import hashlib
+import shutil
+import argparse
 import datetime
 from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor, as_completed
 import pandas as pd
 
 # 환경변수 로드 (python-dotenv 사용)
@@ -20,18 +26,56 @@ try:
 except ImportError:
     print("ℹ️ python-dotenv가 설치되지 않음 - 시스템 환경변수 사용")
 
+# 빠른 JSON 직렬화 / Brotli 압축 (선택, 없으면 표준 json / .gz만 생성)
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
 # 로컬 partner_kpi.py 파일 사용
 try:
     from partner_kpi import (
         load_json_files_from_drive,
-        clean_partner_name,
+        iter_drive_results,
+        iter_nan_facts,
+        build_nan_fact_table,
         generate_nan_details,
+        new_nan_ratio_totals,
+        add_nan_ratio_fact,
+        generate_nan_details_from_totals,
+        nan_stats_from_records,
+        drive_input_fingerprint,
+        source_fingerprint,
+        input_digest,
+        BUILD_CACHE,
         DRIVE_FOLDER_ID,
+        DRIVE_STREAMING,
     )
 except ImportError as e:
     print(f"Error importing partner_kpi module: {e}")
     sys.exit(1)
 
+# 백필 시 동시에 처리할 월 수 (프로세스 수)
+BACKFILL_WORKERS = int(os.getenv("BACKFILL_WORKERS", "4"))
+
+# 대시보드 데이터 폴더 / 월 목록 매니페스트
+DATA_DIR = "data"
+DATA_MANIFEST_FILE = "index.json"
+MONTH_FILE_PATTERN = re.compile(r"^nan_data_(\d{4})_(\d{2})_improved\.json$")
+
+# 압축 출력 모드: 공백 없는 JSON + 미리 압축한 .gz/.br 파일 함께 저장
+DATA_OUTPUT_COMPACT = os.getenv("DATA_OUTPUT_COMPACT", "false").lower() == "true"
+COMPRESSED_SUFFIXES = (".gz", ".br")
+
+# 요약/상세 분리 모드: 월별 파일에는 요약만, 주문별 상세 레코드는 주차별 샤드 파일로 저장
+DATA_DETAIL_SHARDS = os.getenv("DATA_DETAIL_SHARDS", "false").lower() == "true"
+DETAIL_DIR = "details"
+
 
 def setup_google_credentials():
     """
@@ -52,9 +96,12 @@ def setup_google_credentials():
         service_key = json.loads(service_key_json)
 
         # 임시 파일로 저장 (Google API 라이브러리가 파일 경로를 요구하는 경우)
+        # (백필 워커 프로세스가 동시에 읽을 수 있으므로 원자적으로 교체)
         temp_key_file = "/tmp/google_service_key.json"
-        with open(temp_key_file, "w") as f:
+        tmp_path = f"{temp_key_file}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as f:
             json.dump(service_key, f)
+        os.replace(tmp_path, temp_key_file)
 
         # 환경변수로 Google API에 인증 정보 전달
         os.environ["GOOGLE_APPLICATION_CREDENTIALS"] = temp_key_file
@@ -81,22 +128,236 @@ def setup_google_credentials():
         return False
 
 
-def clear_cache():
-    """캐시 초기화"""
-    try:
-        import partner_kpi as kpi_module
+def clear_cache(include_disk=False):
+    """캐시 초기화 (include_disk=True면 Drive 디스크 캐시까지 삭제)"""
+    import partner_kpi as kpi_module
+
+    kpi_module.invalidate_json_cache()
+    if include_disk:
+        kpi_module.clear_drive_cache()
+    print("🗑️ 캐시 초기화 완료")
+
+
+# 역할(mech/elec)별 주차 집계 대상 협력사
+ROLE_PARTNERS = {
+    "mech": ["BAT", "FNI", "TMS(M)"],
+    "elec": ["C&A", "P&S", "TMS(E)"],
+}
+# 원본 협력사명이 "TMS"인 경우 역할별 매핑
+TMS_PARTNER_BY_ROLE = {"mech": "TMS(M)", "elec": "TMS(E)"}
+# 저장 시 orders 테이블로 분리하는 상세 레코드의 오더 정보 필드
+ORDER_FIELDS = ("order_no", "model_name", "order_href")
+
+
+def new_weekly_aggregate():
+    """주차별 NaN 스트리밍 집계 상태 생성"""
+    return {
+        "week_of_date": {},  # file_date → (week_key, week_num, weekday) 메모
+        "weekly_stats": {},  # week_key → 주차 기본 구조 (최초 등장 순서)
+        "buckets": {},  # (week_key, role, partner) → tasks/nan_count/orders
+        "partner_weeks": defaultdict(dict),  # partner → 기여한 week_key (등장 순서)
+        "last_record_no": None,
+        "duplicates": 0,  # 여러 스냅샷에 중복 등장해 제외한 이전 스냅샷 레코드 수
+    }
+
+
+def _lookup_week(aggregate, file_date_str):
+    """file_date → 주차 정보 (날짜당 1회만 계산, 형식 오류는 None)"""
+    week_of_date = aggregate["week_of_date"]
+    if file_date_str not in week_of_date:
+        try:
+            file_date = datetime.datetime.strptime(file_date_str, "%Y-%m-%d").date()
+        except (TypeError, ValueError):
+            week_of_date[file_date_str] = None
+        else:
+            week_num = file_date.isocalendar()[1]
+            week_of_date[file_date_str] = (
+                f"{week_num}주차",
+                week_num,
+                file_date.strftime("%A"),
+            )
+    return week_of_date[file_date_str]
+
+
+def add_nan_fact(aggregate, fact):
+    """NaN 팩트(레코드×역할) 1건을 주차별 집계에 반영"""
+    week = _lookup_week(aggregate, fact.file_date)
+    if week is None:
+        return
+    week_key, week_num, weekday = week
+
+    weekly = aggregate["weekly_stats"].get(week_key)
+    if weekly is None:
+        is_sunday_data = week_num >= 33
+        weekly = aggregate["weekly_stats"][week_key] = {
+            "week_number": week_num,
+            "date": fact.file_date,
+            "weekday": weekday,
+            "is_sunday_data": is_sunday_data,
+            "data_source": "일요일" if is_sunday_data else "금요일",
+            "total_records": 0,
+            "partners": {role: {} for role in ROLE_PARTNERS},
+        }
 
-        kpi_module._cached_json_data = None
-        print("🗑️ 캐시 초기화 완료")
-    except:
-        pass
+    # 같은 레코드의 역할별 팩트는 연속으로 들어오므로 레코드 수는 한 번만 증가
+    if fact.record_no != aggregate["last_record_no"]:
+        aggregate["last_record_no"] = fact.record_no
+        weekly["total_records"] += 1
 
+    partner = fact.partner
+    if fact.partner_raw == "TMS":
+        partner = TMS_PARTNER_BY_ROLE.get(fact.role, partner)
+    if partner not in ROLE_PARTNERS.get(fact.role, ()) or pd.isna(fact.ratio):
+        return
 
-def create_final_nan_data(year_month="2025-08"):
+    total_tasks = fact.total_tasks
+    nan_count = int(total_tasks * fact.ratio / 100) if total_tasks > 0 else 0
+
+    bucket = aggregate["buckets"].setdefault(
+        (week_key, fact.role, partner),
+        {"total_tasks": 0, "nan_count": 0, "orders": {}},
+    )
+
+    # (주차, 역할, 협력사, 오더) 해시 인덱스: 이전 스냅샷은 partner_kpi.iter_nan_facts()에서
+    # 이미 제외되므로, 같은 키가 다시 오면 먼저 반영한(최신) 값을 유지
+    order_key = fact.order_no or ("record", fact.record_no)
+    if order_key in bucket["orders"]:
+        return
+    bucket["total_tasks"] += total_tasks
+    bucket["nan_count"] += nan_count
+    bucket["orders"][order_key] = {
+        "order_no": fact.order_no,
+        "model_name": fact.model_name,
+        "nan_count": nan_count,
+        "total_tasks": total_tasks,
+        "nan_ratio": fact.ratio,
+        "order_href": fact.order_href,
+    }
+    aggregate["partner_weeks"][partner].setdefault(week_key, None)
+
+
+def _bucket_records(bucket):
+    """집계 버킷의 오더 중 실제 NaN이 있는 상세 레코드 목록"""
+    return [order for order in bucket["orders"].values() if order["nan_ratio"] > 0]
+
+
+def finalize_weekly_aggregate(aggregate, nan_details):
+    """
+    집계 결과에 nan_details의 정확한 비율을 적용해 (weekly_stats, partner_summary) 반환.
+    nan_details에 비율이 있는 주차의 협력사만 weekly_stats/partner_summary에 포함한다.
+    """
+    weekly_stats = aggregate["weekly_stats"]
+    buckets = aggregate["buckets"]
+    partner_roles = {
+        partner: role for role, partners in ROLE_PARTNERS.items() for partner in partners
+    }
+    partner_summary = {}
+
+    for partner, details in nan_details.items():
+        role = partner_roles.get(partner)
+        if role is None:
+            continue
+
+        # 주차별 정확한 비율 (같은 주차 중복 시 마지막 값)
+        week_ratios = {}
+        monthly_avg_ratio = None
+        for item in details:
+            if item["week"] == "월평균":
+                if monthly_avg_ratio is None:
+                    monthly_avg_ratio = item["ratio"]
+                continue
+            week_key = item["week"].replace("W", "주차")
+            if week_key in weekly_stats:
+                week_ratios[week_key] = item["ratio"]
+
+        for week_key, ratio in week_ratios.items():
+            bucket = buckets.get(
+                (week_key, role, partner),
+                {"total_tasks": 0, "nan_count": 0, "orders": {}},
+            )
+            weekly_stats[week_key]["partners"][role][partner] = {
+                "total_tasks": bucket["total_tasks"],
+                "nan_count": bucket["nan_count"],
+                "nan_ratio": ratio,
+                "records": _bucket_records(bucket),
+            }
+
+        # 협력사별 전체 요약
+        summary = {"total_tasks": 0, "nan_count": 0, "weeks": {}}
+        for week_key in aggregate["partner_weeks"].get(partner, {}):
+            if week_key not in week_ratios:
+                continue
+            bucket = buckets[(week_key, role, partner)]
+            summary["total_tasks"] += bucket["total_tasks"]
+            summary["nan_count"] += bucket["nan_count"]
+            summary["weeks"][week_key] = {
+                "nan_count": bucket["nan_count"],
+                "total_tasks": bucket["total_tasks"],
+            }
+        summary["nan_ratio"] = 0.0 if monthly_avg_ratio is None else monthly_avg_ratio
+        partner_summary[partner] = summary
+
+    return weekly_stats, partner_summary
+
+
+def _count_records(records, counter):
+    """레코드 스트림을 그대로 넘기면서 개수를 counter["records"]에 기록"""
+    for record in records:
+        counter["records"] += 1
+        yield record
+
+
+def aggregate_nan_records(records, aggregate, streaming=False):
+    """
+    Drive 레코드를 주차별 집계(aggregate)에 반영하고 (nan_details, 로드한 레코드 수) 반환
+    같은 주차·오더의 이전 스냅샷은 partner_kpi.iter_nan_facts()가 제외하므로(제외 수는
+    aggregate["duplicates"]) 주차별 NaN 비율·tasks/nan_count/상세 레코드와 KPI 페이지의
+    월별 비율이 같은 팩트에서 나온다 (레코드가 없으면 nan_details는 None)
+    streaming=True면 레코드를 하나씩 누적 (월 전체 목록/팩트 테이블 없음)
+    """
+    counter = {"records": 0}
+    records = _count_records(records, counter)
+
+    if streaming:
+        nan_totals = new_nan_ratio_totals()
+        for fact in iter_nan_facts(records, aggregate):
+            try:
+                add_nan_ratio_fact(nan_totals, fact)
+                add_nan_fact(aggregate, fact)
+            except Exception as e:
+                print(f"⚠️ 레코드 처리 중 오류: {e}")
+                continue
+        if not counter["records"]:
+            return None, 0
+        return generate_nan_details_from_totals(nan_totals), counter["records"]
+
+    records = list(records)
+    if not counter["records"]:
+        return None, 0
+
+    # Drive 결과를 NaN 팩트 테이블(레코드×역할)로 한 번만 정규화
+    nan_facts = build_nan_fact_table(records, aggregate)
+    # partner_kpi.py의 정확한 NaN 비율
+    nan_details = generate_nan_details(nan_facts)
+    # 레코드를 한 번씩 흘려보내며 주차별 tasks 수와 상세 레코드 집계
+    for fact in nan_facts.itertuples(index=False):
+        try:
+            add_nan_fact(aggregate, fact)
+        except Exception as e:
+            print(f"⚠️ 레코드 처리 중 오류: {e}")
+            continue
+    return nan_details, counter["records"]
+
+
+def create_final_nan_data(year_month="2025-08", streaming=None, refresh_listing=True):
     """
     partner_kpi.py의 정확한 NaN 비율 + 실제 상세 레코드를 포함한 최종 데이터 생성
+    streaming=True면 Drive 결과를 파일별로 스트리밍 파싱해 레코드 단위로 집계 (기본값 DRIVE_STREAMING)
+    refresh_listing=False면 Drive 목록을 다시 조회하지 않고 로컬 카탈로그 사용 (백필)
     """
     print(f"🔍 {year_month} 최종 NaN 데이터 생성 시작...")
+    if streaming is None:
+        streaming = DRIVE_STREAMING
 
     # Google 인증 설정
     if not setup_google_credentials():
@@ -104,226 +365,47 @@ def create_final_nan_data(year_month="2025-08"):
         return None
 
     try:
-        # 기존 검증된 함수로 JSON 데이터 로드
-        json_data = load_json_files_from_drive(year_month)
-        print(f"📊 총 {len(json_data)}개의 레코드 로드")
+        aggregate = new_weekly_aggregate()
 
-        if not json_data:
+        if streaming:
+            # 레코드를 하나씩 NaN 비율 누적/주차별 집계에 바로 반영 (월 전체 목록 없음)
+            records = iter_drive_results(year_month, refresh_listing=refresh_listing)
+        else:
+            # 기존 검증된 함수로 JSON 데이터 로드
+            records = load_json_files_from_drive(
+                year_month, refresh_listing=refresh_listing
+            )
+        nan_details, total_records = aggregate_nan_records(
+            records, aggregate, streaming=streaming
+        )
+        print(f"📊 총 {total_records}개의 레코드 로드")
+        if not total_records:
             print("❌ 데이터가 없습니다.")
             return None
-
-        # 1. partner_kpi.py의 정확한 NaN 비율 가져오기
-        nan_details = generate_nan_details(json_data)
         print(f"✅ partner_kpi.py 정확한 NaN 비율 가져오기 완료")
 
-        # 2. 실제 상세 레코드 추출
-        weekly_stats = {}
-        partner_summary = defaultdict(
-            lambda: {"total_tasks": 0, "nan_count": 0, "weeks": {}}
+        # 3. nan_details의 정확한 비율을 적용해 주차별/협력사별 결과 생성
+        weekly_stats, partner_summary = finalize_weekly_aggregate(
+            aggregate, nan_details
         )
 
-        # 먼저 주차별 기본 구조 생성
-        for record in json_data:
-            file_date_str = record.get("file_date", "")
-            if not file_date_str:
-                continue
-
-            file_date = datetime.datetime.strptime(file_date_str, "%Y-%m-%d").date()
-            week_num = file_date.isocalendar()[1]
-            week_key = f"{week_num}주차"
-            weekday = file_date.strftime("%A")
-            is_sunday_data = week_num >= 33
-
-            if week_key not in weekly_stats:
-                weekly_stats[week_key] = {
-                    "week_number": week_num,
-                    "date": file_date_str,
-                    "weekday": weekday,
-                    "is_sunday_data": is_sunday_data,
-                    "data_source": "일요일" if is_sunday_data else "금요일",
-                    "total_records": 0,
-                    "partners": {"mech": {}, "elec": {}},
-                }
-
-        # 3. nan_details의 정확한 비율을 weekly_stats에 적용
-        for partner, details in nan_details.items():
-            if partner in ["BAT", "FNI", "TMS(M)", "C&A", "P&S", "TMS(E)"]:
-                partner_type = "mech" if partner in ["BAT", "FNI", "TMS(M)"] else "elec"
-
-                # 월평균 비율 설정
-                monthly_avg_ratio = 0.0
-                for item in details:
-                    if item["week"] == "월평균":
-                        monthly_avg_ratio = item["ratio"]
-                        break
-                partner_summary[partner]["nan_ratio"] = monthly_avg_ratio
-
-                # 주차별 정확한 비율 설정
-                for item in details:
-                    if item["week"] != "월평균":
-                        week_key = item["week"].replace("W", "주차")
-
-                        if week_key in weekly_stats:
-                            if (
-                                partner
-                                not in weekly_stats[week_key]["partners"][partner_type]
-                            ):
-                                weekly_stats[week_key]["partners"][partner_type][
-                                    partner
-                                ] = {
-                                    "total_tasks": 0,
-                                    "nan_count": 0,
-                                    "nan_ratio": 0.0,
-                                    "records": [],
-                                }
-
-                            # 정확한 NaN 비율 설정
-                            weekly_stats[week_key]["partners"][partner_type][partner][
-                                "nan_ratio"
-                            ] = item["ratio"]
-
-        # 4. 실제 상세 레코드와 tasks 수 계산
-        for record in json_data:
-            try:
-                file_date_str = record.get("file_date", "")
-                if not file_date_str:
-                    continue
-
-                file_date = datetime.datetime.strptime(file_date_str, "%Y-%m-%d").date()
-                week_num = file_date.isocalendar()[1]
-                week_key = f"{week_num}주차"
-
-                if week_key not in weekly_stats:
-                    continue
-
-                weekly_stats[week_key]["total_records"] += 1
-
-                # 기구 협력사 처리
-                mech_partner_raw = record.get("mech_partner", "")
-                mech_partner = clean_partner_name(mech_partner_raw, mode="mech")
-
-                # TMS 특별 처리: "TMS"를 "TMS(M)"으로 매핑
-                if mech_partner_raw == "TMS":
-                    mech_partner = "TMS(M)"
-
-                if (
-                    mech_partner
-                    and mech_partner in weekly_stats[week_key]["partners"]["mech"]
-                ):
-                    ratios = record.get("ratios", {})
-                    mech_nan_ratio = ratios.get("mech_nan_ratio", 0.0)
-                    total_tasks = record.get("total_tasks", 0)
-                    nan_count = (
-                        int(total_tasks * mech_nan_ratio / 100)
-                        if total_tasks > 0
-                        else 0
-                    )
-
-                    partner_data = weekly_stats[week_key]["partners"]["mech"][
-                        mech_partner
-                    ]
-                    partner_data["total_tasks"] += total_tasks
-                    partner_data["nan_count"] += nan_count
-
-                    # 실제 NaN이 있는 경우 상세 레코드 추가
-                    if mech_nan_ratio > 0:
-                        links = record.get("links", {})
-                        partner_data["records"].append(
-                            {
-                                "order_no": record.get("order_no", ""),
-                                "model_name": record.get("model_name", ""),
-                                "nan_count": nan_count,
-                                "total_tasks": total_tasks,
-                                "nan_ratio": mech_nan_ratio,
-                                "order_href": links.get("order_href", ""),
-                            }
-                        )
-
-                    # 협력사별 전체 요약 업데이트
-                    partner_summary[mech_partner]["total_tasks"] += total_tasks
-                    partner_summary[mech_partner]["nan_count"] += nan_count
-                    if week_key not in partner_summary[mech_partner]["weeks"]:
-                        partner_summary[mech_partner]["weeks"][week_key] = {
-                            "nan_count": 0,
-                            "total_tasks": 0,
-                        }
-                    partner_summary[mech_partner]["weeks"][week_key][
-                        "nan_count"
-                    ] += nan_count
-                    partner_summary[mech_partner]["weeks"][week_key][
-                        "total_tasks"
-                    ] += total_tasks
-
-                # 전장 협력사 처리 (동일한 방식)
-                elec_partner_raw = record.get("elec_partner", "")
-                elec_partner = clean_partner_name(elec_partner_raw, mode="elec")
-
-                # TMS 특별 처리: "TMS"를 "TMS(E)"로 매핑
-                if elec_partner_raw == "TMS":
-                    elec_partner = "TMS(E)"
-
-                if (
-                    elec_partner
-                    and elec_partner in weekly_stats[week_key]["partners"]["elec"]
-                ):
-                    ratios = record.get("ratios", {})
-                    elec_nan_ratio = ratios.get("elec_nan_ratio", 0.0)
-                    total_tasks = record.get("total_tasks", 0)
-                    nan_count = (
-                        int(total_tasks * elec_nan_ratio / 100)
-                        if total_tasks > 0
-                        else 0
-                    )
-
-                    partner_data = weekly_stats[week_key]["partners"]["elec"][
-                        elec_partner
-                    ]
-                    partner_data["total_tasks"] += total_tasks
-                    partner_data["nan_count"] += nan_count
-
-                    if elec_nan_ratio > 0:
-                        links = record.get("links", {})
-                        partner_data["records"].append(
-                            {
-                                "order_no": record.get("order_no", ""),
-                                "model_name": record.get("model_name", ""),
-                                "nan_count": nan_count,
-                                "total_tasks": total_tasks,
-                                "nan_ratio": elec_nan_ratio,
-                                "order_href": links.get("order_href", ""),
-                            }
-                        )
-
-                    partner_summary[elec_partner]["total_tasks"] += total_tasks
-                    partner_summary[elec_partner]["nan_count"] += nan_count
-                    if week_key not in partner_summary[elec_partner]["weeks"]:
-                        partner_summary[elec_partner]["weeks"][week_key] = {
-                            "nan_count": 0,
-                            "total_tasks": 0,
-                        }
-                    partner_summary[elec_partner]["weeks"][week_key][
-                        "nan_count"
-                    ] += nan_count
-                    partner_summary[elec_partner]["weeks"][week_key][
-                        "total_tasks"
-                    ] += total_tasks
-
-            except Exception as e:
-                print(f"⚠️ 레코드 처리 중 오류: {e}")
-                continue
-
         result = {
             "extracted_at": datetime.datetime.now().isoformat(),
             "period": year_month,
-            "total_records": len(json_data),
+            "total_records": total_records,
             "weekly_stats": weekly_stats,
-            "partner_summary": dict(partner_summary),
+            "partner_summary": partner_summary,
             "metadata": {
                 "data_source_logic": "33주차부터 일요일, 32주차 이하 금요일",
                 "weeks_analyzed": list(weekly_stats.keys()),
                 "extraction_method": "final_accurate_with_details",
-                "nan_ratios_from": "partner_kpi_generate_nan_details",
+                "nan_ratios_from": (
+                    "partner_kpi_generate_nan_details_from_totals"
+                    if streaming
+                    else "partner_kpi_generate_nan_details"
+                ),
                 "records_from": "original_json_data",
+                "duplicate_orders_merged": aggregate["duplicates"],
             },
         }
 
@@ -343,6 +425,8 @@ def create_final_nan_data(year_month="2025-08"):
                 print(f"  {week}: {week_records}개 상세 레코드")
 
         print(f"📋 전체 상세 레코드 수: {total_detailed_records}개")
+        if aggregate["duplicates"]:
+            print(f"🔁 중복 스냅샷 오더 제외: {aggregate['duplicates']}건 (최신 스냅샷 유지)")
 
         # BAT 주차별 비율 확인
         print(f"\\n🎯 BAT 주차별 비율 검증:")
@@ -361,31 +445,567 @@ def create_final_nan_data(year_month="2025-08"):
         return None
 
 
-def save_final_data(data, year_month):
-    """최종 데이터를 파일로 저장"""
+def month_data_filename(year_month):
+    """월별 최종 데이터 파일명 (예: 2025-08 → nan_data_2025_08_improved.json)"""
+    return f"nan_data_{year_month.replace('-', '_')}_improved.json"
+
+
+def dumps_json(data, compact=False):
+    """JSON 직렬화 → UTF-8 바이트 (compact면 공백 없이, orjson이 있으면 orjson 사용)"""
+    if not compact:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+    if orjson is not None:
+        try:
+            return orjson.dumps(data, option=orjson.OPT_SERIALIZE_NUMPY)
+        except TypeError:
+            pass  # orjson이 처리하지 못하는 타입은 표준 json으로 처리
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def _write_bytes_atomic(filepath, content):
+    """임시 파일에 쓴 뒤 교체해 중간에 실패해도 기존 파일이 깨지지 않도록 저장 (내용이 같으면 쓰지 않음)"""
+    try:
+        with open(filepath, "rb") as f:
+            if f.read() == content:
+                return
+    except OSError:
+        pass
+    tmp_path = f"{filepath}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(content)
+    os.replace(tmp_path, filepath)
+
+
+def _write_json_atomic(filepath, data, compact=False):
+    """
+    JSON 파일 원자적 저장
+    compact면 .gz(+ brotli 설치 시 .br) 사본도 함께 저장하고, 아니면 이전 압축 사본 제거
+    """
+    content = dumps_json(data, compact=compact)
+    _write_bytes_atomic(filepath, content)
+
+    compressed = {}
+    if compact:
+        # mtime=0: 내용이 같으면 .gz 바이트도 같아 불필요한 커밋 diff가 생기지 않음
+        compressed[".gz"] = gzip.compress(content, compresslevel=9, mtime=0)
+        if brotli is not None:
+            compressed[".br"] = brotli.compress(content)
+    for suffix in COMPRESSED_SUFFIXES:
+        if suffix in compressed:
+            _write_bytes_atomic(filepath + suffix, compressed[suffix])
+        elif os.path.exists(filepath + suffix):
+            os.remove(filepath + suffix)  # 원본과 내용이 달라진 사본이 서빙되지 않도록
+    return content
+
+
+def _order_ref_records(records, orders, order_ids):
+    """상세 레코드 목록 → orders 테이블 id(order)를 참조하는 레코드 목록 (orders/order_ids 누적)"""
+    rows = []
+    for record in records:
+        key = tuple(record.get(field) for field in ORDER_FIELDS)
+        order_id = order_ids.get(key)
+        if order_id is None:
+            order_id = order_ids[key] = len(orders)
+            orders.append(dict(zip(ORDER_FIELDS, key)))
+        row = {"order": order_id}
+        row.update(
+            (field, value) for field, value in record.items() if field not in ORDER_FIELDS
+        )
+        rows.append(row)
+    return rows
+
+
+def normalize_orders(data):
+    """
+    월별 데이터 또는 상세 샤드의 상세 레코드를 orders 테이블 + id 참조로 바꾼 사본 반환
+    (월별 데이터: weekly_stats[주차].partners[역할][협력사].records, 샤드: partners[역할][협력사])
+    """
+    orders, order_ids = [], {}
+    normalized = dict(data)
+    if "weekly_stats" in data:
+        normalized["weekly_stats"] = {}
+        for week, stats in data["weekly_stats"].items():
+            week_stats = dict(stats)
+            week_stats["partners"] = {}
+            for role, role_partners in stats["partners"].items():
+                week_stats["partners"][role] = {}
+                for partner, partner_stats in role_partners.items():
+                    partner_stats = dict(partner_stats)
+                    if "records" in partner_stats:
+                        partner_stats["records"] = _order_ref_records(
+                            partner_stats["records"], orders, order_ids
+                        )
+                    week_stats["partners"][role][partner] = partner_stats
+            normalized["weekly_stats"][week] = week_stats
+    else:
+        normalized["partners"] = {
+            role: {
+                partner: _order_ref_records(records, orders, order_ids)
+                for partner, records in role_partners.items()
+            }
+            for role, role_partners in data["partners"].items()
+        }
+    normalized["orders"] = orders
+    return normalized
+
+
+def detail_shard_dir(year_month):
+    """월별 상세 샤드 폴더 (data 폴더 기준 상대 경로, 예: details/2025_08)"""
+    return f"{DETAIL_DIR}/{year_month.replace('-', '_')}"
+
+
+def split_detail_shards(data, year_month):
+    """
+    최종 데이터를 요약 + 주차별 상세 샤드로 분리 → (요약, {상대 경로: 샤드})
+    요약의 협력사 항목은 records 대신 record_count를 갖고, 상세가 있는 주차만 detail 경로를 참조
+    """
+    summary = dict(data)
+    summary["weekly_stats"] = {}
+    shards = {}
+    for week, stats in data["weekly_stats"].items():
+        week_summary = dict(stats)
+        week_summary["partners"] = {}
+        shard_partners = {}
+        for role, role_partners in stats["partners"].items():
+            week_summary["partners"][role] = {}
+            for partner, partner_stats in role_partners.items():
+                records = partner_stats.get("records", [])
+                partner_summary = {
+                    key: value for key, value in partner_stats.items() if key != "records"
+                }
+                partner_summary["record_count"] = len(records)
+                week_summary["partners"][role][partner] = partner_summary
+                if records:
+                    shard_partners.setdefault(role, {})[partner] = records
+
+        if shard_partners:
+            path = f"{detail_shard_dir(year_month)}/week_{stats['week_number']:02d}.json"
+            shards[path] = {"period": year_month, "week": week, "partners": shard_partners}
+            week_summary["detail"] = {"file": path}
+        summary["weekly_stats"][week] = week_summary
+
+    summary["metadata"] = dict(data.get("metadata") or {}, detail_shards=True)
+    return summary, shards
+
+
+def _write_detail_shards(summary, shards, compact=False, data_dir=DATA_DIR):
+    """상세 샤드 저장 후 요약의 detail 항목에 버전(sha256 앞 12자리)과 압축 사본 경로 기록"""
+    details = {
+        stats["detail"]["file"]: stats["detail"]
+        for stats in summary["weekly_stats"].values()
+        if "detail" in stats
+    }
+    for path, shard in shards.items():
+        filepath = os.path.join(data_dir, *path.split("/"))
+        os.makedirs(os.path.dirname(filepath), exist_ok=True)
+        content = _write_json_atomic(filepath, shard, compact=compact)
+        details[path]["sha256"] = hashlib.sha256(content).hexdigest()[:12]
+        if compact:
+            details[path]["gz"] = path + ".gz"
+
+
+def _prune_detail_shards(year_month, keep_paths, data_dir=DATA_DIR):
+    """요약에서 더 이상 참조하지 않는 해당 월 상세 샤드(압축 사본 포함) 삭제"""
+    month_dir = os.path.join(data_dir, *detail_shard_dir(year_month).split("/"))
+    if not os.path.isdir(month_dir):
+        return
+    if not keep_paths:
+        shutil.rmtree(month_dir)
+        return
+    keep_names = set()
+    for path in keep_paths:
+        name = path.rsplit("/", 1)[-1]
+        keep_names.update([name] + [name + suffix for suffix in COMPRESSED_SUFFIXES])
+    for name in os.listdir(month_dir):
+        if name not in keep_names:
+            os.remove(os.path.join(month_dir, name))
+
+
+def update_data_manifest(data_dir=DATA_DIR):
+    """
+    data 폴더의 월별 파일을 스캔해 대시보드용 index.json 매니페스트 갱신
+    (월, 파일명, 바이트 크기, sha256, extracted_at / 월 오름차순)
+    """
+    months = []
+    for name in sorted(os.listdir(data_dir)):
+        match = MONTH_FILE_PATTERN.match(name)
+        if not match:
+            continue
+        with open(os.path.join(data_dir, name), "rb") as f:
+            content = f.read()
+        try:
+            extracted_at = json.loads(content.decode("utf-8")).get("extracted_at")
+        except ValueError:
+            extracted_at = None
+        entry = {
+            "month": f"{match.group(1)}-{match.group(2)}",
+            "file": name,
+            "bytes": len(content),
+            "sha256": hashlib.sha256(content).hexdigest(),
+            "extracted_at": extracted_at,
+        }
+        # 미리 압축된 사본 (대시보드가 지원 시 우선 사용)
+        for suffix in COMPRESSED_SUFFIXES:
+            compressed_path = os.path.join(data_dir, name + suffix)
+            if os.path.exists(compressed_path):
+                entry[suffix.lstrip(".")] = {
+                    "file": name + suffix,
+                    "bytes": os.path.getsize(compressed_path),
+                }
+        months.append(entry)
+
+    manifest_path = os.path.join(data_dir, DATA_MANIFEST_FILE)
+    _write_json_atomic(manifest_path, {"months": months})
+    print(f"🗂️ 월 목록 매니페스트 갱신: {manifest_path} ({len(months)}개월)")
+    return months
+
+
+def save_final_data(data, year_month, compact=None, shards=None):
+    """
+    최종 데이터를 파일로 저장하고 월 목록 매니페스트 갱신
+    compact/shards=None이면 DATA_OUTPUT_COMPACT/DATA_DETAIL_SHARDS 환경변수 설정을 따름
+    """
     if not data:
         print("❌ 저장할 데이터가 없습니다.")
         return False
 
     try:
-        filename = f"nan_data_{year_month.replace('-', '_')}_improved.json"
-        filepath = f"data/{filename}"
-        with open(filepath, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        print(f"💾 최종 데이터 저장 완료: {filepath}")
+        filepath = os.path.join(DATA_DIR, month_data_filename(year_month))
+        compact = DATA_OUTPUT_COMPACT if compact is None else compact
+        shards = DATA_DETAIL_SHARDS if shards is None else shards
+        detail_shards = {}
+        if shards:
+            # 샤드를 먼저 저장해 요약이 없는 파일을 가리키는 순간이 없도록 함
+            data, detail_shards = split_detail_shards(data, year_month)
+            detail_shards = {
+                path: normalize_orders(shard) for path, shard in detail_shards.items()
+            }
+            _write_detail_shards(data, detail_shards, compact=compact, data_dir=DATA_DIR)
+            shard_dir = f"{DATA_DIR}/{detail_shard_dir(year_month)}"
+            print(f"🧩 주차별 상세 샤드 {len(detail_shards)}개 저장: {shard_dir}")
+        else:
+            data = normalize_orders(data)
+        _write_json_atomic(filepath, data, compact=compact)
+        _prune_detail_shards(year_month, detail_shards, data_dir=DATA_DIR)
+        print(f"💾 최종 데이터 저장 완료: {filepath}" + (" (+ 압축 사본)" if compact else ""))
+        update_data_manifest(DATA_DIR)
         return True
     except Exception as e:
         print(f"❌ 파일 저장 중 오류: {e}")
         return False
 
 
+def stored_input_digest(year_month):
+    """저장된 월별 파일 metadata의 input_digest (파일이 없거나 기록이 없으면 None)"""
+    filepath = os.path.join(DATA_DIR, month_data_filename(year_month))
+    try:
+        with open(filepath, "r", encoding="utf-8") as f:
+            return (json.load(f).get("metadata") or {}).get("input_digest")
+    except (OSError, ValueError):
+        return None
+
+
+def month_input_digest(year_month, compact, shards, refresh_listing=True):
+    """월별 최종 데이터 입력 다이제스트 (Drive 대상 파일 id/체크섬 + 출력 옵션 + 생성 코드)"""
+    return input_digest(
+        {
+            "month": year_month,
+            "drive": drive_input_fingerprint(year_month, refresh_listing=refresh_listing),
+            "output": {"compact": compact, "shards": shards},
+            "code": source_fingerprint("create_final_data.py", "partner_kpi.py"),
+        }
+    )
+
+
+def build_final_data(
+    year_month,
+    streaming=None,
+    refresh_listing=True,
+    compact=None,
+    shards=None,
+    force=False,
+):
+    """
+    월별 최종 데이터 빌드 → "built" / "unchanged" / None(실패)
+    입력 다이제스트가 저장된 파일의 metadata.input_digest와 같으면 생성/저장 없이 "unchanged"
+    (BUILD_CACHE=false 또는 force=True면 항상 생성)
+    """
+    compact = DATA_OUTPUT_COMPACT if compact is None else compact
+    shards = DATA_DETAIL_SHARDS if shards is None else shards
+
+    digest = None
+    if setup_google_credentials():
+        try:
+            digest = month_input_digest(year_month, compact, shards, refresh_listing)
+            refresh_listing = False  # Drive 목록은 방금 받았으므로 생성 시 카탈로그 사용
+        except Exception as e:
+            print(f"⚠️ 입력 다이제스트 계산 실패, 캐시 없이 생성합니다: {e}")
+    if BUILD_CACHE and not force and digest and stored_input_digest(year_month) == digest:
+        print(f"⏭️ {year_month} 입력 변경 없음 - 생성/저장 건너뜀 ({digest[:12]})")
+        return "unchanged"
+
+    final_data = create_final_nan_data(
+        year_month, streaming=streaming, refresh_listing=refresh_listing
+    )
+    if not final_data:
+        return None
+    if digest:
+        final_data["metadata"]["input_digest"] = digest
+    if not save_final_data(final_data, year_month, compact=compact, shards=shards):
+        return None
+    return "built"
+
+
+def month_range(start_month, end_month):
+    """start_month ~ end_month (YYYY-MM, 양 끝 포함) 월 목록"""
+    start = datetime.datetime.strptime(start_month, "%Y-%m")
+    end = datetime.datetime.strptime(end_month, "%Y-%m")
+    months = []
+    year, month = start.year, start.month
+    while (year, month) <= (end.year, end.month):
+        months.append(f"{year}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return months
+
+
+def _init_backfill_worker():
+    """백필 워커 프로세스 초기화 (부모 프로세스의 Google 클라이언트/연결을 공유하지 않음)"""
+    import partner_kpi as kpi_module
+
+    kpi_module.reset_google_clients()
+
+
+def _backfill_month(
+    year_month,
+    streaming=None,
+    refresh_listing=False,
+    compact=None,
+    shards=None,
+    force=False,
+):
+    """백필 워커: 한 달 데이터 빌드 (입력이 같으면 건너뜀) → (연도-월, 성공 여부)"""
+    status = build_final_data(
+        year_month,
+        streaming=streaming,
+        refresh_listing=refresh_listing,
+        compact=compact,
+        shards=shards,
+        force=force,
+    )
+    return year_month, status is not None
+
+
+def backfill_final_data(
+    start_month,
+    end_month,
+    workers=None,
+    streaming=None,
+    compact=None,
+    shards=None,
+    force=False,
+):
+    """
+    여러 달의 최종 데이터를 프로세스 풀에서 병렬 생성 → {연도-월: 성공 여부}
+    Drive 목록은 부모 프로세스에서 한 번만 조회해 월별 카탈로그로 나눠 두고,
+    다운로드는 워커들이 DRIVE_CACHE_DIR 디스크 캐시를 함께 사용한다.
+    """
+    months = month_range(start_month, end_month)
+    if not months:
+        print(f"❌ 백필할 월이 없습니다: {start_month} ~ {end_month}")
+        return {}
+
+    print(f"🚀 백필 시작: {months[0]} ~ {months[-1]} ({len(months)}개월)")
+    if not setup_google_credentials():
+        print("❌ Google 인증 설정 실패")
+        return {month: False for month in months}
+
+    import partner_kpi as kpi_module
+
+    refresh_listing = False
+    try:
+        kpi_module.prime_drive_catalogs(months)
+    except Exception as e:
+        print(f"⚠️ Drive 목록 일괄 조회 실패, 월별로 조회합니다: {e}")
+        refresh_listing = True
+
+    workers = max(1, min(workers or BACKFILL_WORKERS, len(months)))
+    results = {}
+    with ProcessPoolExecutor(
+        max_workers=workers, initializer=_init_backfill_worker
+    ) as executor:
+        futures = {
+            executor.submit(
+                _backfill_month,
+                month,
+                streaming,
+                refresh_listing,
+                compact,
+                shards,
+                force,
+            ): month
+            for month in months
+        }
+        for future in as_completed(futures):
+            month = futures[future]
+            try:
+                _, success = future.result()
+            except Exception as e:
+                print(f"❌ {month} 백필 실패: {e}")
+                success = False
+            results[month] = success
+
+    # 워커들이 동시에 갱신한 매니페스트를 모든 월 저장 후 한 번 더 정리
+    update_data_manifest(DATA_DIR)
+
+    results = {month: results[month] for month in months}
+    failed = [month for month, success in results.items() if not success]
+    print(f"\n✅ 백필 완료: 성공 {len(months) - len(failed)}개월 / 전체 {len(months)}개월")
+    if failed:
+        print(f"❌ 실패한 월: {', '.join(failed)}")
+    return results
+
+
+def test_duplicate_order_snapshots():
+    """같은 오더의 스냅샷 2개(최신 먼저) → 최신 값만 남고 주차 비율/nan_count/상세 레코드가 일치하는지 테스트"""
+    print("🧪 중복 스냅샷 오더 테스트 시작")
+    print("=" * 60)
+
+    def snapshot(ratio, total_tasks=100):
+        return {
+            "order_no": "250818/1234/1",
+            "model_name": "GAIA-I",
+            "mech_partner": "주식회사 비에이티",
+            "elec_partner": "",
+            "total_tasks": total_tasks,
+            "ratios": {"mech_nan_ratio": ratio, "elec_nan_ratio": 0.0},
+            "links": {"order_href": "https://example.com/1"},
+            "file_date": "2025-08-17",
+            "group_month": "2025-08",
+        }
+
+    # 18:00 파일(10%)이 09:00 파일(50%)보다 먼저 들어옴 (Drive modifiedTime 내림차순)
+    records = [snapshot(10.0), snapshot(50.0)]
+    ok = True
+    for streaming in (False, True):
+        aggregate = new_weekly_aggregate()
+        nan_details, total_records = aggregate_nan_records(
+            iter(records), aggregate, streaming=streaming
+        )
+        weekly_stats, _ = finalize_weekly_aggregate(aggregate, nan_details)
+        bat = weekly_stats["33주차"]["partners"]["mech"]["BAT"]
+        checks = {
+            "로드 레코드 수": total_records == 2,
+            "중복 제외 수": aggregate["duplicates"] == 1,
+            "주차 레코드 수": weekly_stats["33주차"]["total_records"] == 1,
+            "최신 nan_count": (bat["total_tasks"], bat["nan_count"]) == (100, 10),
+            "최신 상세 비율": [r["nan_ratio"] for r in bat["records"]] == [10.0],
+            "주차 비율 = 중복 제외 값": bat["nan_ratio"] == 10.0,
+        }
+        for name, passed in checks.items():
+            print(f"  {'✅' if passed else '❌'} [streaming={streaming}] {name}")
+        ok = ok and all(checks.values())
+    return ok
+
+
+def test_kpi_nan_ratio_matches_data_file():
+    """중복 스냅샷이 있을 때 KPI 페이지 월별 NaN 비율과 데이터 파일 partner_summary 비율이 같은지 테스트"""
+    print("🧪 KPI/데이터 파일 NaN 비율 일치 테스트 시작")
+    print("=" * 60)
+
+    def record(order, ratio, file_date):
+        return {
+            "order_no": order,
+            "model_name": "GAIA-I",
+            "mech_partner": "주식회사 비에이티",
+            "elec_partner": "",
+            "total_tasks": 100,
+            "ratios": {"mech_nan_ratio": ratio, "elec_nan_ratio": 0.0},
+            "links": {"order_href": ""},
+            "file_date": file_date,
+            "group_month": "2025-08",
+        }
+
+    # 최신 파일 먼저: 33주차 일요일 파일(A 10%, B 20%) → 같은 주 금요일 파일(A 50%, 이전 스냅샷)
+    # → 34주차 파일(C 30%, D 40%) / 중복 제외 시 주차 15%·35%, 월 25%
+    records = [
+        record("A", 10.0, "2025-08-17"),
+        record("B", 20.0, "2025-08-17"),
+        record("A", 50.0, "2025-08-15"),
+        record("C", 30.0, "2025-08-24"),
+        record("D", 40.0, "2025-08-24"),
+    ]
+    ok = True
+    for streaming in (False, True):
+        aggregate = new_weekly_aggregate()
+        nan_details, _ = aggregate_nan_records(
+            iter(records), aggregate, streaming=streaming
+        )
+        _, partner_summary = finalize_weekly_aggregate(aggregate, nan_details)
+        data_file_ratio = partner_summary["BAT"]["nan_ratio"]
+
+        kpi_stats = nan_stats_from_records(iter(records), streaming=streaming)
+        kpi_ratio = round(float(kpi_stats.df_monthly.loc["2025-08", "BAT"]), 2)
+
+        checks = {
+            "KPI 월별 비율 = 25.0": kpi_ratio == 25.0,
+            "데이터 파일 비율 = KPI 비율": data_file_ratio == kpi_ratio,
+        }
+        for name, passed in checks.items():
+            print(f"  {'✅' if passed else '❌'} [streaming={streaming}] {name}")
+        ok = ok and all(checks.values())
+    return ok
+
+
 if __name__ == "__main__":
-    import datetime
+    parser = argparse.ArgumentParser(
+        description="NaN 대시보드 데이터 생성 (기본: 현재 월, --from 지정 시 여러 달 백필)"
+    )
+    parser.add_argument("--from", dest="start_month", help="백필 시작 월 (YYYY-MM)")
+    parser.add_argument(
+        "--to", dest="end_month", help="백필 종료 월 (YYYY-MM, 기본값 현재 월)"
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help=f"백필 동시 처리 월 수 (기본값 BACKFILL_WORKERS={BACKFILL_WORKERS})",
+    )
+    parser.add_argument(
+        "--compact",
+        action="store_true",
+        default=None,
+        help="공백 없는 JSON + .gz/.br 압축 사본 저장 (기본값 DATA_OUTPUT_COMPACT)",
+    )
+    parser.add_argument(
+        "--shards",
+        action="store_true",
+        default=None,
+        help="요약 파일 + 주차별 상세 샤드로 분리 저장 (기본값 DATA_DETAIL_SHARDS)",
+    )
+    parser.add_argument(
+        "--force",
+        action="store_true",
+        help="입력 다이제스트가 같아도 다시 생성 (빌드 캐시 무시)",
+    )
+    args = parser.parse_args()
 
     # 현재 월 기준으로 동적 추출
     current_date = datetime.datetime.now()
     current_month = f"{current_date.year}-{current_date.month:02d}"
 
+    if args.start_month:
+        print("🚀 NaN 데이터 백필 시작")
+        print("=" * 50)
+        results = backfill_final_data(
+            args.start_month,
+            args.end_month or current_month,
+            workers=args.workers,
+            compact=args.compact,
+            shards=args.shards,
+            force=args.force,
+        )
+        sys.exit(0 if results and all(results.values()) else 1)
+
     print("🚀 동적 NaN 데이터 생성 시작")
     print("=" * 50)
     print(f"📅 현재 월: {current_month}")
@@ -393,13 +1013,14 @@ if __name__ == "__main__":
     # 캐시 초기화
     clear_cache()
 
-    # 최종 데이터 생성
-    final_data = create_final_nan_data(current_month)
-
-    if final_data:
-        # 최종 데이터 저장
-        save_final_data(final_data, current_month)
+    # 최종 데이터 생성 및 저장 (입력 변경이 없으면 건너뜀)
+    status = build_final_data(
+        current_month, compact=args.compact, shards=args.shards, force=args.force
+    )
 
+    if status == "unchanged":
+        print(f"\n✅ {current_month} 입력 변경 없음 - 기존 데이터 유지")
+    elif status:
         print(f"\n✅ {current_month} 데이터 생성 완료!")
         print(f"   - partner_kpi.py 정확한 NaN 비율 사용")
         print(f"   - 실제 상세 레코드 포함")
@@ -11,6 +11,9 @@ class NanDashboard {
         this.currentMonth = null; // 동적으로 설정될 기본 월
         this.monthlyData = {}; // 월별 데이터 캐시
         this.availableMonths = []; // 사용 가능한 월 목록
+        this.monthFiles = {}; // 월 → 데이터 파일 경로 (data/index.json 매니페스트)
+        this.compressedFiles = {}; // 월 → 미리 압축된 .gz 사본 경로 (있는 경우)
+        this.detailShards = {}; // '월/주차' → 주차별 상세 샤드 캐시
         
         this.init();
     }
@@ -47,9 +50,60 @@ class NanDashboard {
         }
     }
 
+    async loadManifest() {
+        // create_final_data.py가 생성한 월 목록 매니페스트 (요청 1번으로 월 목록 확인)
+        const response = await fetch('data/index.json', { cache: 'no-cache' });
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        const manifest = await response.json();
+        return manifest.months || [];
+    }
+
+    async fetchCompressedJson(filePath) {
+        // 미리 압축된 .gz 사본을 받아 브라우저에서 해제 (사본이 없거나 DecompressionStream 미지원 시 null)
+        if (!filePath || typeof DecompressionStream === 'undefined') {
+            return null;
+        }
+        const response = await fetch(filePath);
+        if (!response.ok) {
+            throw new Error(`HTTP ${response.status}`);
+        }
+        const stream = response.body.pipeThrough(new DecompressionStream('gzip'));
+        return await new Response(stream).json();
+    }
+
+    getMonthFilePath(month) {
+        return this.monthFiles[month] || `data/nan_data_${month.replace('-', '_')}_improved.json`;
+    }
+
     async detectAvailableMonths() {
         console.log("🔍 사용 가능한 월 자동 감지 중...");
         
+        try {
+            const entries = await this.loadManifest();
+            if (entries.length > 0) {
+                this.monthFiles = {};
+                this.compressedFiles = {};
+                entries.forEach(entry => {
+                    // sha256을 버전 쿼리로 붙여 파일이 바뀔 때만 새로 받도록 함
+                    const version = entry.sha256 ? `?v=${entry.sha256.slice(0, 12)}` : '';
+                    this.monthFiles[entry.month] = `data/${entry.file}${version}`;
+                    if (entry.gz) {
+                        this.compressedFiles[entry.month] = `data/${entry.gz.file}${version}`;
+                    }
+                });
+                this.availableMonths = entries.map(entry => entry.month).sort();
+                this.currentMonth = this.availableMonths[this.availableMonths.length - 1];
+                
+                console.log(`🗂️ 매니페스트 기준 사용 가능한 월: ${this.availableMonths.join(', ')}`);
+                console.log(`🎯 기본 선택 월: ${this.currentMonth}`);
+                return;
+            }
+        } catch (error) {
+            console.warn('매니페스트(data/index.json) 로드 실패, 파일별 확인으로 대체:', error);
+        }
+        
         try {
             // 테스트할 월 범위 정의 (2025-01 ~ 2026-12)
             const testMonths = [];
@@ -138,8 +192,7 @@ class NanDashboard {
             // 동적 월별 데이터 파일 매핑 생성
             const monthFileMap = {};
             for (const availableMonth of this.availableMonths) {
-                const fileName = `nan_data_${availableMonth.replace('-', '_')}_improved.json`;
-                monthFileMap[availableMonth] = `data/${fileName}`;
+                monthFileMap[availableMonth] = this.getMonthFilePath(availableMonth);
             }
             
             console.log(`📂 동적 파일 매핑:`, monthFileMap);
@@ -176,10 +229,20 @@ class NanDashboard {
         const improvedFilePath = filePath.includes('_improved.json') ? filePath : filePath.replace('.json', '_improved.json');
         
         try {
-            console.log(`${month} 개선된 데이터 파일 시도: ${improvedFilePath}`);
-            const response = await fetch(improvedFilePath);
-            if (response.ok) {
-                const data = await response.json();
+            let data = null;
+            try {
+                data = await this.fetchCompressedJson(this.compressedFiles[month]);
+            } catch (error) {
+                console.warn(`${month} 압축 데이터 로드 실패, 일반 JSON 사용:`, error);
+            }
+            if (!data) {
+                console.log(`${month} 개선된 데이터 파일 시도: ${improvedFilePath}`);
+                const response = await fetch(improvedFilePath);
+                if (response.ok) {
+                    data = await response.json();
+                }
+            }
+            if (data) {
                 console.log(`${month} 개선된 데이터 사용 (partner_kpi.py 로직 기반):`, {
                     total_records: data.total_records,
                     weekly_stats_keys: Object.keys(data.weekly_stats || {}),
@@ -267,7 +330,7 @@ class NanDashboard {
             for (const month of months) {
                 // _improved.json 파일 사용
                 console.log(`🔄 ${month} 데이터 로딩 중...`);
-                await this.loadSingleMonthData(month, `data/nan_data_${month.replace('-', '_')}_improved.json`);
+                await this.loadSingleMonthData(month, this.getMonthFilePath(month));
                 const monthData = this.monthlyData[month];
                 
                 if (monthData && monthData.weekly_stats) {
@@ -750,22 +813,7 @@ class NanDashboard {
 
         accordion.innerHTML = weeks.map((week, index) => {
             const stats = this.data.weekly_stats[week];
-            const weekData = [];
-
-            // 기구 및 전장 협력사의 NaN 상세 내역 수집
-            ['mech', 'elec'].forEach(type => {
-                if (stats.partners && stats.partners[type]) {
-                    Object.entries(stats.partners[type]).forEach(([partner, data]) => {
-                    if (data.records && data.records.length > 0) {
-                        weekData.push({
-                            partner: partner,
-                            type: type === 'mech' ? '🔧' : '⚡',
-                            records: data.records
-                        });
-                    }
-                    });
-                }
-            });
+            const weekData = this.collectWeekDetails(stats);
 
             if (weekData.length === 0) {
                 return `
@@ -780,61 +828,148 @@ class NanDashboard {
                 `;
             }
 
+            // 요약 파일(detail 샤드 참조)이면 펼칠 때 샤드를 받아 채움
+            const isLazy = weekData.some(item => item.records === null);
             return `
                 <div class="accordion-item">
                     <h2 class="accordion-header">
                         <button class="accordion-button collapsed" type="button" data-bs-toggle="collapse" data-bs-target="#collapse${index}">
                             <span class="status-dot ${weekData.length > 5 ? 'danger' : 'warning'}"></span>
-                            ${week} (${stats.date}) - ${weekData.reduce((sum, item) => sum + item.records.length, 0)}건의 NaN 발생
+                            ${week} (${stats.date}) - ${weekData.reduce((sum, item) => sum + item.count, 0)}건의 NaN 발생
                             <small class="ms-2 text-muted">${stats.is_sunday_data ? '일요일' : '금요일'} 데이터</small>
                         </button>
                     </h2>
-                    <div id="collapse${index}" class="accordion-collapse collapse" data-bs-parent="#nanDetailsAccordion">
+                    <div id="collapse${index}" class="accordion-collapse collapse" data-bs-parent="#nanDetailsAccordion"${isLazy ? ` data-week="${week}"` : ''}>
                         <div class="accordion-body">
-                            ${weekData.map(item => `
-                                <h6>${item.type} ${item.partner}</h6>
-                                <div class="table-responsive mb-3">
-                                    <table class="table table-sm">
-                                        <thead>
-                                            <tr>
-                                                <th>Title Number</th>
-                                                <th>모델명</th>
-                                                <th>NaN 건수</th>
-                                                <th>전체 작업</th>
-                                                <th>NaN 비율</th>
-                                            </tr>
-                                        </thead>
-                                        <tbody>
-                                            ${item.records.map(record => `
-                                                <tr>
-                                                    <td>
-                                                        ${record.order_href ? 
-                                                            `<a href="${record.order_href}" target="_blank" class="text-decoration-none">
-                                                                <code class="text-primary">${record.order_no}</code>
-                                                                <i class="fas fa-external-link-alt ms-1 text-muted" style="font-size: 0.7em;"></i>
-                                                            </a>` : 
-                                                            `<code>${record.order_no}</code>`
-                                                        }
-                                                    </td>
-                                                    <td>${record.model_name}</td>
-                                                    <td class="text-danger"><strong>${record.nan_count}</strong></td>
-                                                    <td>${record.total_tasks}</td>
-                                                    <td>
-                                                        <span class="badge ${record.nan_ratio > 20 ? 'bg-danger' : record.nan_ratio > 10 ? 'bg-warning' : 'bg-info'}">
-                                                            ${record.nan_ratio.toFixed(1)}%
-                                                        </span>
-                                                    </td>
-                                                </tr>
-                                            `).join('')}
-                                        </tbody>
-                                    </table>
+                            ${isLazy ? `
+                                <div class="text-muted">
+                                    <span class="spinner-border spinner-border-sm me-2"></span>상세 내역 불러오는 중...
                                 </div>
-                            `).join('')}
+                            ` : this.renderDetailTables(weekData)}
                         </div>
                     </div>
                 </div>
             `;
         }).join('');
+
+        accordion.querySelectorAll('.accordion-collapse[data-week]').forEach(collapse => {
+            collapse.addEventListener('show.bs.collapse', () => this.loadWeekDetails(collapse), { once: true });
+        });
+    }
+
+    collectWeekDetails(stats, shard = null) {
+        // 기구 및 전장 협력사의 NaN 상세 내역 수집 (records가 없으면 샤드 또는 record_count 사용)
+        const weekData = [];
+        ['mech', 'elec'].forEach(type => {
+            if (stats.partners && stats.partners[type]) {
+                Object.entries(stats.partners[type]).forEach(([partner, data]) => {
+                    const records = data.records
+                        ? this.resolveOrderRecords(data.records, this.data.orders)
+                        : this.resolveOrderRecords(shard?.partners?.[type]?.[partner], shard?.orders);
+                    const count = records ? records.length : (data.record_count || 0);
+                    if (count > 0) {
+                        weekData.push({
+                            partner: partner,
+                            type: type === 'mech' ? '🔧' : '⚡',
+                            records: records,
+                            count: count
+                        });
+                    }
+                });
+            }
+        });
+        return weekData;
+    }
+
+    resolveOrderRecords(records, orders) {
+        // 정규화된 레코드({order: id, ...})를 orders 테이블의 오더 정보와 합쳐 복원
+        if (!records) {
+            return null;
+        }
+        if (!orders) {
+            return records;
+        }
+        return records.map(record => record.order === undefined ? record : { ...orders[record.order], ...record });
+    }
+
+    async fetchDetailShard(week) {
+        // 주차별 상세 샤드 로드 (월/주차 단위 캐시, .gz 사본 우선)
+        const cacheKey = `${this.currentMonth}/${week}`;
+        if (this.detailShards[cacheKey]) {
+            return this.detailShards[cacheKey];
+        }
+
+        const detail = this.data.weekly_stats[week].detail;
+        const version = detail.sha256 ? `?v=${detail.sha256}` : '';
+        let shard = null;
+        try {
+            shard = await this.fetchCompressedJson(detail.gz ? `data/${detail.gz}${version}` : null);
+        } catch (error) {
+            console.warn(`${week} 압축 상세 샤드 로드 실패, 일반 JSON 사용:`, error);
+        }
+        if (!shard) {
+            const response = await fetch(`data/${detail.file}${version}`);
+            if (!response.ok) {
+                throw new Error(`HTTP ${response.status}`);
+            }
+            shard = await response.json();
+        }
+        this.detailShards[cacheKey] = shard;
+        return shard;
+    }
+
+    async loadWeekDetails(collapse) {
+        const week = collapse.dataset.week;
+        const body = collapse.querySelector('.accordion-body');
+        try {
+            const shard = await this.fetchDetailShard(week);
+            body.innerHTML = this.renderDetailTables(this.collectWeekDetails(this.data.weekly_stats[week], shard));
+        } catch (error) {
+            console.error(`${week} 상세 내역 로드 실패:`, error);
+            body.innerHTML = `<div class="text-danger">상세 내역을 불러오지 못했습니다: ${error.message}</div>`;
+        }
+    }
+
+    renderDetailTables(weekData) {
+        return weekData.map(item => `
+                <h6>${item.type} ${item.partner}</h6>
+                <div class="table-responsive mb-3">
+                    <table class="table table-sm">
+                        <thead>
+                            <tr>
+                                <th>Title Number</th>
+                                <th>모델명</th>
+                                <th>NaN 건수</th>
+                                <th>전체 작업</th>
+                                <th>NaN 비율</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+                            ${item.records.map(record => `
+                                <tr>
+                                    <td>
+                                        ${record.order_href ? 
+                                            `<a href="${record.order_href}" target="_blank" class="text-decoration-none">
+                                                <code class="text-primary">${record.order_no}</code>
+                                                <i class="fas fa-external-link-alt ms-1 text-muted" style="font-size: 0.7em;"></i>
+                                            </a>` : 
+                                            `<code>${record.order_no}</code>`
+                                        }
+                                    </td>
+                                    <td>${record.model_name}</td>
+                                    <td class="text-danger"><strong>${record.nan_count}</strong></td>
+                                    <td>${record.total_tasks}</td>
+                                    <td>
+                                        <span class="badge ${record.nan_ratio > 20 ? 'bg-danger' : record.nan_ratio > 10 ? 'bg-warning' : 'bg-info'}">
+                                            ${record.nan_ratio.toFixed(1)}%
+                                        </span>
+                                    </td>
+                                </tr>
+                            `).join('')}
+                        </tbody>
+                    </table>
+                </div>
+            `).join('');
     }
 
     hideLoading() {
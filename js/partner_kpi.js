@@ -0,0 +1,133 @@
+/**
+ * Partner KPI Dashboard JavaScript
+ * 협력사 평가 대시보드(partner_kpi.html) 공용 스크립트 - 월별 데이터는 window.KPI_DATA로 전달
+ */
+
+const { defectDetails, nanDetails } = window.KPI_DATA || { defectDetails: {}, nanDetails: {} };
+
+const partnerToIdMap = {
+    'BAT': 'bat',
+    'FNI': 'fni',
+    'TMS(M)': 'tmsm',
+    'P&S': 'pns',
+    'TMS(E)': 'tmse',
+    'C&A': 'cna'
+};
+
+const idToPartnerMap = Object.fromEntries(
+    Object.entries(partnerToIdMap).map(([partner, id]) => [id, partner])
+);
+
+function toggleDefectTable(partnerId) {
+    const partner = idToPartnerMap[partnerId];
+    console.log("Toggling table for partner:", partner);
+    const table = document.getElementById(`defect-table-${partnerId}`);
+
+    // 현재 테이블이 이미 표시되어 있으면 숨기기
+    if (!table.classList.contains('hidden')) {
+        table.classList.add('hidden');
+        return;
+    }
+
+    // 모든 테이블 숨기기 (다른 테이블이 열려있을 수 있음)
+    document.querySelectorAll('.defect-table').forEach(t => t.classList.add('hidden'));
+
+    // 선택된 테이블 표시
+    table.classList.remove('hidden');
+    const details = defectDetails[partner] || [];
+    console.log("Details for partner:", partner, details);
+
+    let tableBody = '';
+    if (details.length === 0) {
+        tableBody = '<tr><td colspan="4" style="text-align: center; color: #666;">불량 데이터 없음</td></tr>';
+    } else {
+        details.forEach((item, index) => {
+            tableBody += `<tr>
+                <td>${item.productInfo}</td>
+                <td>${item.defect}</td>
+                <td>${item.action}</td>
+                <td>${item.occurDate}</td>
+            </tr>`;
+        });
+    }
+    table.querySelector('tbody').innerHTML = tableBody;
+
+    // 테이블로 스크롤
+    table.scrollIntoView({ behavior: 'smooth', block: 'start' });
+}
+
+function toggleNanTable(partnerId) {
+    const partner = idToPartnerMap[partnerId];
+    console.log("Toggling NaN table for partner:", partner);
+    const table = document.getElementById(`nan-table-${partnerId}`);
+
+    // 현재 테이블이 이미 표시되어 있으면 숨기기
+    if (!table.classList.contains('hidden')) {
+        table.classList.add('hidden');
+        return;
+    }
+
+    // 모든 NaN 테이블 숨기기
+    document.querySelectorAll('.nan-table').forEach(t => t.classList.add('hidden'));
+
+    // 선택된 테이블 표시
+    table.classList.remove('hidden');
+    const details = nanDetails[partner] || [];
+    console.log("NaN details for partner:", partner, details);
+
+    let tableBody = '';
+    if (details.length === 0) {
+        tableBody = '<tr><td colspan="2" style="text-align: center; color: #666;">NaN 데이터 없음</td></tr>';
+    } else {
+        details.forEach((item, index) => {
+            tableBody += `<tr>
+                <td>${item.week}</td>
+                <td>${item.ratio}%</td>
+            </tr>`;
+        });
+    }
+    table.querySelector('tbody').innerHTML = tableBody;
+
+    // 테이블로 스크롤
+    table.scrollIntoView({ behavior: 'smooth', block: 'start' });
+}
+
+function downloadCSV(partnerId) {
+    const partner = idToPartnerMap[partnerId];
+    const details = defectDetails[partner] || [];
+    console.log("DEBUG: Downloading CSV for partner:", partner, details);
+    if (details.length === 0) {
+        alert('다운로드할 데이터가 없습니다.');
+        return;
+    }
+
+    let csvContent = '\ufeff';
+    csvContent += '제품정보,상세불량내용,상세조치내용,발생일\n';
+
+    details.forEach(item => {
+        const row = [
+            `"${item.productInfo.replace(/"/g, '""')}"`,
+            `"${item.defect.replace(/"/g, '""')}"`,
+            `"${item.action.replace(/"/g, '""')}"`,
+            `"${item.occurDate.replace(/"/g, '""')}"`
+        ];
+        csvContent += row.join(',') + '\n';
+    });
+
+    const today = new Date();
+    const dateStr = today.getFullYear() + '' +
+                   String(today.getMonth() + 1).padStart(2, '0') + '' +
+                   String(today.getDate()).padStart(2, '0');
+
+    const fileName = `${partner}_불량내역_${dateStr}.csv`;
+
+    const blob = new Blob([csvContent], { type: 'text/csv;charset=utf-8' });
+    const url = window.URL.createObjectURL(blob);
+    const link = document.createElement('a');
+    link.setAttribute('href', url);
+    link.setAttribute('download', fileName);
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+    window.URL.revokeObjectURL(url);
+}
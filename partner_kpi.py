@@ -1,13 +1,35 @@
 import os
 import pandas as pd
+import numpy as np
 import json
+import codecs
+import io
+import hashlib
+import base64
+import shutil
+import sqlite3
 from datetime import datetime
 import datetime
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+import httplib2
 from google.oauth2.service_account import Credentials
+from google_auth_httplib2 import AuthorizedHttp
 from googleapiclient.discovery import build
-from github import Github
-from collections import defaultdict
+from googleapiclient.http import MediaIoBaseDownload
+from github import (
+    Github,
+    GithubException,
+    InputGitTreeElement,
+    RateLimitExceededException,
+    UnknownObjectException,
+)
+from collections import defaultdict, OrderedDict, namedtuple
+from functools import lru_cache
+from string import Template
 import math
+import posixpath
 import re
 
 # 옵션 키
@@ -35,1189 +57,2337 @@ SCOPES = [
     "https://www.googleapis.com/auth/drive",
 ]
 # 환경변수 기반 인증 (GitHub Actions 호환)
-SHEETS_JSON_KEY_PATH = os.getenv(
-    "GOOGLE_APPLICATION_CREDENTIALS",
-    "/Users/kdkyu311/Downloads/gst-manegemnet-e6c4e7bd79e2.json",
-)
-DRIVE_JSON_KEY_PATH = os.getenv(
-    "GOOGLE_APPLICATION_CREDENTIALS",
-    "/Users/kdkyu311/Downloads/gst-manegemnet-8e112ff4f64e.json",
-)
+# GOOGLE_APPLICATION_CREDENTIALS는 클라이언트 생성 시점에 읽음 (setup_google_credentials() 이후 설정 가능)
+SHEETS_JSON_KEY_PATH = "/Users/kdkyu311/Downloads/gst-manegemnet-e6c4e7bd79e2.json"
+DRIVE_JSON_KEY_PATH = "/Users/kdkyu311/Downloads/gst-manegemnet-8e112ff4f64e.json"
 DRIVE_FOLDER_ID = "13FdsniLHb4qKmn5M4-75H8SvgEyW2Ck1"
 SPREADSHEET_ID = "1sb-qKK0OiHnP8HHaffD9FVOzlrfYa_bD9QQDyvnHnrI"
-SHEET_RANGE = "불량이력!A1:AJ1000"  # 불량 데이터 시트
-PRODUCTION_SHEET_RANGE = "공정검사이력!A1:AJ1000"  # 생산대수 데이터 시트
+SHEET_RANGE = "불량이력!A:AJ"  # 불량 데이터 시트 (행 범위는 시트 크기에서 결정)
+PRODUCTION_SHEET_RANGE = "공정검사이력!A:AJ"  # 생산대수 데이터 시트
+SHEET_CHUNK_ROWS = int(os.getenv("SHEET_CHUNK_ROWS", "1000"))  # batchGet 1회당 시트별 행 수
+# 시트 로컬 스냅샷 (SQLite, 스프레드시트 Drive version이 같으면 다시 읽지 않음)
+SHEETS_SNAPSHOT_PATH = os.getenv(
+    "SHEETS_SNAPSHOT_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "sheets_snapshot.sqlite3"),
+)
+SHEETS_SNAPSHOT_SCHEMA = 2  # 스냅샷 테이블 구조 버전 (다르면 스냅샷을 버리고 다시 생성)
+HTTP_TIMEOUT = 60  # Google API HTTP 타임아웃 (초)
+
+# Google API 클라이언트 캐시 (지연 초기화, 키 파일 경로별 1회 생성 - HTTP 전송 객체만 스레드별)
+_credentials_cache = {}
+_thread_http_cache = {}
+_service_cache = {}
+_client_lock = threading.RLock()
+
+
+def resolve_key_path(default_path):
+    """자격 증명 키 파일 경로 (호출 시점의 GOOGLE_APPLICATION_CREDENTIALS 우선)"""
+    return os.getenv("GOOGLE_APPLICATION_CREDENTIALS", default_path)
+
+
+def get_credentials(key_path):
+    """서비스 계정 자격 증명 (키 파일 경로별 1회 로드 후 재사용)"""
+    with _client_lock:
+        if key_path not in _credentials_cache:
+            _credentials_cache[key_path] = Credentials.from_service_account_file(
+                key_path, scopes=SCOPES
+            )
+            print(f"Google 자격 증명 로드 성공: {key_path}")
+        return _credentials_cache[key_path]
+
+
+def build_authorized_http(key_path):
+    """새 인증 HTTP 전송 객체 생성 (httplib2.Http는 스레드 간 공유 불가)"""
+    return AuthorizedHttp(
+        get_credentials(key_path), http=httplib2.Http(timeout=HTTP_TIMEOUT)
+    )
+
+
+class _ThreadLocalHttp:
+    """
+    스레드별 인증 HTTP 전송 객체 (키 파일 경로별 1개를 Drive/Sheets 서비스가 공유)
+    요청한 스레드마다 build_authorized_http()로 전송 객체를 1개씩 만들어 그 스레드에서만 재사용한다
+    (자격 증명은 공유, 같은 스레드의 연속 요청은 연결 재사용)
+    """
+
+    def __init__(self, key_path):
+        self.key_path = key_path
+        self._local = threading.local()
+
+    def get(self):
+        """현재 스레드의 전송 객체 (없으면 생성)"""
+        http = getattr(self._local, "http", None)
+        if http is None:
+            http = self._local.http = build_authorized_http(self.key_path)
+        return http
+
+    def request(self, *args, **kwargs):
+        return self.get().request(*args, **kwargs)
+
+    def __getattr__(self, name):
+        # credentials/timeout 등 나머지 속성은 현재 스레드의 전송 객체로 위임
+        return getattr(self.get(), name)
+
+
+def _get_thread_http(key_path):
+    """Drive/Sheets 서비스가 함께 쓰는 스레드별 인증 HTTP 전송 객체 (_ThreadLocalHttp)"""
+    with _client_lock:
+        if key_path not in _thread_http_cache:
+            _thread_http_cache[key_path] = _ThreadLocalHttp(key_path)
+        return _thread_http_cache[key_path]
+
+
+def _get_service(service_name, version, key_path):
+    """정적 discovery 문서로 API 서비스 생성 (서비스/키 경로별 1회, 요청은 호출 스레드의 전송 객체로)"""
+    cache_key = (service_name, version, key_path)
+    with _client_lock:
+        if cache_key not in _service_cache:
+            _service_cache[cache_key] = build(
+                service_name,
+                version,
+                http=_get_thread_http(key_path),
+                cache_discovery=False,
+                static_discovery=True,
+            )
+        return _service_cache[cache_key]
 
 
 def get_drive_service():
-    """Google Drive API 서비스 초기화"""
+    """Google Drive API 서비스 (최초 호출 시 초기화)"""
     try:
-        credentials = Credentials.from_service_account_file(
-            DRIVE_JSON_KEY_PATH, scopes=SCOPES
-        )
-        print(f"Google Drive 자격 증명 로드 성공: {DRIVE_JSON_KEY_PATH}")
-        return build("drive", "v3", credentials=credentials)
+        return _get_service("drive", "v3", resolve_key_path(DRIVE_JSON_KEY_PATH))
     except Exception as e:
         print(f"Google Drive API 초기화 실패: {str(e)}")
         raise
 
 
 def get_sheets_service():
-    """Google Sheets API 서비스 초기화"""
+    """Google Sheets API 서비스 (최초 호출 시 초기화)"""
     try:
-        credentials = Credentials.from_service_account_file(
-            SHEETS_JSON_KEY_PATH, scopes=SCOPES
-        )
-        print(f"Google Sheets 자격 증명 로드 성공: {SHEETS_JSON_KEY_PATH}")
-        return build("sheets", "v4", credentials=credentials)
+        return _get_service("sheets", "v4", resolve_key_path(SHEETS_JSON_KEY_PATH))
     except Exception as e:
         print(f"Google Sheets API 초기화 실패: {str(e)}")
         raise
 
 
-# 서비스 초기화
-drive_service = get_drive_service()
-sheets_service = get_sheets_service()
-
-# 캐싱 변수
-_cached_json_data = None
-
-
-def load_json_files_from_drive(year_month, drive_folder_id=DRIVE_FOLDER_ID):
-    """Google Drive에서 특정 연도-월의 JSON 파일 로드 (33주차부터 일요일, 32주차 이하는 금요일)"""
-    global _cached_json_data
-    if _cached_json_data is not None:
-        print("캐싱된 JSON 데이터 사용")
-        return _cached_json_data
+def reset_google_clients():
+    """캐시된 자격 증명/전송 객체/서비스 초기화 (자격 증명 교체 시 사용)"""
+    with _client_lock:
+        _credentials_cache.clear()
+        _thread_http_cache.clear()
+        _service_cache.clear()
 
-    print(f"지정된 연도-월: {year_month}")
-    yyyy_mm = year_month.replace("-", "")
-    try:
-        query = f"'{drive_folder_id}' in parents and name contains 'nan_ot_results_{yyyy_mm}'"
-        print(f"Google Drive 조회 - 폴더 ID: {drive_folder_id}, 쿼리: {query}")
-        files = (
-            drive_service.files()
-            .list(
-                q=query,
-                fields="files(id, name, modifiedTime)",
-                orderBy="modifiedTime desc",
-            )
-            .execute()
-            .get("files", [])
-        )
-        if not files:
-            print(f"⚠️ {year_month}에 해당하는 JSON 파일이 없습니다.")
-            return []
 
-        # 주차별 요일 선택 로직: 33주차부터 일요일, 32주차 이하는 금요일
-        target_files = []
-        sunday_files = [f for f in files if "_일_" in f["name"]]
-        friday_files = [f for f in files if "_금_" in f["name"]]
+# 월별 JSON 데이터 메모리 캐시: (폴더 ID, 연도-월) → (로드 시각, 데이터), LRU + TTL
+JSON_CACHE_MAX_MONTHS = int(os.getenv("JSON_CACHE_MAX_MONTHS", "12"))
+JSON_CACHE_TTL_SECONDS = int(os.getenv("JSON_CACHE_TTL_SECONDS", "3600"))
+_json_data_cache = OrderedDict()
+_json_cache_lock = threading.Lock()
 
-        # 모든 파일에서 주차 정보 추출하여 조건부 선택
-        for file in files:
-            try:
-                # 파일명에서 날짜 추출 (예: nan_ot_results_20250817_130753_일_7회차.json)
-                parts = file["name"].split("_")
-                if len(parts) >= 4:
-                    date_str = parts[3]  # 20250817
-                    if len(date_str) == 8:
-                        year = int(date_str[:4])
-                        month = int(date_str[4:6])
-                        day = int(date_str[6:8])
-
-                        file_date = datetime.date(year, month, day)
-                        week_num = file_date.isocalendar()[1]
-
-                        # 33주차부터 일요일, 32주차 이하는 금요일
-                        if week_num >= 33 and "_일_" in file["name"]:
-                            target_files.append(file)
-                        elif week_num <= 32 and "_금_" in file["name"]:
-                            target_files.append(file)
-            except (ValueError, IndexError) as e:
-                continue
 
-        if not target_files:
-            print(f"⚠️ {year_month}에 조건에 맞는 JSON 파일이 없습니다.")
-            print(f"   - 일요일 파일: {len(sunday_files)}개")
-            print(f"   - 금요일 파일: {len(friday_files)}개")
-            return []
+def _get_cached_json_data(cache_key):
+    """캐시된 월 데이터 반환 (없거나 TTL 만료 시 None)"""
+    with _json_cache_lock:
+        entry = _json_data_cache.get(cache_key)
+        if entry is None:
+            return None
+        loaded_at, data = entry
+        if time.monotonic() - loaded_at > JSON_CACHE_TTL_SECONDS:
+            del _json_data_cache[cache_key]
+            return None
+        _json_data_cache.move_to_end(cache_key)
+        return data
+
+
+def _set_cached_json_data(cache_key, data):
+    """월 데이터 캐시 저장 (JSON_CACHE_MAX_MONTHS 초과 시 가장 오래 안 쓴 월부터 제거)"""
+    with _json_cache_lock:
+        _json_data_cache[cache_key] = (time.monotonic(), data)
+        _json_data_cache.move_to_end(cache_key)
+        while len(_json_data_cache) > JSON_CACHE_MAX_MONTHS:
+            _json_data_cache.popitem(last=False)
+
+
+def invalidate_json_cache(year_month=None):
+    """월별 JSON 메모리 캐시 무효화 (year_month 미지정 시 전체)"""
+    with _json_cache_lock:
+        if year_month is None:
+            _json_data_cache.clear()
+            return
+        for cache_key in [key for key in _json_data_cache if key[1] == year_month]:
+            del _json_data_cache[cache_key]
+
+# Drive 동시 다운로드 설정
+DRIVE_DOWNLOAD_WORKERS = int(os.getenv("DRIVE_DOWNLOAD_WORKERS", "4"))
+
+# Drive 파일 목록 조회 설정 (페이지 크기, 증분 동기화 여부)
+DRIVE_LIST_PAGE_SIZE = 1000
+DRIVE_FILE_FIELDS = "id, name, modifiedTime, md5Checksum"
+DRIVE_INCREMENTAL_SYNC = os.getenv("DRIVE_INCREMENTAL_SYNC", "true").lower() == "true"
+
+# 스트리밍 모드: 결과 파일을 청크 단위로 받아 레코드 하나씩 파싱 (전체 목록을 메모리에 두지 않음)
+DRIVE_STREAMING = os.getenv("DRIVE_STREAMING", "false").lower() == "true"
+DRIVE_STREAM_CHUNK_BYTES = int(os.getenv("DRIVE_STREAM_CHUNK_KB", "1024")) * 1024
+
+# Drive 결과 파일 디스크 캐시 (파일 id + modifiedTime/md5Checksum 기준, LRU 용량 제한)
+DRIVE_CACHE_DIR = os.getenv(
+    "DRIVE_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache", "drive"),
+)
+DRIVE_CACHE_MAX_BYTES = int(os.getenv("DRIVE_CACHE_MAX_MB", "200")) * 1024 * 1024
+_drive_cache_lock = threading.Lock()
 
-        weekday_type = (
-            "일요일" if any("_일_" in f["name"] for f in target_files) else "금요일"
-        )
-        print(
-            f"총 {len(target_files)}개의 {weekday_type} JSON 파일 로드 (33주차부터 일요일, 32주차 이하 금요일)"
-        )
-        data_list = []
-        for file in target_files:
-            file_id = file["id"]
-            file_name = file["name"]
-            print(f"📁 JSON 파일 로드 중: {file_name}")
-            try:
-                request = drive_service.files().get_media(fileId=file_id)
-                content = request.execute().decode("utf-8")
-                data = json.loads(content)
-                if "results" not in data:
-                    print(
-                        f"⚠️ 파일 {file_name}: 'results' 키가 없습니다. JSON 구조: {list(data.keys())}"
-                    )
-                    continue
-                try:
-                    date_str = file_name.split("_")[3]
-                    file_date = pd.to_datetime(date_str, format="%Y%m%d").date()
-                except (IndexError, ValueError) as e:
-                    print(f"⚠️ 파일 {file_name}: 날짜 파싱 실패: {str(e)}")
-                    continue
-                for result in data["results"]:
-                    result["file_date"] = file_date.isoformat()
-                    result["group_month"] = file_date.strftime("%Y-%m")
-                data_list.extend(data["results"])
-            except Exception as e:
-                print(f"⚠️ 파일 {file_name} 처리 실패: {str(e)}")
-                continue
 
-        _cached_json_data = data_list
-        print(f"📂 총 {len(data_list)}개의 로그 데이터를 로드했습니다.")
-        return data_list
-    except Exception as e:
-        print(f"Google Drive API 호출 실패: {str(e)}")
-        return []
+def _drive_cache_path(file):
+    """캐시 파일 경로 (버전 정보가 없으면 None → 캐시 사용 안 함)"""
+    modified_time = file.get("modifiedTime", "")
+    md5_checksum = file.get("md5Checksum", "")
+    if not modified_time and not md5_checksum:
+        return None
+    version = hashlib.sha1(f"{modified_time}:{md5_checksum}".encode()).hexdigest()
+    return os.path.join(DRIVE_CACHE_DIR, "files", f"{file['id']}_{version[:16]}.json")
 
 
-def load_sheets_data():
-    """Google Sheets에서 불량 데이터 로드"""
+def _read_drive_cache(file):
+    """캐시된 파일 내용 반환 (없거나 손상 시 None)"""
+    path = _drive_cache_path(file)
+    if path is None or not os.path.exists(path):
+        return None
     try:
-        result = (
-            sheets_service.spreadsheets()
-            .values()
-            .get(spreadsheetId=SPREADSHEET_ID, range=SHEET_RANGE)
-            .execute()
-        )
-        values = result.get("values", [])
-        if not values:
-            print("❌ 불량 시트 데이터 없음")
+        with open(path, "rb") as f:
+            content = f.read()
+        md5_checksum = file.get("md5Checksum")
+        if md5_checksum and hashlib.md5(content).hexdigest() != md5_checksum:
+            print(f"⚠️ 캐시 파일 체크섬 불일치, 다시 다운로드: {file['name']}")
+            os.remove(path)
             return None
-        columns = values[0]
-        data = values[1:]
-        df = pd.DataFrame(data, columns=columns)
-        if "비고" in df.columns:
-            df = df[
-                ~df["비고"].astype(str).str.contains("제조\\(He미보증\\)", na=False)
-            ]
-            print(f"DEBUG: '제조(He미보증)' 제외 후 불량 데이터 크기: {len(df)}")
-        return df
-    except Exception as e:
-        print(f"불량 데이터 로드 실패: {str(e)}")
+        os.utime(path)  # LRU: 최근 사용 시각 갱신
+        return content
+    except OSError:
         return None
 
 
-def load_production_data():
-    """Google Sheets에서 생산대수 데이터 로드"""
+def _write_drive_cache(file, content):
+    """파일 내용을 캐시에 원자적으로 저장하고 같은 id의 이전 버전 및 초과 용량 정리"""
+    path = _drive_cache_path(file)
+    if path is None:
+        return
     try:
-        result = (
-            sheets_service.spreadsheets()
-            .values()
-            .get(spreadsheetId=SPREADSHEET_ID, range=PRODUCTION_SHEET_RANGE)
-            .execute()
-        )
-        values = result.get("values", [])
-        if not values:
-            print("❌ 생산대수 시트 데이터 없음")
-            return None
-        columns = values[0]
-        data = values[1:]
-        df = pd.DataFrame(data, columns=columns)
-        print(f"DEBUG: 생산대수 데이터 로드 완료 - 총 {len(df)}건")
-        print(f"DEBUG: 사용 가능한 컬럼: {list(df.columns)}")
-
-        # 필요한 컬럼 확인
-        required_columns = ["제품명", "협력사(기구)명", "협력사(전장)명"]
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            print(f"⚠️ 누락된 컬럼: {missing_columns}")
-        else:
-            print("✅ 필요한 컬럼 모두 존재")
-
-        return df
-    except Exception as e:
-        print(f"생산대수 데이터 로드 실패: {str(e)}")
-        return None
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+        _install_drive_cache_file(file, tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ Drive 캐시 저장 실패: {file['name']} - {str(e)}")
+
+
+def _install_drive_cache_file(file, tmp_path, path):
+    """임시 파일을 캐시 경로로 원자적 이동 후 같은 id의 이전 버전 및 초과 용량 정리"""
+    cache_dir = os.path.dirname(path)
+    os.replace(tmp_path, path)
+    with _drive_cache_lock:
+        prefix = f"{file['id']}_"
+        for name in os.listdir(cache_dir):
+            old_path = os.path.join(cache_dir, name)
+            if name.startswith(prefix) and name.endswith(".json") and old_path != path:
+                try:
+                    os.remove(old_path)
+                except FileNotFoundError:
+                    pass  # 다른 프로세스가 이미 정리함
+        _evict_drive_cache(cache_dir)
 
 
-# 협력사 이름 매핑 사전
-mech_partner_map = {
-    "주식회사 비에이티": "BAT",
-    "에프앤아이(FnI)": "FNI",
-    "(주)티엠에스이엔지": "TMS(M)",
-}
-elec_partner_map = {
-    "(주)티엠에스이엔지": "TMS(E)",
-    "피엔에스 시스템": "P&S",
-    "(주)씨앤에이시스템": "C&A",
-}
-# 반제품 매핑 사전 (기구와 동일)
-semi_product_partner_map = {
-    "주식회사 비에이티": "BAT",
-    "에프앤아이(FnI)": "FNI",
-    "(주)티엠에스이엔지": "TMS(M)",
-}
+def _evict_drive_cache(cache_dir):
+    """캐시 용량이 DRIVE_CACHE_MAX_BYTES를 넘으면 오래 사용하지 않은 파일부터 삭제"""
+    entries = []
+    for name in os.listdir(cache_dir):
+        if not name.endswith(".json"):
+            continue
+        path = os.path.join(cache_dir, name)
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
 
+    total_size = sum(size for _, size, _ in entries)
+    for _, size, path in sorted(entries):
+        if total_size <= DRIVE_CACHE_MAX_BYTES:
+            break
+        try:
+            os.remove(path)
+            total_size -= size
+        except OSError:
+            continue
 
-def clean_partner_name(name, mode="mech"):
-    name = (name or "").strip()
-    if mode == "mech":
-        return mech_partner_map.get(name, name)
-    elif mode == "elec":
-        return elec_partner_map.get(name, name)
-    elif mode == "semi":
-        return semi_product_partner_map.get(name, name)
-    else:
-        return name
 
+def clear_drive_cache():
+    """Drive 디스크 캐시 전체 삭제"""
+    with _drive_cache_lock:
+        if os.path.isdir(DRIVE_CACHE_DIR):
+            shutil.rmtree(DRIVE_CACHE_DIR)
+    print(f"🗑️ Drive 디스크 캐시 삭제 완료: {DRIVE_CACHE_DIR}")
 
-def extract_partner_from_action(action, 대분류, 중분류):
-    """
-    '작업자' 문자열에서 협력사를 추출.
-    - action에 'TMS' 포함 시
-      * 대분류가 '기구작업불량' 또는 (대분류가 '작업불량' & 중분류에 '기구') → 'TMS(M)'
-      * 대분류가 '전장작업불량' 또는 (대분류가 '작업불량' & 중분류에 '전장') → 'TMS(E)'
-    - 그 외 'BAT', 'FNI', 'P&S', 'C&A', 'TMS(M)', 'TMS(E)' 포함 시 바로 반환
-    - 그 외에는 "미기재" 반환
-    """
-    if not action or pd.isna(action):
-        return "미기재"
-    action = str(action).strip()
 
-    # 1) action 문자열 안에 'TMS'가 있으면
-    if "TMS" in action:
-        # 기구작업불량인 경우는 기구
-        if 대분류 == "기구작업불량":
-            return "TMS(M)"
-        # 전장작업불량인 경우는 전장
-        if 대분류 == "전장작업불량":
-            return "TMS(E)"
-        # 작업불량인 경우 중분류에 '기구' 또는 '전장'으로 구분
-        if 대분류 == "작업불량":
-            if "기구" in 중분류:
-                return "TMS(M)"
-            if "전장" in 중분류:
-                return "TMS(E)"
-        # 그 외 상황에서는 미기재
-        return "미기재"
+def _get_worker_http():
+    """워커 스레드 전용 인증 HTTP 전송 객체 (스레드당 1개, 자격 증명은 공유)"""
+    return _get_thread_http(resolve_key_path(DRIVE_JSON_KEY_PATH)).get()
 
-    # 2) 'TMS'가 아닐 때, 다른 키워드(BAT, FNI, P&S, C&A, TMS(M), TMS(E)) 검사
-    for partner in ["BAT", "FNI", "P&S", "C&A", "TMS(M)", "TMS(E)"]:
-        if partner in action:
-            return partner
 
-    return "미기재"
+def _as_float(value):
+    """숫자로 변환 (변환 불가 시 NaN)"""
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return float("nan")
 
 
-def get_partner_for_row(row):
-    """
-    1️⃣ 작업자가 있으면 extract_partner_from_action(action, 대분류, 중분류) 사용 → 우선 매핑
-    2️⃣ 없으면 대분류/중분류 기준으로 mech/elect 파트너 매핑
-    3️⃣ 대분류 == '부품불량'인 경우에도 중분류로 분기
-    4️⃣ 그 외는 '미기재'
-    """
-    대분류 = row.get("대분류", "")
-    중분류 = row.get("중분류", "")
-    mech_name = row.get("협력사(기구)명", "")
-    elec_name = row.get("협력사(전장)명", "")
-    action = row.get("작업자", "")
+def _as_int(value):
+    """정수로 변환 (변환 불가/NaN 시 0)"""
+    try:
+        return int(float(value))
+    except (TypeError, ValueError, OverflowError):
+        return 0
 
-    # 1️⃣ 작업자에 협력사가 명시된 경우 먼저 검사
-    action_partner = extract_partner_from_action(action, 대분류, 중분류)
-    if action_partner != "미기재":
-        return action_partner
 
-    # 2️⃣ 작업자가 미기재된 경우, 대분류/중분류로 mech/elect 협력사 결정
-    mech_partner = clean_partner_name(mech_name, mode="mech")
-    elec_partner = clean_partner_name(elec_name, mode="elec")
+# Drive 결과 파일 1개 공통 정보 (레코드마다 날짜 문자열을 복사하지 않고 공유)
+DriveResultFile = namedtuple("DriveResultFile", ["file_date", "group_month"])
 
-    if 대분류 == "작업불량":
-        if "전장" in 중분류:
-            return elec_partner if elec_partner else "미기재"
-        elif "기구" in 중분류:
-            return mech_partner if mech_partner else "미기재"
-        else:
-            return "미기재"
 
-    elif 대분류 == "기구작업불량":
-        return mech_partner if mech_partner else "미기재"
+class DriveResult:
+    """Drive 결과 레코드 1건 (KPI 계산에 쓰는 필드만 보관, 파일 날짜는 source로 공유)"""
 
-    elif 대분류 == "전장작업불량":
-        return elec_partner if elec_partner else "미기재"
+    __slots__ = (
+        "source",
+        "mech_partner",
+        "elec_partner",
+        "mech_nan_ratio",
+        "elec_nan_ratio",
+        "total_tasks",
+        "order_no",
+        "model_name",
+        "order_href",
+    )
 
-    elif 대분류 == "부품불량":
-        if "기구" in 중분류:
-            return mech_partner if mech_partner else "미기재"
-        elif "전장" in 중분류:
-            return elec_partner if elec_partner else "미기재"
-        else:
-            return "미기재"
+    def __init__(self, source, result):
+        ratios = result.get("ratios", {})
+        links = result.get("links", {})
+        self.source = source
+        self.mech_partner = result.get("mech_partner", "")
+        self.elec_partner = result.get("elec_partner", "")
+        self.mech_nan_ratio = _as_float(ratios.get("mech_nan_ratio", 0.0))
+        self.elec_nan_ratio = _as_float(ratios.get("elec_nan_ratio", 0.0))
+        self.total_tasks = _as_int(result.get("total_tasks", 0))
+        self.order_no = result.get("order_no", "")
+        self.model_name = result.get("model_name", "")
+        self.order_href = links.get("order_href", "")
+
+    @property
+    def file_date(self):
+        return self.source.file_date
+
+    @property
+    def group_month(self):
+        return self.source.group_month
+
+
+def _drive_result_source(file_date):
+    """결과 파일 날짜 → 레코드가 공유할 DriveResultFile"""
+    return DriveResultFile(file_date.isoformat(), file_date.strftime("%Y-%m"))
+
+
+def _to_drive_results(results, source, file_name):
+    """결과 dict 목록 → DriveResult 목록 (형식이 잘못된 레코드는 경고 후 제외)"""
+    records = []
+    for result in results:
+        try:
+            records.append(DriveResult(source, result))
+        except Exception as e:
+            print(f"⚠️ 파일 {file_name}: 데이터 처리 중 오류: {e}")
+    return records
 
-    else:
-        return "미기재"
 
+def _parse_result_file_date(file_name):
+    """결과 파일명에서 날짜 추출 (예: nan_ot_results_20250817_130753_일_7회차.json, 실패 시 None)"""
+    try:
+        date_str = file_name.split("_")[3]
+        return pd.to_datetime(date_str, format="%Y%m%d").date()
+    except (IndexError, ValueError) as e:
+        print(f"⚠️ 파일 {file_name}: 날짜 파싱 실패: {str(e)}")
+        return None
 
-def calculate_production_counts(production_df, target_month):
-    """생산대수 카운팅 함수 - DUAL 제품 2배, TMS(M) 특별 처리"""
-    # 협력사별 카운트 초기화
-    counts = {"BAT": 0, "FNI": 0, "TMS(M)": 0, "P&S": 0, "C&A": 0, "TMS(E)": 0}
-    tms_semi_product_count = 0  # TMS(M) 반제품 기여분
 
-    # 월별 필터링
-    original_count = len(production_df)
-    date_col = None
-    for col in ["발생일", "월", "일자", "등록일", "날짜", "공정검사일"]:
-        if col in production_df.columns:
-            date_col = col
-            break
+def _load_drive_result_file(file):
+    """Drive 결과 파일 1개 다운로드 및 파싱 (워커 스레드에서 실행, 실패 시 None)"""
+    file_name = file["name"]
+    file_date = _parse_result_file_date(file_name)
+    if file_date is None:
+        return None
 
-    if date_col:
-        print(f"DEBUG: 날짜 컬럼 '{date_col}' 사용하여 월별 필터링")
-        production_df[date_col] = pd.to_datetime(
-            production_df[date_col], errors="coerce"
-        )
-        production_df = production_df.dropna(subset=[date_col])
-        production_df["month"] = production_df[date_col].dt.strftime("%Y-%m")
-        production_df = production_df[production_df["month"] == target_month]
-        print(
-            f"DEBUG: {target_month} 필터링 - {original_count}건 → {len(production_df)}건"
-        )
-    else:
-        print(
-            f"DEBUG: 날짜 컬럼을 찾을 수 없음. 사용 가능한 컬럼: {list(production_df.columns)}"
+    try:
+        content = _read_drive_cache(file)
+        if content is not None:
+            print(f"💾 캐시된 JSON 파일 사용: {file_name}")
+        else:
+            print(f"📁 JSON 파일 로드 중: {file_name}")
+            request = get_drive_service().files().get_media(fileId=file["id"])
+            content = request.execute(http=_get_worker_http())
+            _write_drive_cache(file, content)
+        data = json.loads(content.decode("utf-8"))
+        if "results" not in data:
+            print(
+                f"⚠️ 파일 {file_name}: 'results' 키가 없습니다. JSON 구조: {list(data.keys())}"
+            )
+            return None
+        return _to_drive_results(
+            data["results"], _drive_result_source(file_date), file_name
         )
-        print("DEBUG: 월별 필터링 없이 전체 데이터 사용")
+    except Exception as e:
+        print(f"⚠️ 파일 {file_name} 처리 실패: {str(e)}")
+        return None
 
-    print(f"DEBUG: 생산대수 카운팅 시작 - 총 {len(production_df)}건")
 
-    for idx, row in production_df.iterrows():
-        product_name = str(row.get("제품명", "")).strip()
-        if not product_name:
-            continue
+def _drive_cache_matches(file, path):
+    """캐시 파일의 md5Checksum을 청크 단위로 검증 (불일치 시 삭제 후 False)"""
+    md5_checksum = file.get("md5Checksum")
+    if not md5_checksum:
+        return True
+    digest = hashlib.md5()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(DRIVE_STREAM_CHUNK_BYTES), b""):
+            digest.update(chunk)
+    if digest.hexdigest() == md5_checksum:
+        return True
+    print(f"⚠️ 캐시 파일 체크섬 불일치, 다시 다운로드: {file['name']}")
+    os.remove(path)
+    return False
+
+
+def _iter_drive_file_chunks(file):
+    """Drive 결과 파일 내용을 바이트 청크 단위로 반환 (디스크 캐시 우선, 다운로드 중 캐시 기록)"""
+    path = _drive_cache_path(file)
+    try:
+        cached = path is not None and os.path.exists(path) and _drive_cache_matches(file, path)
+    except OSError:
+        cached = False
+    if cached:
+        print(f"💾 캐시된 JSON 파일 사용: {file['name']}")
+        os.utime(path)  # LRU: 최근 사용 시각 갱신
+        with open(path, "rb") as f:
+            yield from iter(lambda: f.read(DRIVE_STREAM_CHUNK_BYTES), b"")
+        return
 
-        # DUAL 제품 처리: chamber 2개 = 2대 카운트
-        count = 2 if "DUAL" in product_name.upper() else 1
+    print(f"📁 JSON 파일 스트리밍 로드 중: {file['name']}")
+    request = get_drive_service().files().get_media(fileId=file["id"])
+    request.http = _get_worker_http()
+    buffer = io.BytesIO()
+    downloader = MediaIoBaseDownload(buffer, request, chunksize=DRIVE_STREAM_CHUNK_BYTES)
 
-        # 협력사별 카운팅 (매핑 기준)
-        mech_partner_raw = str(row.get("협력사(기구)명", "")).strip()
-        elec_partner_raw = str(row.get("협력사(전장)명", "")).strip()
+    tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp" if path else None
+    cache_file = None
+    if tmp_path:
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            cache_file = open(tmp_path, "wb")
+        except OSError as e:
+            print(f"⚠️ Drive 캐시 저장 실패: {file['name']} - {str(e)}")
+    try:
+        done = False
+        while not done:
+            _, done = downloader.next_chunk()
+            chunk = buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            if cache_file:
+                cache_file.write(chunk)
+            yield chunk
+        if cache_file:
+            cache_file.close()
+            _install_drive_cache_file(file, tmp_path, path)
+            cache_file = None
+    except OSError as e:
+        print(f"⚠️ Drive 캐시 저장 실패: {file['name']} - {str(e)}")
+    finally:
+        # 중간에 중단된 경우 불완전한 임시 파일 정리
+        if cache_file:
+            cache_file.close()
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
 
-        mech_partner = clean_partner_name(mech_partner_raw, "mech")
-        elec_partner = clean_partner_name(elec_partner_raw, "elec")
 
-        # 디버그 출력 (모든 제품 출력으로 변경)
-        if "DRAGON" in product_name.upper():
-            print(
-                f"DEBUG DRAGON: {product_name} -> 기구:{mech_partner_raw}->{mech_partner}, 전장:{elec_partner_raw}->{elec_partner}, 카운트:{count}"
-            )
-        elif idx < 10:  # 처음 10개 출력
-            print(
-                f"DEBUG: {product_name} -> 기구:{mech_partner_raw}->{mech_partner}, 전장:{elec_partner_raw}->{elec_partner}, 카운트:{count}"
+def iter_json_array_items(chunks, key="results"):
+    """
+    바이트 청크 스트림에서 최상위 객체의 key 배열 원소를 하나씩 파싱해 반환.
+    파일/배열 전체를 메모리에 올리지 않으며, key가 없으면 KeyError.
+    원소를 반환한 뒤에도 문서 끝까지 검증하므로 잘린 파일은 마지막에 오류가 난다.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    chunks = iter(chunks)
+    state = {"buf": "", "pos": 0, "eof": False}
+
+    def fill():
+        if state["eof"]:
+            return False
+        chunk = next(chunks, None)
+        if chunk is None:
+            state["eof"] = True
+            text = utf8.decode(b"", final=True)
+        else:
+            text = utf8.decode(chunk)
+        # 이미 파싱한 앞부분은 버려 버퍼 크기를 청크 수준으로 유지
+        state["buf"] = state["buf"][state["pos"]:] + text
+        state["pos"] = 0
+        return chunk is not None
+
+    def peek():
+        while True:
+            buf, pos = state["buf"], state["pos"]
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            state["pos"] = pos
+            if pos < len(buf):
+                return buf[pos]
+            if not fill() and state["pos"] >= len(state["buf"]):
+                return ""
+
+    def expect(char):
+        if peek() != char:
+            raise ValueError(f"JSON 형식 오류: '{char}' 필요 (위치 {state['pos']})")
+        state["pos"] += 1
+
+    def decode_value():
+        peek()
+        while True:
+            try:
+                value, end = decoder.raw_decode(state["buf"], state["pos"])
+                # 숫자 등이 청크 경계에서 잘리지 않았는지 다음 문자가 있을 때만 확정
+                if end < len(state["buf"]) or state["eof"]:
+                    state["pos"] = end
+                    return value
+            except json.JSONDecodeError:
+                if state["eof"]:
+                    raise
+            fill()
+
+    expect("{")
+    found = False
+    while True:
+        char = peek()
+        if char == ",":
+            state["pos"] += 1
+            continue
+        if char != '"':
+            expect("}")
+            break
+        name = decode_value()
+        expect(":")
+        if name != key or found:
+            decode_value()  # 다른 최상위 값은 건너뜀
+            continue
+        found = True
+        expect("[")
+        while True:
+            char = peek()
+            if char == "]":
+                state["pos"] += 1
+                break
+            if char == ",":
+                state["pos"] += 1
+                continue
+            yield decode_value()
+
+    # 닫는 '}' 뒤에는 공백만 허용 (json.loads와 같이 잘린/덧붙은 파일은 오류,
+    # 끝까지 읽으므로 다운로드 중인 캐시 파일 기록도 완료)
+    if peek():
+        raise ValueError(f"JSON 형식 오류: 객체 뒤 추가 데이터 (위치 {state['pos']})")
+    if not found:
+        raise KeyError(key)
+
+
+def _list_drive_files(query, fields=DRIVE_FILE_FIELDS):
+    """files().list 전체 페이지 조회 (nextPageToken을 따라 모든 페이지 수집)"""
+    files = []
+    page_token = None
+    while True:
+        response = (
+            get_drive_service()
+            .files()
+            .list(
+                q=query,
+                fields=f"nextPageToken, files({fields})",
+                orderBy="modifiedTime desc",
+                pageSize=DRIVE_LIST_PAGE_SIZE,
+                pageToken=page_token,
             )
+            .execute()
+        )
+        files.extend(response.get("files", []))
+        page_token = response.get("nextPageToken")
+        if not page_token:
+            return files
 
-        # 각 협력사에 카운팅 (기본 매핑)
-        if mech_partner in counts:
-            counts[mech_partner] += count
-        if elec_partner in counts:
-            counts[elec_partner] += count
 
-        # TMS(M) 반제품 기여분 별도 계산
-        semi_product_partner_raw = str(row.get("협력사(반제품)명", "")).strip()
-        semi_product_partner = clean_partner_name(semi_product_partner_raw, "semi")
+def _drive_catalog_path(drive_folder_id, yyyy_mm):
+    """월별 Drive 파일 목록(카탈로그) 저장 경로"""
+    return os.path.join(DRIVE_CACHE_DIR, "catalog", f"{drive_folder_id}_{yyyy_mm}.json")
 
-        if semi_product_partner == "TMS(M)":
-            tms_semi_product_count += count
-            if idx < 10:  # 디버깅용
-                print(
-                    f"DEBUG 반제품: {product_name} -> 반제품:{semi_product_partner_raw}->{semi_product_partner}, 카운트:{count}"
-                )
 
-    # TMS(M)에 반제품 기여분 추가
-    counts["TMS(M)"] += tms_semi_product_count
+def _load_drive_catalog(path):
+    """로컬 카탈로그 로드 (없거나 손상 시 빈 카탈로그)"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            catalog = json.load(f)
+        if isinstance(catalog.get("files"), dict):
+            return catalog
+    except (OSError, ValueError):
+        pass
+    return {"watermark": "", "files": {}}
 
-    print(f"\n📊 생산대수 카운팅 결과:")
-    for partner, count in counts.items():
-        if partner == "TMS(M)":
-            direct_count = count - tms_semi_product_count
-            print(
-                f"  {partner}: {count}대 (직접작업: {direct_count}대 + 반제품기여: {tms_semi_product_count}대)"
-            )
-        else:
-            print(f"  {partner}: {count}대")
 
-    # 전체 제품 카운트 분석
-    print(f"\n📋 전체 제품 카운트 분석:")
-    total_products = len(production_df)
+def _save_drive_catalog(path, catalog):
+    """로컬 카탈로그 원자적 저장"""
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(catalog, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"⚠️ Drive 카탈로그 저장 실패: {str(e)}")
+
+
+def _sorted_catalog_files(catalog):
+    """카탈로그 파일 목록 (modifiedTime desc)"""
+    return sorted(
+        catalog["files"].values(),
+        key=lambda file: file.get("modifiedTime", ""),
+        reverse=True,
+    )
 
-    # 제품명별 중복 제거 분석
-    unique_products = production_df["제품명"].value_counts()
-    print(f"  총 데이터 행 수: {total_products}개")
-    print(f"  고유 제품명 수: {len(unique_products)}개")
 
-    # 제품명별 상세 분석
-    print(f"\n📋 제품명별 상세 분석:")
-    dual_unique_count = 0
-    non_dual_unique_count = 0
-    dual_total_units = 0
-    non_dual_total_units = 0
-
-    for product_name, count in unique_products.items():
-        is_dual = "DUAL" in product_name.upper()
-        units_per_item = 2 if is_dual else 1
-        total_units_for_product = count * units_per_item
-
-        if is_dual:
-            dual_unique_count += 1
-            dual_total_units += total_units_for_product
-        else:
-            non_dual_unique_count += 1
-            non_dual_total_units += total_units_for_product
+def sync_drive_file_list(
+    year_month, drive_folder_id=None, incremental=None, refresh_listing=True
+):
+    """특정 연도-월의 Drive 결과 파일 목록 조회 (modifiedTime desc)
+
+    incremental=True면 로컬 카탈로그의 modifiedTime 워터마크 이후 파일만 조회해 병합하고,
+    False면 전체 목록을 다시 조회해 카탈로그를 재구성한다 (기본값 DRIVE_INCREMENTAL_SYNC).
+    증분 동기화 때도 현재 파일 id 목록(id만 조회)을 받아 삭제되거나 휴지통으로 간 파일은 카탈로그에서 제거한다.
+    refresh_listing=False면 Drive를 조회하지 않고 로컬 카탈로그만 사용한다
+    (prime_drive_catalogs()로 미리 받아 둔 경우).
+    """
+    drive_folder_id = drive_folder_id or DRIVE_FOLDER_ID
+    if incremental is None:
+        incremental = DRIVE_INCREMENTAL_SYNC
+    yyyy_mm = year_month.replace("-", "")
+    query = (
+        f"'{drive_folder_id}' in parents and name contains 'nan_ot_results_{yyyy_mm}'"
+        " and trashed = false"
+    )
 
+    catalog_path = _drive_catalog_path(drive_folder_id, yyyy_mm)
+    if not refresh_listing:
+        catalog = _load_drive_catalog(catalog_path)
+        print(f"📂 로컬 Drive 카탈로그 사용: {year_month} {len(catalog['files'])}개")
+        return _sorted_catalog_files(catalog)
+
+    catalog = (
+        _load_drive_catalog(catalog_path)
+        if incremental
+        else {"watermark": "", "files": {}}
+    )
+    removed_ids = []
+    if catalog["watermark"]:
+        # 삭제/휴지통 파일은 modifiedTime이 바뀌지 않아 증분 조회에 나오지 않으므로 현재 id 목록과 대조해 제거
+        live_ids = {file["id"] for file in _list_drive_files(query, fields="id")}
+        removed_ids = [file_id for file_id in catalog["files"] if file_id not in live_ids]
+        for file_id in removed_ids:
+            del catalog["files"][file_id]
+        # 같은 시각에 수정된 파일을 놓치지 않도록 >= 사용 (id 기준 병합이라 중복 무해)
+        query += f" and modifiedTime >= '{catalog['watermark']}'"
+
+    print(f"Google Drive 조회 - 폴더 ID: {drive_folder_id}, 쿼리: {query}")
+    new_files = _list_drive_files(query)
+    changed = (
+        not incremental
+        or bool(removed_ids)
+        or any(catalog["files"].get(file["id"]) != file for file in new_files)
+    )
+    for file in new_files:
+        catalog["files"][file["id"]] = file
+    catalog["watermark"] = max(
+        (file.get("modifiedTime", "") for file in catalog["files"].values()),
+        default="",
+    )
+    if changed:  # 변경이 없으면 카탈로그 파일을 다시 쓰지 않음
+        _save_drive_catalog(catalog_path, catalog)
+    if incremental:
         print(
-            f"  {product_name}: {count}개 × {units_per_item}대 = {total_units_for_product}대"
+            f"🔄 Drive 증분 동기화: 신규/변경 {len(new_files)}개, 삭제 {len(removed_ids)}개, "
+            f"전체 {len(catalog['files'])}개"
         )
 
-    print(f"\n📊 요약:")
-    print(f"  고유 DUAL 제품명: {dual_unique_count}개 → 총 {dual_total_units}대")
+    return _sorted_catalog_files(catalog)
+
+
+def prime_drive_catalogs(year_months, drive_folder_id=None):
+    """여러 달의 결과 파일 목록을 한 번의 Drive 목록 조회로 받아 월별 카탈로그에 저장 (백필용)"""
+    drive_folder_id = drive_folder_id or DRIVE_FOLDER_ID
+    query = (
+        f"'{drive_folder_id}' in parents and name contains 'nan_ot_results_'"
+        " and trashed = false"
+    )
+    print(f"Google Drive 일괄 조회 - 폴더 ID: {drive_folder_id}, 쿼리: {query}")
+    files = _list_drive_files(query)
+
+    for year_month in year_months:
+        yyyy_mm = year_month.replace("-", "")
+        prefix = f"nan_ot_results_{yyyy_mm}"
+        month_files = {file["id"]: file for file in files if prefix in file["name"]}
+        catalog = {
+            "watermark": max(
+                (file.get("modifiedTime", "") for file in month_files.values()),
+                default="",
+            ),
+            "files": month_files,
+        }
+        _save_drive_catalog(_drive_catalog_path(drive_folder_id, yyyy_mm), catalog)
     print(
-        f"  고유 일반 제품명: {non_dual_unique_count}개 → 총 {non_dual_total_units}대"
+        f"📂 Drive 목록 1회 조회로 {len(year_months)}개월 카탈로그 저장 (전체 {len(files)}개)"
     )
-    print(f"  전체 생산대수: {dual_total_units + non_dual_total_units}대")
 
-    # DRAGON 제품 상세 분석
-    dragon_products = production_df[
-        production_df["제품명"].str.contains("DRAGON", case=False, na=False)
-    ]
-    if not dragon_products.empty:
-        print(f"\n🐉 DRAGON 제품 상세 분석:")
-        dragon_summary = dragon_products["제품명"].value_counts()
-        dragon_total_units = 0
-        for product, count in dragon_summary.items():
-            dual_multiplier = 2 if "DUAL" in product.upper() else 1
-            total_units_for_product = count * dual_multiplier
-            dragon_total_units += total_units_for_product
-            print(
-                f"  {product}: {count}개 제품 × {dual_multiplier}대 = {total_units_for_product}대"
-            )
-        print(f"  DRAGON 총계: {dragon_total_units}대")
 
-    return counts
+def _select_target_files(files, year_month):
+    """주차별 요일 기준으로 로드할 결과 파일 선택 (33주차부터 일요일, 32주차 이하 금요일)"""
+    # 주차별 요일 선택 로직: 33주차부터 일요일, 32주차 이하는 금요일
+    target_files = []
+    sunday_files = [f for f in files if "_일_" in f["name"]]
+    friday_files = [f for f in files if "_금_" in f["name"]]
 
+    # 모든 파일에서 주차 정보 추출하여 조건부 선택
+    for file in files:
+        try:
+            # 파일명에서 날짜 추출 (예: nan_ot_results_20250817_130753_일_7회차.json)
+            parts = file["name"].split("_")
+            if len(parts) >= 4:
+                date_str = parts[3]  # 20250817
+                if len(date_str) == 8:
+                    year = int(date_str[:4])
+                    month = int(date_str[4:6])
+                    day = int(date_str[6:8])
+
+                    file_date = datetime.date(year, month, day)
+                    week_num = file_date.isocalendar()[1]
+
+                    # 33주차부터 일요일, 32주차 이하는 금요일
+                    if week_num >= 33 and "_일_" in file["name"]:
+                        target_files.append(file)
+                    elif week_num <= 32 and "_금_" in file["name"]:
+                        target_files.append(file)
+        except (ValueError, IndexError) as e:
+            continue
 
-def assign_nan_grade(nan_ratio):
-    """NaN 비율 등급 부여 (새로운 엄격한 기준)"""
-    if nan_ratio < 1.0:
-        return "A"  # 1% 미만 (우수)
-    elif nan_ratio < 3.0:
-        return "B"  # 1~3% (양호)
-    elif nan_ratio < 6.0:
-        return "C"  # 3~6% (보통)
-    else:
-        return "D"  # 6% 이상 (개선필요)
+    if not target_files:
+        print(f"⚠️ {year_month}에 조건에 맞는 JSON 파일이 없습니다.")
+        print(f"   - 일요일 파일: {len(sunday_files)}개")
+        print(f"   - 금요일 파일: {len(friday_files)}개")
+        return []
 
+    weekday_type = (
+        "일요일" if any("_일_" in f["name"] for f in target_files) else "금요일"
+    )
+    print(
+        f"총 {len(target_files)}개의 {weekday_type} JSON 파일 로드 (33주차부터 일요일, 32주차 이하 금요일)"
+    )
+    return target_files
 
-# 불량률 기준 등급 (REV2 기준)
-DEFECT_RATE_THRESHOLDS = {
-    "MECH": {  # 기구 협력사 (BAT, FNI, TMS(M))
-        "A": 6.0,  # 6.0% 미만
-        "B": 16.5,  # 6.0~16.5%
-        "C": 27.6,  # 16.5~27.6%
-        "D": float("inf"),  # 27.6% 이상
-    },
-    "ELEC": {  # 전장 협력사 (TMS(E), P&S, C&A)
-        "A": 1.0,  # 1.0% 미만
-        "B": 3.6,  # 1.0~3.6%
-        "C": 6.2,  # 3.6~6.2%
-        "D": 7.5,  # 6.2~7.5%
-        "E": float("inf"),  # 7.5% 이상
-    },
-}
 
+# 빌드 캐시: 정규화한 입력(Drive 파일 id/체크섬, 시트 스냅샷 해시, 기준값, 코드)의 다이제스트가
+# 마지막 성공 빌드와 같으면 집계/렌더링/업로드를 건너뜀 (false면 매번 다시 빌드)
+BUILD_CACHE = os.getenv("BUILD_CACHE", "true").lower() == "true"
+BUILD_DIGEST_SUFFIX = ".digest"  # 산출물 옆에 마지막 성공 빌드의 입력 다이제스트 저장
 
-def calculate_defect_rate(defect_count, production_count):
-    """불량률 계산 - (불량건수 ÷ 생산대수) × 100"""
-    if production_count == 0:
-        print(f"⚠️ 생산대수가 0입니다. 불량률을 계산할 수 없습니다.")
-        return 0.0
 
-    defect_rate = (defect_count / production_count) * 100
-    return round(defect_rate, 2)
+def drive_input_fingerprint(year_month, drive_folder_id=None, refresh_listing=True):
+    """빌드 다이제스트용 Drive 입력: 로드 대상 결과 파일의 [id, 이름, md5Checksum(없으면 modifiedTime)]"""
+    files = sync_drive_file_list(
+        year_month, drive_folder_id, refresh_listing=refresh_listing
+    )
+    return sorted(
+        [file["id"], file["name"], file.get("md5Checksum") or file.get("modifiedTime", "")]
+        for file in _select_target_files(files, year_month)
+    )
 
 
-def assign_defect_grade_by_rate(defect_rate, partner_type):
-    """불량률 기준 등급 부여"""
-    partner_category = "MECH" if partner_type in ["BAT", "FNI", "TMS(M)"] else "ELEC"
-    thresholds = DEFECT_RATE_THRESHOLDS[partner_category]
+def frame_digest(df):
+    """DataFrame 내용(컬럼명 + 행 해시) sha256 (None이면 빈 문자열)"""
+    if df is None:
+        return ""
+    hasher = hashlib.sha256(
+        json.dumps([str(column) for column in df.columns], ensure_ascii=False).encode("utf-8")
+    )
+    hasher.update(pd.util.hash_pandas_object(df, index=True).to_numpy().tobytes())
+    return hasher.hexdigest()
 
-    for grade in ["A", "B", "C", "D", "E"]:
-        if grade in thresholds and defect_rate < thresholds[grade]:
-            return grade
-    return "E"  # 최하등급
 
+@lru_cache(maxsize=None)
+def source_fingerprint(*paths):
+    """빌드 로직 파일(모듈 폴더 기준 상대 경로) 내용 sha256 - 코드/기준값이 바뀌면 다시 빌드"""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    hasher = hashlib.sha256()
+    for path in paths:
+        with open(os.path.join(base_dir, path), "rb") as f:
+            hasher.update(path.encode("utf-8") + b"\0" + f.read() + b"\0")
+    return hasher.hexdigest()
 
-def assign_defect_grade(count, partner_type):
-    """불량 건수 등급 부여 (기존 방식 - 하위호환성용)"""
-    if partner_type in ["BAT", "FNI", "TMS(M)"]:
-        if count <= 5:
-            return "A"
-        elif count <= 10:
-            return "B"
-        elif count <= 15:
-            return "C"
-        else:
-            return "D"
-    else:  # 전장: C&A, P&S, TMS(E)
-        if count <= 1:
-            return "A"
-        elif count <= 3:
-            return "B"
-        elif count <= 6:
-            return "C"
-        elif count <= 9:
-            return "D"
-        else:
-            return "E"
 
+def input_digest(inputs):
+    """빌드 입력 dict → 정규화(키 정렬 JSON) 후 sha256"""
+    normalized = json.dumps(inputs, ensure_ascii=False, sort_keys=True, default=str)
+    return hashlib.sha256(normalized.encode("utf-8")).hexdigest()
 
-def grade_to_score(grade):
-    """등급을 10점 만점 점수로 변환"""
-    grade_map = {"A": 10, "B": 7.5, "C": 5, "D": 2.5, "E": 0}
-    return grade_map.get(grade, 0)
 
+def read_build_digest(output_path):
+    """산출물의 마지막 성공 빌드 다이제스트 (산출물이나 기록이 없으면 None)"""
+    if not os.path.exists(output_path):
+        return None
+    try:
+        with open(output_path + BUILD_DIGEST_SUFFIX, "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
 
-def score_to_grade(score):
-    """평균 점수를 등급으로 변환 (내림)"""
-    if score >= 8.75:
-        return "A"
-    elif score >= 6.25:
-        return "B"
-    elif score >= 3.75:
-        return "C"
-    elif score >= 1.25:
-        return "D"
-    else:
-        return "E"
+
+def write_build_digest(output_path, digest):
+    """성공한 빌드의 입력 다이제스트를 산출물 옆에 기록"""
+    with open(output_path + BUILD_DIGEST_SUFFIX, "w", encoding="utf-8") as f:
+        f.write(digest + "\n")
 
 
-def upload_to_github(file_path, repo_name, branch, file_in_repo, token):
-    """GitHub에 파일 업로드"""
+def load_json_files_from_drive(
+    year_month,
+    drive_folder_id=None,
+    max_workers=None,
+    incremental=None,
+    refresh_listing=True,
+):
+    """Google Drive에서 특정 연도-월의 JSON 파일 로드 (33주차부터 일요일, 32주차 이하는 금요일)
+
+    파일 다운로드/파싱은 최대 max_workers개(기본 DRIVE_DOWNLOAD_WORKERS)씩 동시에 수행하며,
+    결과는 파일 목록 순서(modifiedTime desc)대로 합쳐진다.
+    이미 받은 파일은 DRIVE_CACHE_DIR 디스크 캐시(id + modifiedTime/md5Checksum 기준)에서 읽고,
+    로드한 월 데이터는 (폴더 ID, 연도-월) 단위로 메모리에 캐시한다 (invalidate_json_cache로 무효화).
+    파일 목록은 sync_drive_file_list()로 페이지 단위 조회/증분 동기화한다
+    (refresh_listing=False면 로컬 카탈로그만 사용).
+    """
+    drive_folder_id = drive_folder_id or DRIVE_FOLDER_ID
+    cache_key = (drive_folder_id, year_month)
+    cached_data = _get_cached_json_data(cache_key)
+    if cached_data is not None:
+        print(f"캐싱된 JSON 데이터 사용: {year_month}")
+        return cached_data
+
+    print(f"지정된 연도-월: {year_month}")
     try:
-        print(f"GitHub 업로드 시작: {repo_name}/{file_in_repo}")
-        g = Github(token)
-        repo = g.get_repo(repo_name)
-        with open(file_path, "r", encoding="utf-8") as f:
-            content = f.read()
-        try:
-            contents = repo.get_contents(file_in_repo, ref=branch)
-            repo.update_file(
-                contents.path,
-                f"Update {file_in_repo}",
-                content,
-                contents.sha,
-                branch=branch,
-            )
-            print(f"✅ GitHub 파일 업데이트 성공: {repo_name}/{file_in_repo}")
-        except:
-            repo.create_file(
-                file_in_repo, f"Create {file_in_repo}", content, branch=branch
-            )
-            print(f"✅ GitHub 파일 생성 성공: {repo_name}/{file_in_repo}")
-        return f"https://raw.githubusercontent.com/{repo_name}/{branch}/{file_in_repo}"
-    except Exception as e:
-        print(f"❌ GitHub 업로드 실패: {repo_name}/{file_in_repo} - {str(e)}")
-        return None
+        files = sync_drive_file_list(
+            year_month, drive_folder_id, incremental, refresh_listing
+        )
+        if not files:
+            print(f"⚠️ {year_month}에 해당하는 JSON 파일이 없습니다.")
+            return []
 
+        target_files = _select_target_files(files, year_month)
+        if not target_files:
+            return []
 
-def generate_nan_details(json_data):
-    """주간별 NaN 디테일 데이터 생성"""
-    nan_details = {
-        "BAT": [],
-        "FNI": [],
-        "TMS(M)": [],
-        "C&A": [],
-        "P&S": [],
-        "TMS(E)": [],
-    }
+        workers = max(1, min(max_workers or DRIVE_DOWNLOAD_WORKERS, len(target_files)))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            # map()은 입력 순서대로 결과를 반환하므로 파일 순서가 유지됨
+            file_results = list(executor.map(_load_drive_result_file, target_files))
 
-    # 메인 로직과 동일한 방식으로 데이터 처리
-    all_nan_data = []
-    for d in json_data:
-        try:
-            ratios = d.get("ratios", {})
-            mech_partner_clean = clean_partner_name(
-                d.get("mech_partner", ""), mode="mech"
-            )
-            elec_partner_clean = clean_partner_name(
-                d.get("elec_partner", ""), mode="elec"
-            )
+        data_list = []
+        for results in file_results:
+            if results:
+                data_list.extend(results)
 
-            entry = {
-                "group_month": d["group_month"],
-                "file_date": d.get("file_date", ""),
-                "mech_partner": mech_partner_clean,
-                "elec_partner": elec_partner_clean,
-                "bat_nan_ratio": (
-                    ratios.get("mech_nan_ratio", 0.0)
-                    if mech_partner_clean == "BAT"
-                    else 0.0
-                ),
-                "fni_nan_ratio": (
-                    ratios.get("mech_nan_ratio", 0.0)
-                    if mech_partner_clean == "FNI"
-                    else 0.0
-                ),
-                "tms_m_nan_ratio": (
-                    ratios.get("mech_nan_ratio", 0.0)
-                    if mech_partner_clean == "TMS(M)"
-                    else 0.0
-                ),
-                "cna_nan_ratio": (
-                    ratios.get("elec_nan_ratio", 0.0)
-                    if elec_partner_clean == "C&A"
-                    else 0.0
-                ),
-                "pns_nan_ratio": (
-                    ratios.get("elec_nan_ratio", 0.0)
-                    if elec_partner_clean == "P&S"
-                    else 0.0
-                ),
-                "tms_e_nan_ratio": (
-                    ratios.get("elec_nan_ratio", 0.0)
-                    if elec_partner_clean == "TMS(E)"
-                    else 0.0
-                ),
-            }
-            all_nan_data.append(entry)
-        except Exception as e:
-            print(f"⚠️ 데이터 처리 중 오류: {e}")
-            continue
+        if data_list:
+            _set_cached_json_data(cache_key, data_list)
+        print(f"📂 총 {len(data_list)}개의 로그 데이터를 로드했습니다.")
+        return data_list
+    except Exception as e:
+        print(f"Google Drive API 호출 실패: {str(e)}")
+        return []
 
-    # pandas DataFrame으로 변환하여 메인 로직과 동일한 처리
-    import pandas as pd
 
-    df = pd.DataFrame(all_nan_data)
+def iter_drive_results(
+    year_month, drive_folder_id=None, incremental=None, refresh_listing=True
+):
+    """스트리밍 모드: 대상 결과 파일을 순서대로 청크 단위 파싱하며 레코드를 하나씩 반환
 
-    # 날짜별로 그룹핑하여 평균 계산 (메인 로직과 동일)
-    for file_date in df["file_date"].unique():
-        date_data = df[df["file_date"] == file_date]
+    load_json_files_from_drive()와 같은 파일/순서를 사용하지만 월 전체 목록을 만들거나
+    메모리 캐시에 두지 않는다. 파일 하나를 끝까지 파싱한 뒤 그 파일의 레코드를 반환하므로
+    (메모리에는 파일 1개 분량의 DriveResult만) 잘렸거나 다운로드 중 실패한 파일은
+    비스트리밍 모드와 같이 레코드 전체를 건너뛴다.
+    """
+    drive_folder_id = drive_folder_id or DRIVE_FOLDER_ID
+    print(f"지정된 연도-월: {year_month} (스트리밍)")
+    try:
+        files = sync_drive_file_list(
+            year_month, drive_folder_id, incremental, refresh_listing
+        )
+    except Exception as e:
+        print(f"Google Drive API 호출 실패: {str(e)}")
+        return
+    if not files:
+        print(f"⚠️ {year_month}에 해당하는 JSON 파일이 없습니다.")
+        return
 
-        # 주차 정보 추출 - 동적 계산으로 개선
+    record_count = 0
+    for file in _select_target_files(files, year_month):
+        file_date = _parse_result_file_date(file["name"])
+        if file_date is None:
+            continue
+        source = _drive_result_source(file_date)
         try:
-            date_obj = pd.to_datetime(file_date).date()
-            week_num = date_obj.isocalendar()[1]  # ISO 주차 계산
-            week = f"{week_num}W"
-            print(f"DEBUG: {file_date} -> {week}")
+            file_records = [
+                record
+                for result in iter_json_array_items(_iter_drive_file_chunks(file))
+                for record in _to_drive_results([result], source, file["name"])
+            ]
+        except KeyError:
+            print(f"⚠️ 파일 {file['name']}: 'results' 키가 없습니다.")
+            continue
         except Exception as e:
-            print(f"⚠️ 날짜 {file_date} 주차 계산 실패: {e}")
+            print(f"⚠️ 파일 {file['name']} 처리 실패: {str(e)}")
             continue
+        record_count += len(file_records)
+        yield from file_records
+    print(f"📂 총 {record_count}개의 로그 데이터를 스트리밍으로 처리했습니다.")
 
-        # 각 협력사별 평균 계산
-        partners = {
-            "BAT": date_data["bat_nan_ratio"].mean(),
-            "FNI": date_data["fni_nan_ratio"].mean(),
-            "TMS(M)": date_data["tms_m_nan_ratio"].mean(),
-            "C&A": date_data["cna_nan_ratio"].mean(),
-            "P&S": date_data["pns_nan_ratio"].mean(),
-            "TMS(E)": date_data["tms_e_nan_ratio"].mean(),
-        }
 
-        for partner, avg_ratio in partners.items():
-            nan_details[partner].append({"week": week, "ratio": round(avg_ratio, 2)})
+# 실행 단위 Sheets 스냅샷 (불량/생산대수 DataFrame을 한 번의 batchGet으로 로드해 공유)
+SheetsSnapshot = namedtuple("SheetsSnapshot", ["defect_df", "production_df"])
+_sheets_snapshot = None
+_sheets_snapshot_lock = threading.Lock()
 
-    # 월평균 계산
-    for partner in nan_details:
-        if nan_details[partner]:
-            monthly_avg = sum(item["ratio"] for item in nan_details[partner]) / len(
-                nan_details[partner]
+
+def _parse_sheet_range(sheet_range):
+    """'시트명!A:AJ' 형식 범위 → (시트명, 시작 열, 끝 열) (행 번호는 무시)"""
+    sheet_name, cells = sheet_range.rsplit("!", 1)
+    start_col, end_col = cells.split(":")
+    return sheet_name, re.sub(r"\d+", "", start_col), re.sub(r"\d+", "", end_col)
+
+
+def get_sheet_row_counts():
+    """스프레드시트의 시트별 실제 행 수 (gridProperties.rowCount)"""
+    result = (
+        get_sheets_service()
+        .spreadsheets()
+        .get(
+            spreadsheetId=SPREADSHEET_ID,
+            fields="sheets(properties(title,gridProperties(rowCount)))",
+        )
+        .execute()
+    )
+    return {
+        sheet["properties"]["title"]: sheet["properties"]
+        .get("gridProperties", {})
+        .get("rowCount", 0)
+        for sheet in result.get("sheets", [])
+    }
+
+
+def get_spreadsheet_version():
+    """스프레드시트 파일의 Drive version (셀 하나만 바뀌어도 증가, 조회 실패 시 None)"""
+    try:
+        result = (
+            _get_service("drive", "v3", resolve_key_path(SHEETS_JSON_KEY_PATH))
+            .files()
+            .get(fileId=SPREADSHEET_ID, fields="version")
+            .execute()
+        )
+    except Exception as e:
+        print(f"⚠️ 스프레드시트 version 조회 실패, 전체 조회: {str(e)}")
+        return None
+    return result.get("version")
+
+
+def _open_sheets_snapshot():
+    """로컬 Sheets 스냅샷(SQLite) 연결 (SHEETS_SNAPSHOT_PATH가 비어 있으면 메모리 DB)"""
+    path = SHEETS_SNAPSHOT_PATH or ":memory:"
+    if path != ":memory:":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    conn = sqlite3.connect(path)
+    if conn.execute("PRAGMA user_version").fetchone()[0] != SHEETS_SNAPSHOT_SCHEMA:
+        # 이전 구조(블록 해시 증분 동기화)의 스냅샷은 버리고 다시 만든다
+        conn.executescript(
+            """
+            DROP TABLE IF EXISTS sheet_meta;
+            DROP TABLE IF EXISTS sheet_rows;
+            DROP TABLE IF EXISTS sheet_blocks;
+            """
+        )
+        conn.execute(f"PRAGMA user_version = {SHEETS_SNAPSHOT_SCHEMA}")
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS sheet_meta (
+            sheet_key TEXT PRIMARY KEY,
+            columns TEXT,
+            version TEXT NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS sheet_rows (
+            sheet_key TEXT NOT NULL,
+            row_no INTEGER NOT NULL,
+            data TEXT NOT NULL,
+            PRIMARY KEY (sheet_key, row_no)
+        );
+        """
+    )
+    return conn
+
+
+def _encode_sheet_row(row):
+    """시트 행 값 → 스냅샷 저장용 문자열"""
+    return json.dumps(row, ensure_ascii=False, separators=(",", ":"))
+
+
+def _fetch_sheet_rows(jobs, chunk_rows, on_rows):
+    """jobs의 [start_row, end_row] 범위를 chunk_rows행씩 읽어 on_rows(job, [(행 번호, 값)]) 호출
+
+    매 batchGet 요청에 대기 중인 모든 job의 다음 청크를 함께 담고, 빈 행은 전달하지 않는다.
+    """
+    for job in jobs:
+        job["next_row"] = job["start_row"]
+    while True:
+        pending = [job for job in jobs if job["next_row"] <= job["end_row"]]
+        if not pending:
+            return
+        ranges = []
+        for job in pending:
+            sheet = job["sheet"]
+            job["chunk_end"] = min(job["next_row"] + chunk_rows - 1, job["end_row"])
+            ranges.append(
+                f"{sheet['name']}!{sheet['start_col']}{job['next_row']}:"
+                f"{sheet['end_col']}{job['chunk_end']}"
             )
-            nan_details[partner].append(
-                {"week": "월평균", "ratio": round(monthly_avg, 2)}
+        result = (
+            get_sheets_service()
+            .spreadsheets()
+            .values()
+            .batchGet(spreadsheetId=SPREADSHEET_ID, ranges=ranges)
+            .execute()
+        )
+        # valueRanges는 요청한 ranges 순서대로 반환됨
+        value_ranges = result.get("valueRanges", [])
+        for i, job in enumerate(pending):
+            values = value_ranges[i].get("values", []) if i < len(value_ranges) else []
+            on_rows(
+                job,
+                [(job["next_row"] + offset, row) for offset, row in enumerate(values) if row],
             )
+            job["next_row"] = job["chunk_end"] + 1
 
-    return nan_details
 
+def _sheet_key(sheet_range):
+    """스냅샷 시트 키 (스프레드시트 ID/시트명)"""
+    return f"{SPREADSHEET_ID}/{_parse_sheet_range(sheet_range)[0]}"
 
-def generate_html(
-    mech_df, elec_df, month, defect_details, nan_details=None, production_counts=None
-):
-    """현대 대시보드 형식 HTML 생성 (기구/전장 그룹 분리, 클릭 이벤트 추가, 불량률 기반)"""
-    defect_details_json = json.dumps(defect_details, ensure_ascii=False)
-    nan_details_json = json.dumps(nan_details or {}, ensure_ascii=False)
-    production_counts = production_counts or {}
-    print(f"DEBUG: defect_details_json: {defect_details_json}")
-
-    css = """
-    <style>
-        .chart-section { margin: 10px; }
-        .kpi-container { display: flex; flex-wrap: wrap; justify-content: center; }
-        .kpi-card { 
-            width: 130px; height: 130px; margin: 10px; 
-            background: #f8f9fa; border-radius: 8px; 
-            display: flex; flex-direction: column; align-items: center; justify-content: center; 
-            position: relative; box-shadow: 0 2px 5px rgba(0,0,0,0.1); 
-            cursor: pointer; transition: transform 0.2s;
-        }
-        .kpi-card:hover { transform: translateY(-2px); }
-        .emoji { font-size: 2em; }
-        .label { font-size: 1.2em; font-weight: bold; margin-top: 5px; }
-        .tooltip { 
-            visibility: hidden; width: 200px; background-color: #555; color: #fff; 
-            text-align: center; border-radius: 6px; padding: 8px; 
-            position: absolute; z-index: 1; top: 100%; left: 50%; 
-            transform: translateX(-50%); opacity: 0; transition: opacity 0.3s; 
-            font-size: 12px; white-space: nowrap;
-        }
-        .kpi-card:hover .tooltip { visibility: visible; opacity: 1; }
-        .defect-table, .nan-table { 
-            width: 100%; max-width: 800px; margin: 10px auto; border-collapse: collapse; 
-            background: #fff; box-shadow: 0 2px 5px rgba(0,0,0,0.1); border-radius: 8px;
-            overflow: hidden;
-        }
-        .defect-table th, .defect-table td, .nan-table th, .nan-table td { 
-            border: 1px solid #ddd; padding: 12px; text-align: left; 
-        }
-        .defect-table th { 
-            background-color: #f2f2f2; font-weight: bold; 
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white;
-        }
-        .nan-table th { 
-            background-color: #f2f2f2; font-weight: bold; 
-            background: linear-gradient(135deg, #ff9800 0%, #f57c00 100%);
-            color: white;
-        }
-        .defect-table tbody tr:nth-child(even), .nan-table tbody tr:nth-child(even) { background-color: #f9f9f9; }
-        .defect-table tbody tr:hover, .nan-table tbody tr:hover { background-color: #e8f4f8; }
-        .hidden { display: none; }
-        .download-btn { 
-            margin: 10px 0; padding: 8px 16px; 
-            background: linear-gradient(135deg, #4CAF50, #45a049);
-            color: white; border: none; border-radius: 4px; 
-            cursor: pointer; font-weight: bold; transition: all 0.3s;
-        }
-        .download-btn:hover { 
-            background: linear-gradient(135deg, #45a049, #3d8b40);
-            transform: translateY(-1px);
-        }
-        .section-title {
-            text-align: center; margin: 20px 0;
-            font-size: 24px; font-weight: bold;
-            color: #333; text-shadow: 1px 1px 2px rgba(0,0,0,0.1);
-        }
-        .grade-a { border-left: 4px solid #4CAF50; }
-        .grade-b { border-left: 4px solid #2196F3; }
-        .grade-c { border-left: 4px solid #FF9800; }
-        .grade-d { border-left: 4px solid #f44336; }
-        .grade-e { border-left: 4px solid #9C27B0; }
-        .evaluation-overview {
-            max-width: 1200px; margin: 30px auto; padding: 20px;
-            background: #f8f9fa; border-radius: 10px;
-            box-shadow: 0 2px 10px rgba(0,0,0,0.1);
-        }
-        .overview-table {
-            width: 100%; border-collapse: collapse; margin: 15px 0;
-            background: white; border-radius: 8px; overflow: hidden;
-        }
-        .overview-table th, .overview-table td {
-            border: 1px solid #ddd; padding: 12px; text-align: center;
-        }
-        .overview-table th {
-            background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-            color: white; font-weight: bold;
-        }
-        .overview-table tbody tr:nth-child(even) { background-color: #f9f9f9; }
-        .grade-detail { font-size: 0.9em; color: #666; }
-        .weight-info { 
-            background: #e3f2fd; padding: 15px; border-radius: 8px; 
-            margin: 15px 0; border-left: 4px solid #2196F3;
-        }
-        .main-title {
-            position: relative;
-            display: inline-block;
-            cursor: help;
-        }
-        .main-title-tooltip {
-            visibility: hidden;
-            position: absolute;
-            top: 100%;
-            left: 50%;
-            transform: translateX(-50%);
-            background: #fff;
-            border: 2px solid #667eea;
-            border-radius: 10px;
-            padding: 20px;
-            box-shadow: 0 4px 20px rgba(0,0,0,0.15);
-            z-index: 1000;
-            width: 800px;
-            max-width: 90vw;
-            opacity: 0;
-            transition: all 0.3s ease;
-            font-size: 14px;
-            text-align: left;
-            color: #333;
-        }
-        .main-title:hover .main-title-tooltip {
-            visibility: visible;
-            opacity: 1;
-        }
-        .tooltip-section {
-            margin-bottom: 15px;
-        }
-        .tooltip-section h4 {
-            margin: 0 0 8px 0;
-            color: #1976d2;
-            font-size: 16px;
-        }
-        .tooltip-section p {
-            margin: 5px 0;
-            line-height: 1.4;
-        }
-        .tooltip-table {
-            width: 100%;
-            border-collapse: collapse;
-            margin: 10px 0;
-            font-size: 12px;
-        }
-        .tooltip-table th, .tooltip-table td {
-            border: 1px solid #ddd;
-            padding: 8px;
-            text-align: left;
-        }
-        .tooltip-table th {
-            background: #f5f5f5;
-            font-weight: bold;
-        }
-        .tooltip-grade-detail {
-            font-size: 11px;
-            line-height: 1.3;
-        }
-    </style>
-    """
 
-    html = f"""
-    <!DOCTYPE html>
-    <html lang="ko">
-    <head>
-        <meta charset="UTF-8">
-        <meta name="viewport" content="width=device-width, initial-scale=1.0">
-        <title>협력사 평가 대시보드 - {month}</title>
-        {css}
-        <script>
-            const defectDetails = {defect_details_json};
-            const nanDetails = {nan_details_json};
-            console.log("DEBUG: defectDetails:", defectDetails);
-            console.log("DEBUG: nanDetails:", nanDetails);
-
-            const partnerToIdMap = {{
-                'BAT': 'bat',
-                'FNI': 'fni',
-                'TMS(M)': 'tmsm',
-                'P&S': 'pns',
-                'TMS(E)': 'tmse',
-                'C&A': 'cna'
-            }};
-
-            const idToPartnerMap = Object.fromEntries(
-                Object.entries(partnerToIdMap).map(([partner, id]) => [id, partner])
-            );
-
-            function toggleDefectTable(partnerId) {{
-                const partner = idToPartnerMap[partnerId];
-                console.log("Toggling table for partner:", partner);
-                const table = document.getElementById(`defect-table-${{partnerId}}`);
-                
-                // 현재 테이블이 이미 표시되어 있으면 숨기기
-                if (!table.classList.contains('hidden')) {{
-                    table.classList.add('hidden');
-                    return;
-                }}
-                
-                // 모든 테이블 숨기기 (다른 테이블이 열려있을 수 있음)
-                document.querySelectorAll('.defect-table').forEach(t => t.classList.add('hidden'));
-                
-                // 선택된 테이블 표시
-                table.classList.remove('hidden');
-                const details = defectDetails[partner] || [];
-                console.log("Details for partner:", partner, details);
-                
-                let tableBody = '';
-                if (details.length === 0) {{
-                    tableBody = '<tr><td colspan="4" style="text-align: center; color: #666;">불량 데이터 없음</td></tr>';
-                }} else {{
-                    details.forEach((item, index) => {{
-                        tableBody += `<tr>
-                            <td>${{item.productInfo}}</td>
-                            <td>${{item.defect}}</td>
-                            <td>${{item.action}}</td>
-                            <td>${{item.occurDate}}</td>
-                        </tr>`;
-                    }});
-                }}
-                table.querySelector('tbody').innerHTML = tableBody;
-                
-                // 테이블로 스크롤
-                table.scrollIntoView({{ behavior: 'smooth', block: 'start' }});
-            }}
-
-            function toggleNanTable(partnerId) {{
-                const partner = idToPartnerMap[partnerId];
-                console.log("Toggling NaN table for partner:", partner);
-                const table = document.getElementById(`nan-table-${{partnerId}}`);
-                
-                // 현재 테이블이 이미 표시되어 있으면 숨기기
-                if (!table.classList.contains('hidden')) {{
-                    table.classList.add('hidden');
-                    return;
-                }}
-                
-                // 모든 NaN 테이블 숨기기
-                document.querySelectorAll('.nan-table').forEach(t => t.classList.add('hidden'));
-                
-                // 선택된 테이블 표시
-                table.classList.remove('hidden');
-                const details = nanDetails[partner] || [];
-                console.log("NaN details for partner:", partner, details);
-                
-                let tableBody = '';
-                if (details.length === 0) {{
-                    tableBody = '<tr><td colspan="2" style="text-align: center; color: #666;">NaN 데이터 없음</td></tr>';
-                }} else {{
-                    details.forEach((item, index) => {{
-                        tableBody += `<tr>
-                            <td>${{item.week}}</td>
-                            <td>${{item.ratio}}%</td>
-                        </tr>`;
-                    }});
-                }}
-                table.querySelector('tbody').innerHTML = tableBody;
-                
-                // 테이블로 스크롤
-                table.scrollIntoView({{ behavior: 'smooth', block: 'start' }});
-            }}
-
-            function downloadCSV(partnerId) {{
-                const partner = idToPartnerMap[partnerId];
-                const details = defectDetails[partner] || [];
-                console.log("DEBUG: Downloading CSV for partner:", partner, details);
-                if (details.length === 0) {{
-                    alert('다운로드할 데이터가 없습니다.');
-                    return;
-                }}
-
-                let csvContent = '\ufeff';
-                csvContent += '제품정보,상세불량내용,상세조치내용,발생일\\n';
-
-                details.forEach(item => {{
-                    const row = [
-                        `"${{item.productInfo.replace(/"/g, '""')}}"`,
-                        `"${{item.defect.replace(/"/g, '""')}}"`,
-                        `"${{item.action.replace(/"/g, '""')}}"`,
-                        `"${{item.occurDate.replace(/"/g, '""')}}"`
-                    ];
-                    csvContent += row.join(',') + '\\n';
-                }});
-
-                const today = new Date();
-                const dateStr = today.getFullYear() + '' + 
-                               String(today.getMonth() + 1).padStart(2, '0') + '' + 
-                               String(today.getDate()).padStart(2, '0');
-
-                const fileName = `${{partner}}_불량내역_${{dateStr}}.csv`;
-
-                const blob = new Blob([csvContent], {{ type: 'text/csv;charset=utf-8' }});
-                const url = window.URL.createObjectURL(blob);
-                const link = document.createElement('a');
-                link.setAttribute('href', url);
-                link.setAttribute('download', fileName);
-                document.body.appendChild(link);
-                link.click();
-                document.body.removeChild(link);
-                window.URL.revokeObjectURL(url);
-            }}
-        </script>
-    </head>
-    <body>
-        <div style="text-align: center; margin: 20px 0;">
-            <div class="main-title">
-                <h1 style="color: #333; margin-bottom: 10px;">🏭 협력사 평가 대시보드</h1>
-                <div class="main-title-tooltip">
-                    <div class="tooltip-section">
-                        <h4>🎯 평가 목적</h4>
-                        <p>① 기구·전장 협력사의 품질 수준을 불량률과 데이터 완성성(누락 비율)으로 객관적으로 평가</p>
-                        <p>② 생산량 배경·인센티브·개선 과제 부여 기준 마련</p>
-                    </div>
-                    
-                    <div class="tooltip-section">
-                        <h4>📊 평가 지표</h4>
-                        <table class="tooltip-table">
-                            <tr>
-                                <th>지표</th>
-                                <th>정의</th>
-                                <th>가중치</th>
-                                <th>등급 구간</th>
-                            </tr>
-                            <tr>
-                                <td><strong>불량률</strong></td>
-                                <td>(월간 불량 건수 ÷ 월간 생산대수) ×100</td>
-                                <td><strong style="color: #d32f2f;">70%</strong></td>
-                                <td>
-                                    <div class="tooltip-grade-detail">
-                                        <strong>기구:</strong> A(&lt;6.0%) B(6.0~16.5%) C(16.5~27.6%) D(≥27.6%)<br>
-                                        <strong>전장:</strong> A(&lt;1.0%) B(1.0~3.6%) C(3.6~6.2%) D(6.2~7.5%) E(≥7.5%)
-                                    </div>
-                                </td>
-                            </tr>
-                            <tr>
-                                <td><strong>NaN 비율</strong></td>
-                                <td>(누락 건수 ÷ 전체 대상 건수) ×100</td>
-                                <td><strong style="color: #1976d2;">30%</strong></td>
-                                <td>
-                                    <div class="tooltip-grade-detail">
-                                        A(&lt;1%) B(&lt;3%) C(&lt;6%) D(≥6%)
-                                    </div>
-                                </td>
-                            </tr>
-                        </table>
-                    </div>
-                    
-                    <div class="tooltip-section">
-                        <h4>🏭 생산대수 카운팅 기준</h4>
-                        <p><strong>기본 원칙:</strong> Chamber 수 기준 카운트</p>
-                        <table class="tooltip-table">
-                            <tr>
-                                <th>구분</th>
-                                <th>카운팅 방식</th>
-                                <th>예시</th>
-                            </tr>
-                            <tr>
-                                <td><strong>일반 제품</strong></td>
-                                <td>1 Chamber = 1대</td>
-                                <td>GAIA-I = 1대</td>
-                            </tr>
-                            <tr>
-                                <td><strong>DUAL 제품</strong></td>
-                                <td>2 Chamber = 2대</td>
-                                <td>GAIA-I DUAL = 2대</td>
-                            </tr>
-                            <tr>
-                                <td><strong>TMS(M)</strong></td>
-                                <td>직접 작업 + 반제품 기여</td>
-                                <td>DRAGON 직접작업 + 모든 제품 반제품 도킹</td>
-                            </tr>
-                        </table>
-                    </div>
-                    
-                    <div class="tooltip-section">
-                        <h4>📈 최종 평가점수 계산</h4>
-                        <p><strong>최종점수 = (불량률 점수 × 70%) + (NaN 비율 점수 × 30%)</strong></p>
-                        <p style="color: #666; font-size: 12px;">
-                            • 기구/전장 협력사별로 분리하여 순위 산정<br>
-                            • 동점시 불량률이 낮은 협력사가 상위 순위
-                        </p>
-                    </div>
-                </div>
-            </div>
-            <p style="color: #666; font-size: 16px;">기준월: {month}</p>
-        </div>
-        <div class="chart-section">
-            <h2 class="section-title">🔧 기구 협력사 평가 지수</h2>
-            <div class="kpi-container">
+def _snapshot_is_current(conn, sheet_ranges, version):
+    """요청한 시트가 모두 같은 스프레드시트 version으로 저장돼 있는지"""
+    if version is None:
+        return False
+    for sheet_range in sheet_ranges:
+        meta = conn.execute(
+            "SELECT version FROM sheet_meta WHERE sheet_key = ?",
+            (_sheet_key(sheet_range),),
+        ).fetchone()
+        if meta is None or meta[0] != version:
+            return False
+    return True
+
+
+def _sync_sheet_snapshot(conn, sheet_ranges, row_counts, chunk_rows, version):
+    """시트들을 전체 조회해 스냅샷을 교체 (모든 시트의 청크를 같은 batchGet에 담고 받는 즉시 저장)"""
+    jobs = []
+    sheets = []
+    for sheet_range in sheet_ranges:
+        sheet_name, start_col, end_col = _parse_sheet_range(sheet_range)
+        sheet = {
+            "key": _sheet_key(sheet_range),
+            "name": sheet_name,
+            "start_col": start_col,
+            "end_col": end_col,
+            "header": None,
+        }
+        sheets.append(sheet)
+        conn.execute("DELETE FROM sheet_rows WHERE sheet_key = ?", (sheet["key"],))
+        row_count = row_counts.get(sheet_name, 0)
+        if row_count < 1:
+            continue
+        jobs.append({"sheet": sheet, "kind": "header", "start_row": 1, "end_row": 1})
+        jobs.append({"sheet": sheet, "kind": "data", "start_row": 2, "end_row": row_count})
+
+    def on_rows(job, rows):
+        sheet = job["sheet"]
+        if job["kind"] == "header":
+            sheet["header"] = rows[0][1] if rows else None
+            return
+        conn.executemany(
+            "INSERT OR REPLACE INTO sheet_rows (sheet_key, row_no, data) VALUES (?, ?, ?)",
+            [(sheet["key"], row_no, _encode_sheet_row(row)) for row_no, row in rows],
+        )
+
+    _fetch_sheet_rows(jobs, chunk_rows, on_rows)
+
+    for sheet in sheets:
+        # 헤더가 없는 시트도 version을 기록해 두어 바뀌지 않았으면 다시 읽지 않음 (columns NULL → None)
+        conn.execute(
+            "INSERT OR REPLACE INTO sheet_meta (sheet_key, columns, version) VALUES (?, ?, ?)",
+            (
+                sheet["key"],
+                None if sheet["header"] is None else _encode_sheet_row(sheet["header"]),
+                version or "",
+            ),
+        )
+
+
+def _load_sheet_frame(conn, sheet_key, chunk_rows):
+    """스냅샷에서 시트 DataFrame 구성 (chunk_rows행 단위로 변환, 중간 빈 행 복원)"""
+    meta = conn.execute(
+        "SELECT columns FROM sheet_meta WHERE sheet_key = ?", (sheet_key,)
+    ).fetchone()
+    if meta is None or meta[0] is None:
+        return None
+    columns = json.loads(meta[0])
+    width = len(columns)
+    frames = []
+    batch = []
+    expected_row = 2
+    cursor = conn.execute(
+        "SELECT row_no, data FROM sheet_rows WHERE sheet_key = ? ORDER BY row_no",
+        (sheet_key,),
+    )
+    for row_no, data in cursor:
+        batch.extend([[None] * width for _ in range(row_no - expected_row)])
+        row = json.loads(data)
+        if len(row) < width:
+            row = row + [None] * (width - len(row))
+        batch.append(row)
+        expected_row = row_no + 1
+        if len(batch) >= chunk_rows:
+            frames.append(pd.DataFrame(batch, columns=columns))
+            batch = []
+    if batch:
+        frames.append(pd.DataFrame(batch, columns=columns))
+    if not frames:
+        return pd.DataFrame([], columns=columns)
+    return pd.concat(frames, ignore_index=True)
+
+
+def read_sheet_frames(sheet_ranges, chunk_rows=None, full_refresh=False):
+    """여러 시트 범위를 로컬 스냅샷과 동기화한 뒤 범위별 DataFrame 리스트 반환
+
+    스프레드시트의 Drive version(셀 하나만 바뀌어도 증가)이 스냅샷(SHEETS_SNAPSHOT_PATH)에
+    기록한 값과 같으면 시트를 다시 읽지 않고 스냅샷을 그대로 쓴다. 다르거나 조회에 실패하거나
+    full_refresh=True면 시트 크기(gridProperties)를 확인해 chunk_rows행 단위 batchGet으로 전체를
+    다시 읽는다. 어떤 행이 바뀌었는지는 알 수 없으므로 부분 재조회는 하지 않는다
+    (스냅샷이 시트보다 오래된 상태로 쓰이는 경우 없음). 헤더가 없는 시트는 None.
+    """
+    chunk_rows = chunk_rows or SHEET_CHUNK_ROWS
+    # 읽기 전에 version을 받아 두므로 읽는 도중 수정되면 다음 실행에서 다시 읽는다
+    version = get_spreadsheet_version()
+    conn = _open_sheets_snapshot()
+    try:
+        with conn:
+            if not full_refresh and _snapshot_is_current(conn, sheet_ranges, version):
+                print(f"💾 Sheets 변경 없음 (version {version}), 로컬 스냅샷 사용")
+            else:
+                _sync_sheet_snapshot(
+                    conn, sheet_ranges, get_sheet_row_counts(), chunk_rows, version
+                )
+        return [
+            _load_sheet_frame(conn, _sheet_key(sheet_range), chunk_rows)
+            for sheet_range in sheet_ranges
+        ]
+    finally:
+        conn.close()
+
+
+def _build_defect_df(df):
+    """불량이력 시트 DataFrame 정리 ('제조(He미보증)' 제외)"""
+    if df is None:
+        print("❌ 불량 시트 데이터 없음")
+        return None
+    if "비고" in df.columns:
+        df = df[~df["비고"].astype(str).str.contains("제조\\(He미보증\\)", na=False)]
+        print(f"DEBUG: '제조(He미보증)' 제외 후 불량 데이터 크기: {len(df)}")
+    return df
+
+
+def _build_production_df(df):
+    """공정검사이력 시트 DataFrame 확인"""
+    if df is None:
+        print("❌ 생산대수 시트 데이터 없음")
+        return None
+    print(f"DEBUG: 생산대수 데이터 로드 완료 - 총 {len(df)}건")
+    print(f"DEBUG: 사용 가능한 컬럼: {list(df.columns)}")
+
+    # 필요한 컬럼 확인
+    required_columns = ["제품명", "협력사(기구)명", "협력사(전장)명"]
+    missing_columns = [col for col in required_columns if col not in df.columns]
+    if missing_columns:
+        print(f"⚠️ 누락된 컬럼: {missing_columns}")
+    else:
+        print("✅ 필요한 컬럼 모두 존재")
+    return df
+
+
+def load_sheets_snapshot(chunk_rows=None, full_refresh=False):
+    """불량/생산대수 시트를 함께 로드 (스프레드시트가 바뀌지 않았으면 로컬 스냅샷 사용, 실패 시 None)"""
+    try:
+        defect_df, production_df = read_sheet_frames(
+            [SHEET_RANGE, PRODUCTION_SHEET_RANGE], chunk_rows, full_refresh
+        )
+    except Exception as e:
+        print(f"Google Sheets 데이터 로드 실패: {str(e)}")
+        return None
+
+    return SheetsSnapshot(
+        defect_df=_build_defect_df(defect_df),
+        production_df=_build_production_df(production_df),
+    )
+
+
+def get_sheets_snapshot(refresh=False):
+    """현재 실행의 Sheets 스냅샷 반환 (없거나 refresh=True면 새로 로드)"""
+    global _sheets_snapshot
+    with _sheets_snapshot_lock:
+        if _sheets_snapshot is None or refresh:
+            snapshot = load_sheets_snapshot()
+            if snapshot is None:
+                return None
+            _sheets_snapshot = snapshot
+        return _sheets_snapshot
+
+
+def clear_sheets_snapshot():
+    """캐시된 Sheets 스냅샷 제거"""
+    global _sheets_snapshot
+    with _sheets_snapshot_lock:
+        _sheets_snapshot = None
+
+
+def load_sheets_data(snapshot=None):
+    """Google Sheets에서 불량 데이터 로드 (스냅샷 공유, 호출자별 복사본 반환)"""
+    snapshot = snapshot or get_sheets_snapshot()
+    if snapshot is None or snapshot.defect_df is None:
+        print("불량 데이터 로드 실패")
+        return None
+    return snapshot.defect_df.copy()
+
+
+def load_production_data(snapshot=None):
+    """Google Sheets에서 생산대수 데이터 로드 (스냅샷 공유, 호출자별 복사본 반환)"""
+    snapshot = snapshot or get_sheets_snapshot()
+    if snapshot is None or snapshot.production_df is None:
+        print("생산대수 데이터 로드 실패")
+        return None
+    return snapshot.production_df.copy()
+
+
+# 협력사 이름 매핑 사전
+mech_partner_map = {
+    "주식회사 비에이티": "BAT",
+    "에프앤아이(FnI)": "FNI",
+    "(주)티엠에스이엔지": "TMS(M)",
+}
+elec_partner_map = {
+    "(주)티엠에스이엔지": "TMS(E)",
+    "피엔에스 시스템": "P&S",
+    "(주)씨앤에이시스템": "C&A",
+}
+# 반제품 매핑 사전 (기구와 동일)
+semi_product_partner_map = {
+    "주식회사 비에이티": "BAT",
+    "에프앤아이(FnI)": "FNI",
+    "(주)티엠에스이엔지": "TMS(M)",
+}
+
+
+def clean_partner_name(name, mode="mech"):
+    name = (name or "").strip()
+    if mode == "mech":
+        return mech_partner_map.get(name, name)
+    elif mode == "elec":
+        return elec_partner_map.get(name, name)
+    elif mode == "semi":
+        return semi_product_partner_map.get(name, name)
+    else:
+        return name
+
+
+def extract_partner_from_action(action, 대분류, 중분류):
+    """
+    '작업자' 문자열에서 협력사를 추출.
+    - action에 'TMS' 포함 시
+      * 대분류가 '기구작업불량' 또는 (대분류가 '작업불량' & 중분류에 '기구') → 'TMS(M)'
+      * 대분류가 '전장작업불량' 또는 (대분류가 '작업불량' & 중분류에 '전장') → 'TMS(E)'
+    - 그 외 'BAT', 'FNI', 'P&S', 'C&A', 'TMS(M)', 'TMS(E)' 포함 시 바로 반환
+    - 그 외에는 "미기재" 반환
+    """
+    if not action or pd.isna(action):
+        return "미기재"
+    action = str(action).strip()
+
+    # 1) action 문자열 안에 'TMS'가 있으면
+    if "TMS" in action:
+        # 기구작업불량인 경우는 기구
+        if 대분류 == "기구작업불량":
+            return "TMS(M)"
+        # 전장작업불량인 경우는 전장
+        if 대분류 == "전장작업불량":
+            return "TMS(E)"
+        # 작업불량인 경우 중분류에 '기구' 또는 '전장'으로 구분
+        if 대분류 == "작업불량":
+            if "기구" in 중분류:
+                return "TMS(M)"
+            if "전장" in 중분류:
+                return "TMS(E)"
+        # 그 외 상황에서는 미기재
+        return "미기재"
+
+    # 2) 'TMS'가 아닐 때, 다른 키워드(BAT, FNI, P&S, C&A, TMS(M), TMS(E)) 검사
+    for partner in ["BAT", "FNI", "P&S", "C&A", "TMS(M)", "TMS(E)"]:
+        if partner in action:
+            return partner
+
+    return "미기재"
+
+
+def get_partner_for_row(row):
+    """
+    1️⃣ 작업자가 있으면 extract_partner_from_action(action, 대분류, 중분류) 사용 → 우선 매핑
+    2️⃣ 없으면 대분류/중분류 기준으로 mech/elect 파트너 매핑
+    3️⃣ 대분류 == '부품불량'인 경우에도 중분류로 분기
+    4️⃣ 그 외는 '미기재'
+    """
+    대분류 = row.get("대분류", "")
+    중분류 = row.get("중분류", "")
+    mech_name = row.get("협력사(기구)명", "")
+    elec_name = row.get("협력사(전장)명", "")
+    action = row.get("작업자", "")
+
+    # 1️⃣ 작업자에 협력사가 명시된 경우 먼저 검사
+    action_partner = extract_partner_from_action(action, 대분류, 중분류)
+    if action_partner != "미기재":
+        return action_partner
+
+    # 2️⃣ 작업자가 미기재된 경우, 대분류/중분류로 mech/elect 협력사 결정
+    mech_partner = clean_partner_name(mech_name, mode="mech")
+    elec_partner = clean_partner_name(elec_name, mode="elec")
+
+    if 대분류 == "작업불량":
+        if "전장" in 중분류:
+            return elec_partner if elec_partner else "미기재"
+        elif "기구" in 중분류:
+            return mech_partner if mech_partner else "미기재"
+        else:
+            return "미기재"
+
+    elif 대분류 == "기구작업불량":
+        return mech_partner if mech_partner else "미기재"
+
+    elif 대분류 == "전장작업불량":
+        return elec_partner if elec_partner else "미기재"
+
+    elif 대분류 == "부품불량":
+        if "기구" in 중분류:
+            return mech_partner if mech_partner else "미기재"
+        elif "전장" in 중분류:
+            return elec_partner if elec_partner else "미기재"
+        else:
+            return "미기재"
+
+    else:
+        return "미기재"
+
+
+def _text_column(df, column):
+    """문자열 컬럼 (없는 컬럼/결측값은 빈 문자열)"""
+    if column not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[column].fillna("").astype(str)
+
+
+def assign_partners(df):
+    """
+    get_partner_for_row()와 같은 규칙으로 DataFrame 전체의 협력사를 한 번에 계산.
+    작업자/대분류/중분류 문자열 비교를 벡터화하고 np.select로 우선순위를 적용한다.
+    (결측값은 빈 문자열로 취급)
+    """
+    major = _text_column(df, "대분류")
+    minor = _text_column(df, "중분류")
+    action = _text_column(df, "작업자").str.strip()
+    mech_name = _text_column(df, "협력사(기구)명").str.strip()
+    elec_name = _text_column(df, "협력사(전장)명").str.strip()
+
+    is_work = major == "작업불량"
+    is_mech_work = major == "기구작업불량"
+    is_elec_work = major == "전장작업불량"
+    is_part = major == "부품불량"
+    minor_mech = minor.str.contains("기구", regex=False)
+    minor_elec = minor.str.contains("전장", regex=False)
+
+    # 1️⃣ 작업자 기준 (TMS는 대분류/중분류로 기구/전장 구분)
+    tms_partner = np.select(
+        [is_mech_work, is_elec_work, is_work & minor_mech, is_work & minor_elec],
+        ["TMS(M)", "TMS(E)", "TMS(M)", "TMS(E)"],
+        default="미기재",
+    )
+    keyword_partner = np.select(
+        [action.str.contains(partner, regex=False) for partner in ["BAT", "FNI", "P&S", "C&A"]],
+        ["BAT", "FNI", "P&S", "C&A"],
+        default="미기재",
+    )
+    action_partner = np.where(
+        action.str.contains("TMS", regex=False), tms_partner, keyword_partner
+    )
+
+    # 2️⃣ 대분류/중분류 기준 mech/elec 협력사 매핑
+    mech_partner = mech_name.map(mech_partner_map).fillna(mech_name)
+    elec_partner = elec_name.map(elec_partner_map).fillna(elec_name)
+    mech_partner = np.where(mech_partner != "", mech_partner, "미기재")
+    elec_partner = np.where(elec_partner != "", elec_partner, "미기재")
+    category_partner = np.select(
+        [
+            is_work & minor_elec,
+            is_work & minor_mech,
+            is_mech_work,
+            is_elec_work,
+            is_part & minor_mech,
+            is_part & minor_elec,
+        ],
+        [elec_partner, mech_partner, mech_partner, elec_partner, mech_partner, elec_partner],
+        default="미기재",
+    )
+
+    return pd.Series(
+        np.where(action_partner != "미기재", action_partner, category_partner),
+        index=df.index,
+        dtype=object,
+    )
+
+
+def _stripped_text_column(df, column):
+    """str(value).strip()과 같은 규칙의 문자열 컬럼 (없는 컬럼은 빈 문자열)"""
+    if column not in df.columns:
+        return pd.Series("", index=df.index, dtype=object)
+    return df[column].map(str).astype(object).str.strip()
+
+
+def build_product_dimension(product_names):
+    """
+    제품명 차원 테이블 생성 (고유 제품명당 1회 계산)
+    - units: DUAL 제품은 chamber 2개 = 2대, 그 외 1대
+    - is_dual / is_dragon: 제품군 플래그
+    """
+    names = pd.Index(pd.unique(pd.Series(product_names, dtype=object)), name="제품명")
+    upper = names.str.upper()
+    is_dual = upper.str.contains("DUAL", regex=False)
+    return pd.DataFrame(
+        {
+            "units": np.where(is_dual, 2, 1),
+            "is_dual": is_dual,
+            "is_dragon": upper.str.contains("DRAGON", regex=False),
+        },
+        index=names,
+    )
+
+
+def calculate_production_counts(production_df, target_month):
+    """생산대수 카운팅 함수 - DUAL 제품 2배, TMS(M) 특별 처리"""
+    # 협력사별 카운트 초기화
+    counts = {"BAT": 0, "FNI": 0, "TMS(M)": 0, "P&S": 0, "C&A": 0, "TMS(E)": 0}
+
+    # 월별 필터링 (호출자의 DataFrame은 변경하지 않음)
+    original_count = len(production_df)
+    date_col = None
+    for col in ["발생일", "월", "일자", "등록일", "날짜", "공정검사일"]:
+        if col in production_df.columns:
+            date_col = col
+            break
+
+    if date_col:
+        print(f"DEBUG: 날짜 컬럼 '{date_col}' 사용하여 월별 필터링")
+        dates = pd.to_datetime(production_df[date_col], errors="coerce")
+        month_mask = dates.notna() & (dates.dt.strftime("%Y-%m") == target_month)
+        production_df = production_df[month_mask]
+        print(
+            f"DEBUG: {target_month} 필터링 - {original_count}건 → {len(production_df)}건"
+        )
+    else:
+        print(
+            f"DEBUG: 날짜 컬럼을 찾을 수 없음. 사용 가능한 컬럼: {list(production_df.columns)}"
+        )
+        print("DEBUG: 월별 필터링 없이 전체 데이터 사용")
+
+    print(f"DEBUG: 생산대수 카운팅 시작 - 총 {len(production_df)}건")
+
+    # 행 단위 값 정리: 제품명/협력사 원본명 → 매핑명
+    rows = pd.DataFrame(
+        {
+            "product": _stripped_text_column(production_df, "제품명"),
+            "mech_raw": _stripped_text_column(production_df, "협력사(기구)명"),
+            "elec_raw": _stripped_text_column(production_df, "협력사(전장)명"),
+            "semi_raw": _stripped_text_column(production_df, "협력사(반제품)명"),
+        }
+    )
+    rows = rows[rows["product"] != ""]
+    rows["mech"] = rows["mech_raw"].map(mech_partner_map).fillna(rows["mech_raw"])
+    rows["elec"] = rows["elec_raw"].map(elec_partner_map).fillna(rows["elec_raw"])
+    rows["semi"] = rows["semi_raw"].map(semi_product_partner_map).fillna(
+        rows["semi_raw"]
+    )
+
+    # 제품명 차원 테이블로 DUAL/DRAGON 판별 (고유 제품명당 1회)
+    products = build_product_dimension(rows["product"])
+    rows["units"] = rows["product"].map(products["units"]).astype(int)
+    rows["is_dragon"] = rows["product"].map(products["is_dragon"]).astype(bool)
+
+    # 디버그 출력 (처음 10건 + DRAGON 제품 조합별 요약)
+    for row in rows.head(10).itertuples(index=False):
+        print(
+            f"DEBUG: {row.product} -> 기구:{row.mech_raw}->{row.mech}, 전장:{row.elec_raw}->{row.elec}, 카운트:{row.units}"
+        )
+    dragon_rows = rows[rows["is_dragon"]]
+    if not dragon_rows.empty:
+        dragon_combos = dragon_rows.groupby(
+            ["product", "mech_raw", "mech", "elec_raw", "elec"], sort=False
+        )["units"].agg(["size", "sum"])
+        for (product, mech_raw, mech, elec_raw, elec), combo in dragon_combos.iterrows():
+            print(
+                f"DEBUG DRAGON: {product} -> 기구:{mech_raw}->{mech}, 전장:{elec_raw}->{elec}, 카운트:{combo['sum']} ({combo['size']}건)"
+            )
+
+    # 각 협력사에 카운팅 (기본 매핑)
+    for partner_col in ["mech", "elec"]:
+        partner_units = rows.groupby(partner_col)["units"].sum()
+        for partner, units in partner_units.items():
+            if partner in counts:
+                counts[partner] += int(units)
+
+    # TMS(M) 반제품 기여분 별도 계산
+    tms_semi_product_count = int(rows.loc[rows["semi"] == "TMS(M)", "units"].sum())
+
+    # TMS(M)에 반제품 기여분 추가
+    counts["TMS(M)"] += tms_semi_product_count
+
+    print(f"\n📊 생산대수 카운팅 결과:")
+    for partner, count in counts.items():
+        if partner == "TMS(M)":
+            direct_count = count - tms_semi_product_count
+            print(
+                f"  {partner}: {count}대 (직접작업: {direct_count}대 + 반제품기여: {tms_semi_product_count}대)"
+            )
+        else:
+            print(f"  {partner}: {count}대")
+
+    # 전체 제품 카운트 분석
+    print(f"\n📋 전체 제품 카운트 분석:")
+    total_products = len(production_df)
+
+    # 제품명별 중복 제거 분석
+    unique_products = production_df["제품명"].value_counts()
+    print(f"  총 데이터 행 수: {total_products}개")
+    print(f"  고유 제품명 수: {len(unique_products)}개")
+
+    summary = build_product_dimension(unique_products.index.map(str))
+    summary["count"] = unique_products.to_numpy()
+    summary["total_units"] = summary["count"] * summary["units"]
+
+    # 제품명별 상세 분석
+    print(f"\n📋 제품명별 상세 분석:")
+    for product_name, product in summary.iterrows():
+        print(
+            f"  {product_name}: {product['count']}개 × {product['units']}대 = {product['total_units']}대"
+        )
+
+    dual_summary = summary[summary["is_dual"]]
+    non_dual_summary = summary[~summary["is_dual"]]
+    dual_total_units = int(dual_summary["total_units"].sum())
+    non_dual_total_units = int(non_dual_summary["total_units"].sum())
+
+    print(f"\n📊 요약:")
+    print(f"  고유 DUAL 제품명: {len(dual_summary)}개 → 총 {dual_total_units}대")
+    print(
+        f"  고유 일반 제품명: {len(non_dual_summary)}개 → 총 {non_dual_total_units}대"
+    )
+    print(f"  전체 생산대수: {dual_total_units + non_dual_total_units}대")
+
+    # DRAGON 제품 상세 분석
+    dragon_summary = summary[summary["is_dragon"]]
+    if not dragon_summary.empty:
+        print(f"\n🐉 DRAGON 제품 상세 분석:")
+        for product, dragon in dragon_summary.iterrows():
+            print(
+                f"  {product}: {dragon['count']}개 제품 × {dragon['units']}대 = {dragon['total_units']}대"
+            )
+        print(f"  DRAGON 총계: {int(dragon_summary['total_units'].sum())}대")
+
+    return counts
+
+
+def assign_nan_grade(nan_ratio):
+    """NaN 비율 등급 부여 (새로운 엄격한 기준)"""
+    if nan_ratio < 1.0:
+        return "A"  # 1% 미만 (우수)
+    elif nan_ratio < 3.0:
+        return "B"  # 1~3% (양호)
+    elif nan_ratio < 6.0:
+        return "C"  # 3~6% (보통)
+    else:
+        return "D"  # 6% 이상 (개선필요)
+
+
+# 불량률 기준 등급 (REV2 기준)
+DEFECT_RATE_THRESHOLDS = {
+    "MECH": {  # 기구 협력사 (BAT, FNI, TMS(M))
+        "A": 6.0,  # 6.0% 미만
+        "B": 16.5,  # 6.0~16.5%
+        "C": 27.6,  # 16.5~27.6%
+        "D": float("inf"),  # 27.6% 이상
+    },
+    "ELEC": {  # 전장 협력사 (TMS(E), P&S, C&A)
+        "A": 1.0,  # 1.0% 미만
+        "B": 3.6,  # 1.0~3.6%
+        "C": 6.2,  # 3.6~6.2%
+        "D": 7.5,  # 6.2~7.5%
+        "E": float("inf"),  # 7.5% 이상
+    },
+}
+
+
+def calculate_defect_rate(defect_count, production_count):
+    """불량률 계산 - (불량건수 ÷ 생산대수) × 100"""
+    if production_count == 0:
+        print(f"⚠️ 생산대수가 0입니다. 불량률을 계산할 수 없습니다.")
+        return 0.0
+
+    defect_rate = (defect_count / production_count) * 100
+    return round(defect_rate, 2)
+
+
+def assign_defect_grade_by_rate(defect_rate, partner_type):
+    """불량률 기준 등급 부여"""
+    partner_category = "MECH" if partner_type in ["BAT", "FNI", "TMS(M)"] else "ELEC"
+    thresholds = DEFECT_RATE_THRESHOLDS[partner_category]
+
+    for grade in ["A", "B", "C", "D", "E"]:
+        if grade in thresholds and defect_rate < thresholds[grade]:
+            return grade
+    return "E"  # 최하등급
+
+
+def assign_defect_grade(count, partner_type):
+    """불량 건수 등급 부여 (기존 방식 - 하위호환성용)"""
+    if partner_type in ["BAT", "FNI", "TMS(M)"]:
+        if count <= 5:
+            return "A"
+        elif count <= 10:
+            return "B"
+        elif count <= 15:
+            return "C"
+        else:
+            return "D"
+    else:  # 전장: C&A, P&S, TMS(E)
+        if count <= 1:
+            return "A"
+        elif count <= 3:
+            return "B"
+        elif count <= 6:
+            return "C"
+        elif count <= 9:
+            return "D"
+        else:
+            return "E"
+
+
+def grade_to_score(grade):
+    """등급을 10점 만점 점수로 변환"""
+    grade_map = {"A": 10, "B": 7.5, "C": 5, "D": 2.5, "E": 0}
+    return grade_map.get(grade, 0)
+
+
+def score_to_grade(score):
+    """평균 점수를 등급으로 변환 (내림)"""
+    if score >= 8.75:
+        return "A"
+    elif score >= 6.25:
+        return "B"
+    elif score >= 3.75:
+        return "C"
+    elif score >= 1.25:
+        return "D"
+    else:
+        return "E"
+
+
+# GitHub 업로드 재시도 (rate limit·일시 오류 시 지수 백오프, Retry-After 헤더 우선)
+GITHUB_UPLOAD_RETRIES = int(os.getenv("GITHUB_UPLOAD_RETRIES", "4"))
+GITHUB_RETRY_BASE_SECONDS = float(os.getenv("GITHUB_RETRY_BASE_SECONDS", "2"))
+GITHUB_RETRY_MAX_SECONDS = 60
+GITHUB_RETRY_STATUSES = (500, 502, 503, 504)
+
+# 업로드 방식 (contents: 파일마다 Contents API 커밋 / tree: Git Data API로 저장소당 커밋·ref 업데이트 1회)
+GITHUB_PUBLISH_MODE = os.getenv("GITHUB_PUBLISH_MODE", "contents").lower()
+# KPI 페이지와 함께 게시할 대시보드 데이터 폴더 (빈 값이면 HTML/자산만 게시)
+GITHUB_PUBLISH_DATA_DIR = os.getenv("GITHUB_PUBLISH_DATA_DIR", "")
+GITHUB_BLOB_WORKERS = 8  # tree 방식에서 바이너리(.gz/.br) blob 동시 생성 수
+
+# 업로드 대상 저장소 (이름은 로그/iframe 안내용)
+GithubTarget = namedtuple(
+    "GithubTarget", ["name", "repo_name", "branch", "html_in_repo", "token"]
+)
+
+
+def github_targets():
+    """설정된 업로드 대상 저장소 목록"""
+    return [
+        GithubTarget(
+            GITHUB_REPO_1,
+            f"{GITHUB_USERNAME_1}/{GITHUB_REPO_1}",
+            GITHUB_BRANCH_1,
+            HTML_FILENAME_1,
+            GITHUB_TOKEN_1,
+        ),
+        GithubTarget(
+            GITHUB_REPO_2,
+            f"{GITHUB_USERNAME_2}/{GITHUB_REPO_2}",
+            GITHUB_BRANCH_2,
+            HTML_FILENAME_2,
+            GITHUB_TOKEN_2,
+        ),
+    ]
+
+
+def github_raw_url(repo_name, branch, file_in_repo):
+    """저장소 파일의 raw URL"""
+    return f"https://raw.githubusercontent.com/{repo_name}/{branch}/{file_in_repo}"
+
+
+def git_blob_sha(content):
+    """파일 내용(bytes)의 git blob SHA (GitHub contents API의 sha와 같은 값)"""
+    return hashlib.sha1(b"blob %d\0" % len(content) + content).hexdigest()
+
+
+def _github_retry_delay(error, attempt):
+    """GitHub 오류가 rate limit·일시 오류면 재시도 대기 초, 아니면 None"""
+    headers = {key.lower(): value for key, value in (error.headers or {}).items()}
+    rate_limited = isinstance(error, RateLimitExceededException) or (
+        error.status in (403, 429)
+        and (
+            "retry-after" in headers
+            or headers.get("x-ratelimit-remaining") == "0"
+            or "rate limit" in str(error).lower()
+        )
+    )
+    if not rate_limited and error.status not in GITHUB_RETRY_STATUSES:
+        return None
+
+    delay = GITHUB_RETRY_BASE_SECONDS * (2**attempt)
+    try:
+        if "retry-after" in headers:
+            delay = float(headers["retry-after"])
+        elif rate_limited and "x-ratelimit-reset" in headers:
+            delay = max(delay, float(headers["x-ratelimit-reset"]) - time.time())
+    except ValueError:
+        pass
+    return min(delay, GITHUB_RETRY_MAX_SECONDS)
+
+
+def _call_github(action, description):
+    """GitHub API 호출 (rate limit·일시 오류면 최대 GITHUB_UPLOAD_RETRIES회 백오프 재시도)"""
+    for attempt in range(GITHUB_UPLOAD_RETRIES + 1):
+        try:
+            return action()
+        except GithubException as e:
+            delay = _github_retry_delay(e, attempt)
+            if delay is None or attempt == GITHUB_UPLOAD_RETRIES:
+                raise
+            print(
+                f"⏳ GitHub {description} 재시도 {attempt + 1}/{GITHUB_UPLOAD_RETRIES} "
+                f"({delay:.1f}초 후, HTTP {e.status})"
+            )
+            time.sleep(delay)
+
+
+def upload_to_github(file_path, repo_name, branch, file_in_repo, token, client=None):
+    """
+    GitHub에 파일 업로드 → raw URL (실패 시 None)
+    로컬 git blob SHA가 원격 파일 SHA와 같으면 업로드하지 않고, 파일이 없을 때(404)만 새로 생성
+    client: Github 클라이언트 (없으면 token으로 생성, 테스트용 대체 객체 가능)
+    """
+    try:
+        print(f"GitHub 업로드 시작: {repo_name}/{file_in_repo}")
+        with open(file_path, "rb") as f:
+            content = f.read()
+        client = client or Github(token)
+        repo = _call_github(lambda: client.get_repo(repo_name), "저장소 조회")
+        try:
+            contents = _call_github(
+                lambda: repo.get_contents(file_in_repo, ref=branch), "파일 조회"
+            )
+        except UnknownObjectException:
+            contents = None
+
+        if contents is None:
+            _call_github(
+                lambda: repo.create_file(
+                    file_in_repo, f"Create {file_in_repo}", content, branch=branch
+                ),
+                "파일 생성",
+            )
+            print(f"✅ GitHub 파일 생성 성공: {repo_name}/{file_in_repo}")
+        elif contents.sha == git_blob_sha(content):
+            print(f"⏭️ GitHub 파일 변경 없음, 업로드 건너뜀: {repo_name}/{file_in_repo}")
+        else:
+            _call_github(
+                lambda: repo.update_file(
+                    contents.path,
+                    f"Update {file_in_repo}",
+                    content,
+                    contents.sha,
+                    branch=branch,
+                ),
+                "파일 업데이트",
+            )
+            print(f"✅ GitHub 파일 업데이트 성공: {repo_name}/{file_in_repo}")
+        return github_raw_url(repo_name, branch, file_in_repo)
+    except Exception as e:
+        print(f"❌ GitHub 업로드 실패: {repo_name}/{file_in_repo} - {str(e)}")
+        return None
+
+
+def upload_kpi_assets(
+    asset_files, repo_name, branch, html_in_repo, token, client=None
+):
+    """write_kpi_assets() 결과 자산을 저장소의 HTML 파일과 같은 폴더 기준 상대 경로로 업로드 → 모두 성공 여부"""
+    html_dir = posixpath.dirname(html_in_repo)
+    uploaded = [
+        upload_to_github(
+            local_path,
+            repo_name,
+            branch,
+            posixpath.join(html_dir, relative_path),
+            token,
+            client=client,
+        )
+        for local_path, relative_path in asset_files
+    ]
+    return all(uploaded)
+
+
+def publish_data_files(data_dir=None):
+    """게시할 대시보드 데이터 파일 → [(로컬 경로, "data/..." 상대 경로)] (manifest·압축 사본·상세 shard 포함)"""
+    data_dir = GITHUB_PUBLISH_DATA_DIR if data_dir is None else data_dir
+    if not data_dir or not os.path.isdir(data_dir):
+        return []
+    prefix = os.path.basename(os.path.normpath(data_dir))
+    data_files = []
+    for root, dirs, names in os.walk(data_dir):
+        dirs.sort()
+        for name in sorted(names):
+            # 쓰기 중인 임시 파일과 빌드 캐시 다이제스트는 게시하지 않음
+            if name.endswith((".tmp", BUILD_DIGEST_SUFFIX)):
+                continue
+            local_path = os.path.join(root, name)
+            relative_path = os.path.relpath(local_path, data_dir).replace(os.sep, "/")
+            data_files.append((local_path, posixpath.join(prefix, relative_path)))
+    return data_files
+
+
+def publish_data_fingerprint(data_files=None):
+    """빌드 다이제스트용 게시 데이터: [[저장소 상대 경로, sha256]] (data/*.json·index.json·shard가 바뀌면 다시 게시)"""
+    if data_files is None:
+        data_files = publish_data_files()
+    fingerprint = []
+    for local_path, relative_path in data_files:
+        hasher = hashlib.sha256()
+        with open(local_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                hasher.update(chunk)
+        fingerprint.append([relative_path, hasher.hexdigest()])
+    return fingerprint
+
+
+def _git_tree_elements(repo, changed):
+    """변경 파일({저장소 경로: bytes}) → 트리 항목 (UTF-8 텍스트는 트리에 직접 싣고, 바이너리만 blob 병렬 생성)"""
+    text_files, binary_files = {}, {}
+    for path, content in changed.items():
+        try:
+            text_files[path] = content.decode("utf-8")
+        except UnicodeDecodeError:
+            binary_files[path] = content
+
+    def create_blob(content):
+        encoded = base64.b64encode(content).decode("ascii")
+        return _call_github(
+            lambda: repo.create_git_blob(encoded, "base64"), "blob 생성"
+        ).sha
+
+    blob_shas = {}
+    if binary_files:
+        workers = min(GITHUB_BLOB_WORKERS, len(binary_files))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            blob_shas = dict(
+                zip(binary_files, executor.map(create_blob, binary_files.values()))
+            )
+
+    elements = [
+        InputGitTreeElement(path, "100644", "blob", content=text)
+        for path, text in text_files.items()
+    ]
+    elements += [
+        InputGitTreeElement(path, "100644", "blob", sha=blob_sha)
+        for path, blob_sha in blob_shas.items()
+    ]
+    return elements
+
+
+def publish_tree_to_github(files, repo_name, branch, message, token, client=None):
+    """
+    files([(로컬 경로, 저장소 경로)])를 Git Data API 트리 1개·커밋 1개·ref 업데이트 1회로 게시
+    → 커밋 SHA (변경 없으면 현재 HEAD SHA, 실패 시 None)
+    원격 트리와 blob SHA가 같은 파일은 제외하고, 그사이 브랜치가 앞서 가 fast-forward가 안 되면 새 HEAD 기준으로 다시 만든다
+    """
+    try:
+        print(f"GitHub 단일 커밋 게시 시작: {repo_name}@{branch} (파일 {len(files)}개)")
+        contents = {}
+        for local_path, file_in_repo in files:
+            with open(local_path, "rb") as f:
+                contents[file_in_repo] = f.read()
+        client = client or Github(token)
+        repo = _call_github(lambda: client.get_repo(repo_name), "저장소 조회")
+
+        for attempt in range(GITHUB_UPLOAD_RETRIES + 1):
+            ref = _call_github(lambda: repo.get_git_ref(f"heads/{branch}"), "브랜치 조회")
+            head = _call_github(
+                lambda: repo.get_git_commit(ref.object.sha), "커밋 조회"
+            )
+            remote_tree = _call_github(
+                lambda: repo.get_git_tree(head.tree.sha, recursive=True), "트리 조회"
+            )
+            remote_shas = {
+                element.path: element.sha
+                for element in remote_tree.tree
+                if element.type == "blob"
+            }
+            changed = {
+                path: content
+                for path, content in contents.items()
+                if remote_shas.get(path) != git_blob_sha(content)
+            }
+            if not changed:
+                print(f"⏭️ GitHub 파일 변경 없음, 커밋 건너뜀: {repo_name}@{branch}")
+                return head.sha
+
+            elements = _git_tree_elements(repo, changed)
+            tree = _call_github(
+                lambda: repo.create_git_tree(elements, head.tree), "트리 생성"
+            )
+            commit = _call_github(
+                lambda: repo.create_git_commit(message, tree, [head]), "커밋 생성"
+            )
+            try:
+                _call_github(lambda: ref.edit(commit.sha), "브랜치 업데이트")
+            except GithubException as e:
+                # 422: 다른 커밋이 먼저 들어와 fast-forward 불가
+                if e.status != 422 or attempt == GITHUB_UPLOAD_RETRIES:
+                    raise
+                print(f"⏳ 브랜치가 앞서 있어 새 HEAD 기준으로 다시 커밋: {repo_name}@{branch}")
+                continue
+            print(
+                f"✅ GitHub 단일 커밋 게시 성공: {repo_name}@{branch} "
+                f"{commit.sha[:7]} (변경 파일 {len(changed)}개)"
+            )
+            return commit.sha
+    except Exception as e:
+        print(f"❌ GitHub 단일 커밋 게시 실패: {repo_name}@{branch} - {str(e)}")
+        return None
+
+
+def _publish_to_target(target, html_file, asset_files, client_factory, mode):
     """
+    대상 저장소 1곳에 게시 → HTML raw URL
+    tree: HTML·자산·데이터를 커밋 1개로 / contents: 자산 → HTML 순서로 파일별 업로드 (같은 브랜치 커밋 충돌을 피하려고 순차)
+    """
+    client = client_factory(target.token)
+    if mode == "tree":
+        html_dir = posixpath.dirname(target.html_in_repo)
+        files = [
+            (local_path, posixpath.join(html_dir, relative_path))
+            for local_path, relative_path in asset_files
+        ]
+        files.append((html_file, target.html_in_repo))
+        commit_sha = publish_tree_to_github(
+            files,
+            target.repo_name,
+            target.branch,
+            f"Update {target.html_in_repo}",
+            target.token,
+            client=client,
+        )
+        if not commit_sha:
+            return None
+        return github_raw_url(target.repo_name, target.branch, target.html_in_repo)
+
+    if not upload_kpi_assets(
+        asset_files,
+        target.repo_name,
+        target.branch,
+        target.html_in_repo,
+        target.token,
+        client=client,
+    ):
+        print(f"❌ 자산 업로드 실패로 HTML 업로드 생략: {target.repo_name}")
+        return None
+    return upload_to_github(
+        html_file,
+        target.repo_name,
+        target.branch,
+        target.html_in_repo,
+        target.token,
+        client=client,
+    )
 
-    for _, row in mech_df.iterrows():
-        partner = row["partner"]
-        weighted_score = row["weighted_score"]
-        final_grade = row["final_grade"]
-        defect_count = row["defect_count"]
-        defect_rate = row["defect_rate"]  # 불량률 추가
-        nan_ratio = row["nan_ratio"]
-        emoji = row["emoji"]
-        production_count = production_counts.get(partner, 0)  # 생산대수 추가
 
-        # 등급별 CSS 클래스
-        grade_class = f"grade-{final_grade.lower()}"
+def publish_kpi_dashboard(
+    html_file, asset_files, targets=None, client_factory=Github, mode=None
+):
+    """
+    대상 저장소들에 동시에 게시 → {대상 이름: raw URL 또는 None} (대상 순서 유지)
+    asset_files: [(로컬 경로, HTML 기준 상대 경로)] - KPI 자산과 publish_data_files() 결과
+    mode: "tree" | "contents" (없으면 GITHUB_PUBLISH_MODE)
+    """
+    targets = targets or github_targets()
+    mode = mode or GITHUB_PUBLISH_MODE
+    with ThreadPoolExecutor(max_workers=len(targets)) as executor:
+        futures = [
+            (
+                target.name,
+                executor.submit(
+                    _publish_to_target,
+                    target,
+                    html_file,
+                    asset_files,
+                    client_factory,
+                    mode,
+                ),
+            )
+            for target in targets
+        ]
+        return {name: future.result() for name, future in futures}
+
+
+# NaN 비율 집계 대상 협력사 → 비율을 가져올 역할 (주간 디테일/월별 등급 공통 순서)
+# 기구 협력사는 mech 비율, 전장 협력사는 elec 비율만 사용 (다른 역할 필드에 같은 이름이 있어도 섞지 않음)
+NAN_PARTNER_ROLES = {
+    "BAT": "mech",
+    "FNI": "mech",
+    "TMS(M)": "mech",
+    "C&A": "elec",
+    "P&S": "elec",
+    "TMS(E)": "elec",
+}
+NAN_PARTNERS = list(NAN_PARTNER_ROLES)
 
-        # 파트너 ID 생성 (특수문자 제거)
-        partner_id = partner.lower().replace("&", "n").replace("(", "").replace(")", "")
+# Drive 결과 레코드 1건 × 역할(mech/elec) 1개 = 팩트 1행
+# (역할, 협력사 필드, 비율 필드) - dict 키와 DriveResult 속성명이 같다
+NAN_FACT_ROLES = [
+    ("mech", "mech_partner", "mech_nan_ratio"),
+    ("elec", "elec_partner", "elec_nan_ratio"),
+]
+NanFact = namedtuple(
+    "NanFact",
+    [
+        "record_no",
+        "file_date",
+        "group_month",
+        "role",
+        "partner",
+        "partner_raw",
+        "ratio",
+        "total_tasks",
+        "order_no",
+        "model_name",
+        "order_href",
+    ],
+)
 
-        html += f"""
-                <div class="kpi-card {grade_class}" onclick="toggleDefectTable('{partner_id}')">
-                    <div class="emoji">{emoji}</div>
-                    <div class="label">{partner}</div>
-                    <div class="tooltip">
-                        평가점수: {weighted_score:.1f}점 ({final_grade}등급)<br>
-                        불량률: {defect_rate:.2f}%<br>
-                        불량건수: {defect_count}건<br>
-                        생산대수: {production_count}대<br>
-                        누락비율: <span onclick="event.stopPropagation(); toggleNanTable('{partner_id}')" style="color: #ffeb3b; cursor: pointer; text-decoration: underline;">{nan_ratio:.1f}%</span><br>
-                        <small>클릭하여 상세보기</small>
-                    </div>
-                </div>
-        """
 
-    html += """
-            </div>
-            <table id="defect-table-bat" class="defect-table hidden">
-                <thead>
-                    <tr>
-                        <th colspan="4">
-                            <button class="download-btn" onclick="downloadCSV('bat')">CSV 다운로드</button>
-                        </th>
-                    </tr>
-                    <tr><th>제품정보</th><th>상세불량내용</th><th>상세조치내용</th><th>발생일</th></tr>
-                </thead>
-                <tbody></tbody>
-            </table>
-            <table id="defect-table-fni" class="defect-table hidden">
-                <thead>
-                    <tr>
-                        <th colspan="4">
-                            <button class="download-btn" onclick="downloadCSV('fni')">CSV 다운로드</button>
-                        </th>
-                    </tr>
-                    <tr><th>제품정보</th><th>상세불량내용</th><th>상세조치내용</th><th>발생일</th></tr>
-                </thead>
-                <tbody></tbody>
-            </table>
-            <table id="defect-table-tmsm" class="defect-table hidden">
-                <thead>
-                    <tr>
-                        <th colspan="4">
-                            <button class="download-btn" onclick="downloadCSV('tmsm')">CSV 다운로드</button>
-                        </th>
-                    </tr>
-                    <tr><th>제품정보</th><th>상세불량내용</th><th>상세조치내용</th><th>발생일</th></tr>
-                </thead>
-                <tbody></tbody>
-            </table>
-        </div>
-        <div class="chart-section">
-            <h2 class="section-title">⚡ 전장 협력사 평가 지수</h2>
-            <div class="kpi-container">
+def _snapshot_order_key(file_date, order_no, week_of_date):
+    """스냅샷 중복 판정 키 (ISO 주차, order_no) - order_no가 없거나 날짜 형식 오류면 None"""
+    if not order_no:
+        return None
+    if file_date not in week_of_date:
+        try:
+            week_of_date[file_date] = (
+                datetime.datetime.strptime(file_date, "%Y-%m-%d").isocalendar()[1]
+            )
+        except (TypeError, ValueError):
+            week_of_date[file_date] = None
+    week = week_of_date[file_date]
+    return None if week is None else (week, order_no)
+
+
+def iter_nan_facts(json_data, counter=None):
+    """
+    Drive 결과 레코드(DriveResult 또는 dict)를 역할별 NanFact로 정규화 (스트리밍 입력 가능)
+    같은 주차·오더가 여러 스냅샷에 있으면 처음 본 레코드만 사용한다
+    (Drive 파일은 modifiedTime 내림차순이므로 최신 스냅샷, counter["duplicates"]에 제외 수 누적)
     """
+    seen_orders = set()
+    week_of_date = {}
+    for record_no, d in enumerate(json_data):
+        if isinstance(d, DriveResult):
+            try:
+                facts = [
+                    NanFact(
+                        record_no=record_no,
+                        file_date=d.source.file_date,
+                        group_month=d.source.group_month,
+                        role=role,
+                        partner=clean_partner_name(getattr(d, partner_key), mode=role),
+                        partner_raw=getattr(d, partner_key),
+                        ratio=getattr(d, ratio_key),
+                        total_tasks=d.total_tasks,
+                        order_no=d.order_no,
+                        model_name=d.model_name,
+                        order_href=d.order_href,
+                    )
+                    for role, partner_key, ratio_key in NAN_FACT_ROLES
+                ]
+            except Exception as e:
+                print(f"⚠️ 데이터 처리 중 오류: {e}")
+                continue
+            if _is_previous_snapshot(facts[0], seen_orders, week_of_date, counter):
+                continue
+            yield from facts
+            continue
 
-    for _, row in elec_df.iterrows():
-        partner = row["partner"]
-        weighted_score = row["weighted_score"]
-        final_grade = row["final_grade"]
-        defect_count = row["defect_count"]
-        defect_rate = row["defect_rate"]  # 불량률 추가
-        nan_ratio = row["nan_ratio"]
-        emoji = row["emoji"]
-        production_count = production_counts.get(partner, 0)  # 생산대수 추가
+        try:
+            ratios = d.get("ratios", {})
+            links = d.get("links", {})
+            facts = [
+                NanFact(
+                    record_no=record_no,
+                    file_date=d.get("file_date", ""),
+                    group_month=d.get("group_month"),
+                    role=role,
+                    partner=clean_partner_name(d.get(partner_key, ""), mode=role),
+                    partner_raw=d.get(partner_key, ""),
+                    ratio=_as_float(ratios.get(ratio_key, 0.0)),
+                    total_tasks=_as_int(d.get("total_tasks", 0)),
+                    order_no=d.get("order_no", ""),
+                    model_name=d.get("model_name", ""),
+                    order_href=links.get("order_href", ""),
+                )
+                for role, partner_key, ratio_key in NAN_FACT_ROLES
+            ]
+        except Exception as e:
+            print(f"⚠️ 데이터 처리 중 오류: {e}")
+            continue
+        if _is_previous_snapshot(facts[0], seen_orders, week_of_date, counter):
+            continue
+        yield from facts
+
+
+def _is_previous_snapshot(fact, seen_orders, week_of_date, counter):
+    """이미 더 최신 스냅샷으로 반영한 주차·오더의 레코드인지 (처음 보면 기록 후 False)"""
+    order_key = _snapshot_order_key(fact.file_date, fact.order_no, week_of_date)
+    if order_key is None:
+        return False
+    if order_key in seen_orders:
+        if counter is not None:
+            counter["duplicates"] += 1
+        return True
+    seen_orders.add(order_key)
+    return False
+
+
+def build_nan_fact_table(json_data, counter=None):
+    """
+    Drive 결과 레코드를 long-format NaN 팩트 테이블(DataFrame)로 변환.
+    file_date/iso_week/role/partner/ratio/total_tasks/order_no/model_name 등
+    타입이 정해진 컬럼만 유지하므로 협력사가 늘어나도 컬럼은 늘지 않는다.
+    이전 스냅샷 레코드는 iter_nan_facts()에서 제외된다.
+    """
+    facts = pd.DataFrame(
+        list(iter_nan_facts(json_data, counter)), columns=NanFact._fields
+    )
+    facts["ratio"] = facts["ratio"].astype(float)
+    facts["total_tasks"] = facts["total_tasks"].astype(int)
+    parsed_dates = pd.to_datetime(
+        facts["file_date"], format="%Y-%m-%d", errors="coerce"
+    )
+    facts["iso_week"] = parsed_dates.dt.isocalendar()["week"].astype("Int64")
+    return facts
+
+
+def average_nan_ratios(facts, key, sort=False):
+    """
+    key(file_date/group_month)별 협력사 평균 NaN 비율 (행=key, 열=NAN_PARTNERS).
+    해당 협력사가 아닌 레코드는 0.0으로 보고 key별 전체 레코드 수로 나눈다.
+    (역할, 협력사)별로 집계하고 협력사마다 NAN_PARTNER_ROLES의 역할 값만 사용한다.
+    """
+    records = facts.drop_duplicates("record_no")
+    record_counts = records.groupby(key, sort=sort).size()
+
+    partner_facts = facts[
+        facts["partner"].map(NAN_PARTNER_ROLES) == facts["role"]
+    ].assign(missing=lambda df: df["ratio"].isna())
+    grouped = (
+        partner_facts.groupby([key, "role", "partner"], sort=False)
+        .agg(ratio_sum=("ratio", "sum"), missing=("missing", "sum"))
+        .droplevel("role")
+    )
+    ratio_sums = (
+        grouped["ratio_sum"]
+        .unstack("partner")
+        .reindex(index=record_counts.index, columns=NAN_PARTNERS)
+        .fillna(0.0)
+    )
+    missing = (
+        grouped["missing"]
+        .unstack("partner")
+        .reindex(index=record_counts.index, columns=NAN_PARTNERS)
+        .fillna(0)
+    )
+    return ratio_sums.div(
+        missing.rsub(record_counts, axis=0).replace(0, np.nan), axis=0
+    )
+
+
+def _nan_details_from_averages(averages):
+    """날짜별 협력사 평균(average_nan_ratios 형식) → 주차별 NaN 디테일 + 월평균"""
+    nan_details = {partner: [] for partner in NAN_PARTNERS}
+    if averages.empty:
+        return nan_details
+
+    # 주차 정보 추출 - 고유 날짜 전체를 한 번에 ISO 주차로 변환
+    parsed_dates = pd.to_datetime(
+        pd.Series(averages.index, index=averages.index), errors="coerce"
+    )
+    iso_weeks = parsed_dates.dt.isocalendar()["week"]
+
+    for file_date in averages.index:
+        if pd.isna(parsed_dates[file_date]):
+            print(f"⚠️ 날짜 {file_date} 주차 계산 실패: 날짜 형식 오류")
+            continue
+        week = f"{int(iso_weeks[file_date])}W"
+        print(f"DEBUG: {file_date} -> {week}")
+
+        for partner, avg_ratio in zip(
+            averages.columns, averages.loc[file_date].to_numpy()
+        ):
+            nan_details[partner].append({"week": week, "ratio": round(avg_ratio, 2)})
+
+    # 월평균 계산
+    for partner in nan_details:
+        if nan_details[partner]:
+            monthly_avg = sum(item["ratio"] for item in nan_details[partner]) / len(
+                nan_details[partner]
+            )
+            nan_details[partner].append(
+                {"week": "월평균", "ratio": round(monthly_avg, 2)}
+            )
+
+    return nan_details
+
+
+def generate_nan_details(json_data):
+    """주간별 NaN 디테일 데이터 생성 (json_data 또는 build_nan_fact_table 결과)"""
+    if isinstance(json_data, pd.DataFrame):
+        facts = json_data
+    else:
+        facts = build_nan_fact_table(json_data)
+    facts = facts[facts["group_month"].notna()]
+    if facts.empty:
+        return {partner: [] for partner in NAN_PARTNERS}
+
+    # 날짜별 평균 (최초 등장 순서 유지)
+    return _nan_details_from_averages(average_nan_ratios(facts, "file_date"))
 
-        # 등급별 CSS 클래스
-        grade_class = f"grade-{final_grade.lower()}"
 
-        # 파트너 ID 생성 (특수문자 제거)
-        partner_id = partner.lower().replace("&", "n").replace("(", "").replace(")", "")
+def new_nan_ratio_totals():
+    """스트리밍 모드용 NaN 비율 누적 상태 (file_date/group_month별 레코드 수·협력사별 합계)"""
+    return {"file_date": {}, "group_month": {}, "last_record_no": None}
 
-        html += f"""
+
+def add_nan_ratio_fact(totals, fact):
+    """NaN 팩트 1건을 누적 (group_month 없는 레코드 제외, 같은 레코드는 한 번만 계수, 협력사별 역할 비율만 합산)"""
+    if fact.group_month is None:
+        return
+    new_record = fact.record_no != totals["last_record_no"]
+    totals["last_record_no"] = fact.record_no
+    for key_name in ("file_date", "group_month"):
+        key = getattr(fact, key_name)
+        entry = totals[key_name].get(key)
+        if entry is None:
+            entry = totals[key_name][key] = {
+                "records": 0,
+                "sums": dict.fromkeys(NAN_PARTNERS, 0.0),
+                "missing": dict.fromkeys(NAN_PARTNERS, 0),
+            }
+        if new_record:
+            entry["records"] += 1
+        if NAN_PARTNER_ROLES.get(fact.partner) == fact.role:
+            if math.isnan(fact.ratio):
+                entry["missing"][fact.partner] += 1
+            else:
+                entry["sums"][fact.partner] += fact.ratio
+
+
+def nan_ratio_averages_from_totals(totals, key, sort=False):
+    """누적 상태 → average_nan_ratios()와 같은 형식의 평균 DataFrame"""
+    entries = totals[key]
+    keys = sorted(entries) if sort else list(entries)
+    sums = pd.DataFrame(
+        [entries[k]["sums"] for k in keys], index=keys, columns=NAN_PARTNERS, dtype=float
+    )
+    denominators = pd.DataFrame(
+        [
+            {
+                partner: entries[k]["records"] - missing
+                for partner, missing in entries[k]["missing"].items()
+            }
+            for k in keys
+        ],
+        index=keys,
+        columns=NAN_PARTNERS,
+        dtype=float,
+    )
+    return sums / denominators.replace(0, np.nan)
+
+
+def generate_nan_details_from_totals(totals):
+    """스트리밍 누적 상태로 generate_nan_details()와 같은 주간별 NaN 디테일 생성"""
+    return _nan_details_from_averages(nan_ratio_averages_from_totals(totals, "file_date"))
+
+
+# 협력사 평가 대시보드 정적 자산 원본 (출력 시 내용 해시를 붙인 assets/ 파일로 복사 → 월이 바뀌어도 브라우저 캐시 재사용)
+KPI_ASSET_SOURCES = {"css": "css/partner_kpi.css", "js": "js/partner_kpi.js"}
+KPI_ASSET_DIR = "assets"
+# 평가 대시보드 상세 테이블 협력사 순서
+KPI_MECH_TABLE_PARTNERS = ["BAT", "FNI", "TMS(M)"]
+KPI_ELEC_TABLE_PARTNERS = ["P&S", "TMS(E)", "C&A"]
+
+KPI_CARD_TEMPLATE = """
                 <div class="kpi-card {grade_class}" onclick="toggleDefectTable('{partner_id}')">
                     <div class="emoji">{emoji}</div>
                     <div class="label">{partner}</div>
@@ -1230,138 +2400,27 @@ def generate_html(
                         <small>클릭하여 상세보기</small>
                     </div>
                 </div>
-        """
+"""
 
-    html += """
-            </div>
-            <table id="defect-table-pns" class="defect-table hidden">
-                <thead>
-                    <tr>
-                        <th colspan="4">
-                            <button class="download-btn" onclick="downloadCSV('pns')">CSV 다운로드</button>
-                        </th>
-                    </tr>
-                    <tr><th>제품정보</th><th>상세불량내용</th><th>상세조치내용</th><th>발생일</th></tr>
-                </thead>
-                <tbody></tbody>
-            </table>
-            <table id="defect-table-tmse" class="defect-table hidden">
-                <thead>
-                    <tr>
-                        <th colspan="4">
-                            <button class="download-btn" onclick="downloadCSV('tmse')">CSV 다운로드</button>
-                        </th>
-                    </tr>
-                    <tr><th>제품정보</th><th>상세불량내용</th><th>상세조치내용</th><th>발생일</th></tr>
-                </thead>
-                <tbody></tbody>
-            </table>
-            <table id="defect-table-cna" class="defect-table hidden">
+KPI_DEFECT_TABLE_TEMPLATE = """
+            <table id="defect-table-{partner_id}" class="defect-table hidden">
                 <thead>
                     <tr>
                         <th colspan="4">
-                            <button class="download-btn" onclick="downloadCSV('cna')">CSV 다운로드</button>
+                            <button class="download-btn" onclick="downloadCSV('{partner_id}')">CSV 다운로드</button>
                         </th>
                     </tr>
                     <tr><th>제품정보</th><th>상세불량내용</th><th>상세조치내용</th><th>발생일</th></tr>
                 </thead>
                 <tbody></tbody>
-            </table>
-        </div>
-        
-        <div style="margin-top: 40px;">
-            <h2 class="section-title">📊 누락률 주간별 추이</h2>
-            
-            <table id="nan-table-bat" class="nan-table hidden">
-                <thead>
-                    <tr>
-                        <th colspan="2" style="text-align: center; padding: 15px;">
-                            <strong>BAT 누락률 주간별 추이</strong>
-                        </th>
-                    </tr>
-                    <tr>
-                        <th style="width: 50%;">주차</th>
-                        <th style="width: 50%;">누락률</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    <!-- 동적으로 생성됨 -->
-                </tbody>
-            </table>
-            
-            <table id="nan-table-fni" class="nan-table hidden">
-                <thead>
-                    <tr>
-                        <th colspan="2" style="text-align: center; padding: 15px;">
-                            <strong>FNI 누락률 주간별 추이</strong>
-                        </th>
-                    </tr>
-                    <tr>
-                        <th style="width: 50%;">주차</th>
-                        <th style="width: 50%;">누락률</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    <!-- 동적으로 생성됨 -->
-                </tbody>
-            </table>
-            
-            <table id="nan-table-tmsm" class="nan-table hidden">
-                <thead>
-                    <tr>
-                        <th colspan="2" style="text-align: center; padding: 15px;">
-                            <strong>TMS(M) 누락률 주간별 추이</strong>
-                        </th>
-                    </tr>
-                    <tr>
-                        <th style="width: 50%;">주차</th>
-                        <th style="width: 50%;">누락률</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    <!-- 동적으로 생성됨 -->
-                </tbody>
-            </table>
-            
-            <table id="nan-table-pns" class="nan-table hidden">
-                <thead>
-                    <tr>
-                        <th colspan="2" style="text-align: center; padding: 15px;">
-                            <strong>P&S 누락률 주간별 추이</strong>
-                        </th>
-                    </tr>
-                    <tr>
-                        <th style="width: 50%;">주차</th>
-                        <th style="width: 50%;">누락률</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    <!-- 동적으로 생성됨 -->
-                </tbody>
-            </table>
-            
-            <table id="nan-table-tmse" class="nan-table hidden">
-                <thead>
-                    <tr>
-                        <th colspan="2" style="text-align: center; padding: 15px;">
-                            <strong>TMS(E) 누락률 주간별 추이</strong>
-                        </th>
-                    </tr>
-                    <tr>
-                        <th style="width: 50%;">주차</th>
-                        <th style="width: 50%;">누락률</th>
-                    </tr>
-                </thead>
-                <tbody>
-                    <!-- 동적으로 생성됨 -->
-                </tbody>
-            </table>
-            
-            <table id="nan-table-cna" class="nan-table hidden">
+            </table>"""
+
+KPI_NAN_TABLE_TEMPLATE = """
+            <table id="nan-table-{partner_id}" class="nan-table hidden">
                 <thead>
                     <tr>
                         <th colspan="2" style="text-align: center; padding: 15px;">
-                            <strong>C&A 누락률 주간별 추이</strong>
+                            <strong>{partner} 누락률 주간별 추이</strong>
                         </th>
                     </tr>
                     <tr>
@@ -1373,6 +2432,121 @@ def generate_html(
                     <!-- 동적으로 생성됨 -->
                 </tbody>
             </table>
+            """
+
+# $로 시작하는 자리표시자: 자산/테이블은 최초 1회, 월/카드/데이터는 호출마다 채움
+KPI_PAGE_TEMPLATE = """
+    <!DOCTYPE html>
+    <html lang="ko">
+    <head>
+        <meta charset="UTF-8">
+        <meta name="viewport" content="width=device-width, initial-scale=1.0">
+        <title>협력사 평가 대시보드 - $month</title>
+        <link rel="stylesheet" href="$css_href">
+        <script>window.KPI_DATA = $kpi_data;</script>
+        <script src="$js_src" defer></script>
+    </head>
+    <body>
+        <div style="text-align: center; margin: 20px 0;">
+            <div class="main-title">
+                <h1 style="color: #333; margin-bottom: 10px;">🏭 협력사 평가 대시보드</h1>
+                <div class="main-title-tooltip">
+                    <div class="tooltip-section">
+                        <h4>🎯 평가 목적</h4>
+                        <p>① 기구·전장 협력사의 품질 수준을 불량률과 데이터 완성성(누락 비율)으로 객관적으로 평가</p>
+                        <p>② 생산량 배경·인센티브·개선 과제 부여 기준 마련</p>
+                    </div>
+                    
+                    <div class="tooltip-section">
+                        <h4>📊 평가 지표</h4>
+                        <table class="tooltip-table">
+                            <tr>
+                                <th>지표</th>
+                                <th>정의</th>
+                                <th>가중치</th>
+                                <th>등급 구간</th>
+                            </tr>
+                            <tr>
+                                <td><strong>불량률</strong></td>
+                                <td>(월간 불량 건수 ÷ 월간 생산대수) ×100</td>
+                                <td><strong style="color: #d32f2f;">70%</strong></td>
+                                <td>
+                                    <div class="tooltip-grade-detail">
+                                        <strong>기구:</strong> A(&lt;6.0%) B(6.0~16.5%) C(16.5~27.6%) D(≥27.6%)<br>
+                                        <strong>전장:</strong> A(&lt;1.0%) B(1.0~3.6%) C(3.6~6.2%) D(6.2~7.5%) E(≥7.5%)
+                                    </div>
+                                </td>
+                            </tr>
+                            <tr>
+                                <td><strong>NaN 비율</strong></td>
+                                <td>(누락 건수 ÷ 전체 대상 건수) ×100</td>
+                                <td><strong style="color: #1976d2;">30%</strong></td>
+                                <td>
+                                    <div class="tooltip-grade-detail">
+                                        A(&lt;1%) B(&lt;3%) C(&lt;6%) D(≥6%)
+                                    </div>
+                                </td>
+                            </tr>
+                        </table>
+                    </div>
+                    
+                    <div class="tooltip-section">
+                        <h4>🏭 생산대수 카운팅 기준</h4>
+                        <p><strong>기본 원칙:</strong> Chamber 수 기준 카운트</p>
+                        <table class="tooltip-table">
+                            <tr>
+                                <th>구분</th>
+                                <th>카운팅 방식</th>
+                                <th>예시</th>
+                            </tr>
+                            <tr>
+                                <td><strong>일반 제품</strong></td>
+                                <td>1 Chamber = 1대</td>
+                                <td>GAIA-I = 1대</td>
+                            </tr>
+                            <tr>
+                                <td><strong>DUAL 제품</strong></td>
+                                <td>2 Chamber = 2대</td>
+                                <td>GAIA-I DUAL = 2대</td>
+                            </tr>
+                            <tr>
+                                <td><strong>TMS(M)</strong></td>
+                                <td>직접 작업 + 반제품 기여</td>
+                                <td>DRAGON 직접작업 + 모든 제품 반제품 도킹</td>
+                            </tr>
+                        </table>
+                    </div>
+                    
+                    <div class="tooltip-section">
+                        <h4>📈 최종 평가점수 계산</h4>
+                        <p><strong>최종점수 = (불량률 점수 × 70%) + (NaN 비율 점수 × 30%)</strong></p>
+                        <p style="color: #666; font-size: 12px;">
+                            • 기구/전장 협력사별로 분리하여 순위 산정<br>
+                            • 동점시 불량률이 낮은 협력사가 상위 순위
+                        </p>
+                    </div>
+                </div>
+            </div>
+            <p style="color: #666; font-size: 16px;">기준월: $month</p>
+        </div>
+        <div class="chart-section">
+            <h2 class="section-title">🔧 기구 협력사 평가 지수</h2>
+            <div class="kpi-container">
+$mech_cards
+            </div>
+$mech_defect_tables
+        </div>
+        <div class="chart-section">
+            <h2 class="section-title">⚡ 전장 협력사 평가 지수</h2>
+            <div class="kpi-container">
+$elec_cards
+            </div>
+$elec_defect_tables
+        </div>
+        
+        <div style="margin-top: 40px;">
+            <h2 class="section-title">📊 누락률 주간별 추이</h2>
+            $nan_tables
         </div>
         
         <div style="text-align: center; margin: 40px 0; color: #666; font-size: 14px;">
@@ -1383,27 +2557,162 @@ def generate_html(
     </body>
     </html>
     """
-    return html
 
 
-def print_kpi_grades(start_month=SELECTED_MONTH):
-    """협력사 KPI 등급 출력 (불량률 기반)"""
-    print(f"=== 협력사 KPI 분석 시작 ({start_month}) - 불량률 기반 ===")
+def kpi_partner_id(partner):
+    """협력사명 → HTML 요소 ID용 키 (특수문자 제거, 예: TMS(M) → tmsm, C&A → cna)"""
+    return partner.lower().replace("&", "n").replace("(", "").replace(")", "")
+
+
+@lru_cache(maxsize=None)
+def kpi_asset_files():
+    """정적 자산 원본 → {종류: (버전 파일명, 내용 바이트)} (파일명에 내용 sha256 앞 10자리, 프로세스당 1회 로드)"""
+    base_dir = os.path.dirname(os.path.abspath(__file__))
+    assets = {}
+    for kind, source in KPI_ASSET_SOURCES.items():
+        with open(os.path.join(base_dir, source), "rb") as f:
+            content = f.read()
+        stem = os.path.splitext(os.path.basename(source))[0]
+        version = hashlib.sha256(content).hexdigest()[:10]
+        assets[kind] = (f"{stem}.{version}.{kind}", content)
+    return assets
+
+
+def write_kpi_assets(output_dir="."):
+    """
+    버전 자산 파일을 output_dir/assets에 저장 (같은 버전 파일이 있으면 건너뜀)
+    → [(로컬 경로, HTML 기준 상대 경로)]
+    """
+    asset_dir = os.path.join(output_dir, KPI_ASSET_DIR)
+    os.makedirs(asset_dir, exist_ok=True)
+    written = []
+    for name, content in kpi_asset_files().values():
+        path = os.path.join(asset_dir, name)
+        if not os.path.exists(path):
+            tmp_path = f"{path}.{os.getpid()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(content)
+            os.replace(tmp_path, path)
+        written.append((path, f"{KPI_ASSET_DIR}/{name}"))
+    return written
+
+
+@lru_cache(maxsize=None)
+def _kpi_page_template():
+    """월과 무관한 HTML 틀(자산 경로, 상세 테이블)을 한 번만 채워 string.Template으로 컴파일"""
+    assets = kpi_asset_files()
+    defect_tables = lambda partners: "".join(
+        KPI_DEFECT_TABLE_TEMPLATE.format(partner_id=kpi_partner_id(partner))
+        for partner in partners
+    )
+    nan_tables = "".join(
+        KPI_NAN_TABLE_TEMPLATE.format(partner=partner, partner_id=kpi_partner_id(partner))
+        for partner in KPI_MECH_TABLE_PARTNERS + KPI_ELEC_TABLE_PARTNERS
+    )
+    page = Template(KPI_PAGE_TEMPLATE).safe_substitute(
+        css_href=f"{KPI_ASSET_DIR}/{assets['css'][0]}",
+        js_src=f"{KPI_ASSET_DIR}/{assets['js'][0]}",
+        mech_defect_tables=defect_tables(KPI_MECH_TABLE_PARTNERS),
+        elec_defect_tables=defect_tables(KPI_ELEC_TABLE_PARTNERS),
+        nan_tables=nan_tables,
+    )
+    return Template(page)
+
+
+def _kpi_cards(df, production_counts):
+    """등급 DataFrame → 협력사 KPI 카드 HTML"""
+    return "".join(
+        KPI_CARD_TEMPLATE.format(
+            grade_class=f"grade-{row['final_grade'].lower()}",
+            partner_id=kpi_partner_id(row["partner"]),
+            production_count=production_counts.get(row["partner"], 0),
+            **row,
+        )
+        for row in df.to_dict("records")
+    )
+
+
+def generate_html(
+    mech_df, elec_df, month, defect_details, nan_details=None, production_counts=None
+):
+    """
+    현대 대시보드 형식 HTML 생성 (기구/전장 그룹 분리, 클릭 이벤트 추가, 불량률 기반)
+    CSS/JS는 write_kpi_assets()로 저장하는 버전 자산 파일을 참조하고, HTML에는 월별 데이터만 포함
+    """
+    production_counts = production_counts or {}
+    kpi_data = json.dumps(
+        {"defectDetails": defect_details, "nanDetails": nan_details or {}},
+        ensure_ascii=False,
+    ).replace("</", "<\\/")  # 데이터 속 "</script>"가 스크립트 태그를 닫지 않도록
+    return _kpi_page_template().substitute(
+        month=month,
+        kpi_data=kpi_data,
+        mech_cards=_kpi_cards(mech_df, production_counts),
+        elec_cards=_kpi_cards(elec_df, production_counts),
+    )
+
+
+def kpi_input_digest(
+    start_month, sheets_snapshot, refresh_listing=True, drive_fingerprint=None
+):
+    """
+    협력사 KPI 대시보드 입력 다이제스트 (시트 스냅샷 해시, Drive 대상 파일, 기준값, 코드/자산, 배포 대상·방식·함께 게시할 데이터 파일)
+    drive_fingerprint: 이미 구한 drive_input_fingerprint() 결과 (없으면 여기서 조회)
+    """
+    if drive_fingerprint is None:
+        drive_fingerprint = drive_input_fingerprint(
+            start_month, refresh_listing=refresh_listing
+        )
+    return input_digest(
+        {
+            "month": start_month,
+            "sheets": [
+                frame_digest(sheets_snapshot.defect_df),
+                frame_digest(sheets_snapshot.production_df),
+            ],
+            "drive": drive_fingerprint,
+            "thresholds": DEFECT_RATE_THRESHOLDS,
+            "code": source_fingerprint("partner_kpi.py", *KPI_ASSET_SOURCES.values()),
+            "publish": [
+                TEST_MODE,
+                f"{GITHUB_USERNAME_1}/{GITHUB_REPO_1}@{GITHUB_BRANCH_1}:{HTML_FILENAME_1}",
+                f"{GITHUB_USERNAME_2}/{GITHUB_REPO_2}@{GITHUB_BRANCH_2}:{HTML_FILENAME_2}",
+                GITHUB_PUBLISH_MODE,
+                publish_data_fingerprint(),
+            ],
+        }
+    )
+
+
+# print_kpi_grades() 단계별 집계 결과
+KpiDefectStats = namedtuple(
+    "KpiDefectStats",
+    [
+        "production_counts",
+        "partner_counts",
+        "partner_defect_rates",
+        "formatted_defect_details",
+    ],
+)
+KpiNanStats = namedtuple("KpiNanStats", ["nan_details", "df_monthly"])
+
 
+def kpi_defect_stats(sheets_snapshot, start_month):
+    """시트 스냅샷 → 협력사별 생산대수/불량 건수/불량률/불량 상세 (로드 실패 시 None)"""
     # 1. 생산대수 데이터 로드
-    production_df = load_production_data()
+    production_df = load_production_data(sheets_snapshot)
     if production_df is None:
         print("❌ 생산대수 데이터를 로드할 수 없습니다.")
-        return
+        return None
 
     production_counts = calculate_production_counts(production_df, start_month)
     print(f"✅ 생산대수 데이터 로드 완료")
 
     # 2. 불량 데이터 로드
-    df_defect = load_sheets_data()
+    df_defect = load_sheets_data(sheets_snapshot)
     if df_defect is None:
         print("❌ 불량 데이터를 로드할 수 없습니다.")
-        return
+        return None
 
     # 컬럼명 확인
     print(f"DEBUG: 사용 가능한 컬럼명: {list(df_defect.columns)}")
@@ -1420,7 +2729,7 @@ def print_kpi_grades(start_month=SELECTED_MONTH):
         print(
             f"❌ 날짜 컬럼을 찾을 수 없습니다. 사용 가능한 컬럼: {list(df_defect.columns)}"
         )
-        return
+        return None
 
     print(f"DEBUG: 날짜 컬럼으로 '{date_col}' 사용")
 
@@ -1437,25 +2746,26 @@ def print_kpi_grades(start_month=SELECTED_MONTH):
     # 협력사별 불량률 계산을 위한 딕셔너리
     partner_defect_rates = {}
 
-    for _, row in df_filtered.iterrows():
-        partner = get_partner_for_row(row)
-        if partner != "미기재":
-            partner_counts[partner] += 1
-            defect_details[partner].append(
-                {
-                    "date": row[date_col].strftime("%Y-%m-%d"),
-                    "category": f"{row.get('대분류', '')}/{row.get('중분류', '')}",
-                    "description": row.get("상세불량내용", ""),
-                    "productInfo": f"{row.get('제품S/N', '')}/{row.get('제품명', '')}",
-                    "defect": row.get("상세불량내용", ""),
-                    "action": row.get("상세조치내용", ""),
-                    "occurDate": (
-                        row.get("발생일", "").strftime("%Y-%m-%d")
-                        if pd.notna(row.get("발생일", ""))
-                        else ""
-                    ),
-                }
-            )
+    df_filtered = df_filtered.assign(partner=assign_partners(df_filtered))
+    df_attributed = df_filtered[df_filtered["partner"] != "미기재"]
+    for row in df_attributed.to_dict("records"):
+        partner = row["partner"]
+        partner_counts[partner] += 1
+        defect_details[partner].append(
+            {
+                "date": row[date_col].strftime("%Y-%m-%d"),
+                "category": f"{row.get('대분류', '')}/{row.get('중분류', '')}",
+                "description": row.get("상세불량내용", ""),
+                "productInfo": f"{row.get('제품S/N', '')}/{row.get('제품명', '')}",
+                "defect": row.get("상세불량내용", ""),
+                "action": row.get("상세조치내용", ""),
+                "occurDate": (
+                    row.get("발생일", "").strftime("%Y-%m-%d")
+                    if pd.notna(row.get("발생일", ""))
+                    else ""
+                ),
+            }
+        )
 
     # 3. 협력사별 불량률 계산
     all_partners = ["BAT", "FNI", "TMS(M)", "P&S", "TMS(E)", "C&A"]
@@ -1490,89 +2800,163 @@ def print_kpi_grades(start_month=SELECTED_MONTH):
         )
     print("-" * 40)
 
-    # JSON 데이터 로드
-    json_data = load_json_files_from_drive(year_month=start_month)
-    if not json_data:
+    return KpiDefectStats(
+        production_counts,
+        partner_counts,
+        partner_defect_rates,
+        formatted_defect_details,
+    )
+
+
+def kpi_nan_stats(start_month, streaming, refresh_listing=True):
+    """Drive 결과 → NaN 디테일과 월별 협력사 평균 NaN 비율 (데이터가 없으면 None)"""
+    if streaming:
+        # 스트리밍 모드: 레코드를 하나씩 누적해 월 전체 목록/팩트 테이블을 만들지 않음
+        records = iter_drive_results(start_month, refresh_listing=refresh_listing)
+    else:
+        # JSON 데이터 로드
+        records = load_json_files_from_drive(
+            year_month=start_month, refresh_listing=refresh_listing
+        )
+    nan_stats = nan_stats_from_records(records, streaming)
+    if nan_stats is None:
         print(f"⚠️ {start_month} 데이터가 없습니다.")
-        return
+    return nan_stats
+
+
+def nan_stats_from_records(records, streaming=False):
+    """Drive 결과 레코드 → KpiNanStats (create_final_data와 같은 팩트 경로, 데이터가 없으면 None)"""
+    if streaming:
+        nan_totals = new_nan_ratio_totals()
+        for fact in iter_nan_facts(records):
+            add_nan_ratio_fact(nan_totals, fact)
+        if not nan_totals["group_month"]:
+            return None
+
+        nan_details = generate_nan_details_from_totals(nan_totals)
+        print(f"📊 NaN 디테일 데이터 생성 완료: {len(nan_details)} 협력사")
+        df_monthly = nan_ratio_averages_from_totals(nan_totals, "group_month", sort=True)
+        return KpiNanStats(nan_details, df_monthly)
+
+    if not records:
+        return None
+
+    # Drive 결과를 NaN 팩트 테이블로 한 번만 정규화
+    nan_facts = build_nan_fact_table(records)
 
     # NaN 디테일 데이터 생성
-    nan_details = generate_nan_details(json_data)
+    nan_details = generate_nan_details(nan_facts)
     print(f"📊 NaN 디테일 데이터 생성 완료: {len(nan_details)} 협력사")
 
-    # 주간별 데이터를 먼저 정리 (중복 제거)
-    # JSON 데이터 처리 (원래 단순 로직으로 복원)
-    all_nan_data = []
-    for d in json_data:
+    # 월별 협력사 평균 NaN 비율
+    monthly_facts = nan_facts[nan_facts["group_month"].notna()]
+    if monthly_facts.empty:
+        return None
+
+    df_monthly = average_nan_ratios(monthly_facts, "group_month", sort=True)
+    return KpiNanStats(nan_details, df_monthly)
+
+
+def _kpi_sheets_stage(start_month, snapshot_ready, build_decision):
+    """
+    Sheets 스냅샷 로드 → snapshot_ready로 전달(다이제스트용) → 빌드가 결정되면 불량/생산대수 집계 (생략 시 None)
+    로드 실패는 snapshot_ready와 이 단계의 결과로 그대로 전파 (다른 경로로 다시 로드하지 않음)
+    """
+    try:
+        sheets_snapshot = get_sheets_snapshot(refresh=True)
+        if sheets_snapshot is None:
+            raise RuntimeError("Google Sheets 스냅샷 로드 실패")
+    except Exception as e:
+        snapshot_ready.set_exception(e)
+        raise
+    snapshot_ready.set_result(sheets_snapshot)
+    if not build_decision.result():
+        return None
+    return kpi_defect_stats(sheets_snapshot, start_month)
+
+
+def _kpi_drive_stage(start_month, streaming, fingerprint_ready, build_decision):
+    """Drive 목록 갱신·대상 파일 지문 → fingerprint_ready로 전달(다이제스트용) → 빌드가 결정되면 NaN 집계 (생략 시 None)"""
+    try:
+        fingerprint_ready.set_result(drive_input_fingerprint(start_month))
+        refresh_listing = False  # Drive 목록은 방금 받았으므로 로드 시 카탈로그 사용
+    except Exception as e:
+        fingerprint_ready.set_exception(e)
+        refresh_listing = True
+    # 입력 변경 여부가 정해진 뒤에만 Drive 결과를 내려받음 (변경 없으면 바로 종료)
+    if not build_decision.result():
+        return None
+    return kpi_nan_stats(start_month, streaming, refresh_listing)
+
+
+def _kpi_stage_digest(start_month, snapshot_ready, fingerprint_ready):
+    """두 단계가 넘겨준 시트 스냅샷·Drive 지문으로 입력 다이제스트 (Sheets 단계 오류는 전파, 그 밖의 실패는 None)"""
+    sheets_snapshot = snapshot_ready.result()
+    try:
+        return kpi_input_digest(
+            start_month,
+            sheets_snapshot,
+            drive_fingerprint=fingerprint_ready.result(),
+        )
+    except Exception as e:
+        print(f"⚠️ 입력 다이제스트 계산 실패, 캐시 없이 빌드합니다: {e}")
+        return None
+
+
+def print_kpi_grades(start_month=SELECTED_MONTH, streaming=None, force=False):
+    """
+    협력사 KPI 등급 출력 (불량률 기반, streaming=True면 Drive 결과를 스트리밍 집계)
+    Sheets 스냅샷과 Drive 목록을 동시에 가져와 입력 다이제스트를 확인한 뒤, 불량 집계와 Drive 결과 로드/NaN 집계를 동시에 진행
+    입력 다이제스트가 마지막 성공 빌드와 같으면 Drive 결과를 받지 않고 집계/HTML 생성/업로드를 건너뜀 (force=True면 항상 빌드)
+    """
+    print(f"=== 협력사 KPI 분석 시작 ({start_month}) - 불량률 기반 ===")
+    html_file = "partner_kpi.html"
+    if streaming is None:
+        streaming = DRIVE_STREAMING
+
+    snapshot_ready, fingerprint_ready, build_decision = Future(), Future(), Future()
+    # 빌드 캐시를 쓰지 않으면 기다릴 결정이 없으므로 두 단계가 곧바로 집계까지 진행
+    if not BUILD_CACHE or force:
+        build_decision.set_result(True)
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # 불량/생산대수 시트(한 번에 로드해 실행 전체에서 공유)와 Drive 결과를 각 단계가 가져와 집계
+        defect_future = executor.submit(
+            _kpi_sheets_stage, start_month, snapshot_ready, build_decision
+        )
+        nan_future = executor.submit(
+            _kpi_drive_stage, start_month, streaming, fingerprint_ready, build_decision
+        )
+
+        build = False
         try:
-            ratios = d.get("ratios", {})
-            mech_partner_clean = clean_partner_name(
-                d.get("mech_partner", ""), mode="mech"
-            )
-            elec_partner_clean = clean_partner_name(
-                d.get("elec_partner", ""), mode="elec"
+            digest = _kpi_stage_digest(start_month, snapshot_ready, fingerprint_ready)
+            build = (
+                build_decision.done()
+                or not digest
+                or read_build_digest(html_file) != digest
             )
+        finally:
+            # 빌드 여부 확정: 기다리던 단계가 집계를 시작하거나, 변경 없음/오류면 바로 종료
+            if not build_decision.done():
+                build_decision.set_result(build)
 
-            entry = {
-                "group_month": d["group_month"],
-                "mech_partner": mech_partner_clean,
-                "elec_partner": elec_partner_clean,
-                "bat_nan_ratio": (
-                    ratios.get("mech_nan_ratio", 0.0)
-                    if mech_partner_clean == "BAT"
-                    else 0.0
-                ),
-                "fni_nan_ratio": (
-                    ratios.get("mech_nan_ratio", 0.0)
-                    if mech_partner_clean == "FNI"
-                    else 0.0
-                ),
-                "tms_m_nan_ratio": (
-                    ratios.get("mech_nan_ratio", 0.0)
-                    if mech_partner_clean == "TMS(M)"
-                    else 0.0
-                ),
-                "cna_nan_ratio": (
-                    ratios.get("elec_nan_ratio", 0.0)
-                    if elec_partner_clean == "C&A"
-                    else 0.0
-                ),
-                "pns_nan_ratio": (
-                    ratios.get("elec_nan_ratio", 0.0)
-                    if elec_partner_clean == "P&S"
-                    else 0.0
-                ),
-                "tms_e_nan_ratio": (
-                    ratios.get("elec_nan_ratio", 0.0)
-                    if elec_partner_clean == "TMS(E)"
-                    else 0.0
-                ),
-            }
-            all_nan_data.append(entry)
-        except Exception as e:
-            print(f"⚠️ JSON 데이터 항목 처리 실패: {str(e)}")
-            continue
+    if not build:
+        print(f"⏭️ 입력 변경 없음 - 집계/HTML 생성/업로드 건너뜀 ({digest[:12]})")
+        return
 
-    if not all_nan_data:
-        print("⚠️ JSON 데이터가 없습니다.")
+    defect_stats = defect_future.result()
+    if defect_stats is None:
+        return
+    nan_stats = nan_future.result()
+    if nan_stats is None:
         return
 
-    df_nan = pd.DataFrame(all_nan_data)
-    df_nan["date"] = pd.to_datetime(df_nan["group_month"])
-    df_nan.set_index("date", inplace=True)
-    df_monthly = df_nan.groupby("group_month").mean(numeric_only=True)
-
-    partner_columns = [
-        ("bat_nan_ratio", "BAT"),
-        ("fni_nan_ratio", "FNI"),
-        ("tms_m_nan_ratio", "TMS(M)"),
-        ("cna_nan_ratio", "C&A"),
-        ("pns_nan_ratio", "P&S"),
-        ("tms_e_nan_ratio", "TMS(E)"),
-    ]
-    df_monthly = df_monthly[[col[0] for col in partner_columns]].rename(
-        columns={col[0]: col[1] for col in partner_columns}
-    )
+    production_counts = defect_stats.production_counts
+    partner_counts = defect_stats.partner_counts
+    partner_defect_rates = defect_stats.partner_defect_rates
+    formatted_defect_details = defect_stats.formatted_defect_details
+    nan_details, df_monthly = nan_stats
 
     results = []
     for month, row in df_monthly.iterrows():
@@ -1642,38 +3026,33 @@ def print_kpi_grades(start_month=SELECTED_MONTH):
         nan_details,
         production_counts,
     )
-    html_file = "partner_kpi.html"
     with open(html_file, "w", encoding="utf-8") as f:
         f.write(html_content)
-    print(f"✅ HTML 파일 생성 완료: {html_file}")
+    asset_files = write_kpi_assets(os.path.dirname(os.path.abspath(html_file)))
+    print(f"✅ HTML 파일 생성 완료: {html_file} (자산 {len(asset_files)}개)")
 
     if not TEST_MODE:
         print("GitHub 업로드 프로세스 시작")
-        # 첫 번째 저장소 업로드
-        repo_name_1 = f"{GITHUB_USERNAME_1}/{GITHUB_REPO_1}"
-        github_url_1 = upload_to_github(
-            html_file, repo_name_1, GITHUB_BRANCH_1, HTML_FILENAME_1, GITHUB_TOKEN_1
-        )
-        if github_url_1:
-            iframe_tag = (
-                f'<iframe src="{github_url_1}" width="800" height="600"></iframe>'
-            )
-            print(f"\n대시보드용 iframe 태그 (GST_Factory_Dashboard):")
-            print(iframe_tag)
-        # 두 번째 저장소 업로드
-        repo_name_2 = f"{GITHUB_USERNAME_2}/{GITHUB_REPO_2}"
-        github_url_2 = upload_to_github(
-            html_file, repo_name_2, GITHUB_BRANCH_2, HTML_FILENAME_2, GITHUB_TOKEN_2
+        # 대상 저장소들에 동시에 게시 (contents: 자산 → HTML 순서 / tree: 저장소당 단일 커밋)
+        github_urls = publish_kpi_dashboard(
+            html_file, asset_files + publish_data_files()
         )
-        if github_url_2:
-            iframe_tag = (
-                f'<iframe src="{github_url_2}" width="800" height="600"></iframe>'
-            )
-            print(f"\n대시보드용 iframe 태그 (gst-factory):")
-            print(iframe_tag)
+        for name, github_url in github_urls.items():
+            if github_url:
+                iframe_tag = (
+                    f'<iframe src="{github_url}" width="800" height="600"></iframe>'
+                )
+                print(f"\n대시보드용 iframe 태그 ({name}):")
+                print(iframe_tag)
         print("GitHub 업로드 프로세스 완료")
+        published = all(github_urls.values())
     else:
         print("🟡 TEST_MODE=True: GitHub 업로드 건너뛰기, 로컬 저장만 수행")
+        published = True
+
+    # 모든 업로드가 성공한 경우에만 기록 (실패하면 다음 실행에서 다시 빌드/업로드)
+    if digest and published:
+        write_build_digest(html_file, digest)
 
     print("\n📊 월별 협력사 KPI 등급 (기구 협력사) - 불량률 기준")
     print("협력사    NaN 비율(%)  NaN 등급  불량률(%)  불량 등급  최종 등급  평가 점수")
@@ -1739,10 +3118,10 @@ def test_defect_rate_calculation(test_month=SELECTED_MONTH):
 
     # 3. 협력사별 불량 건수 계산
     partner_defect_counts = defaultdict(int)
-    for _, row in df_filtered.iterrows():
-        partner = get_partner_for_row(row)
-        if partner != "미기재":
-            partner_defect_counts[partner] += 1
+    partners = assign_partners(df_filtered)
+    partner_defect_counts.update(
+        partners[partners != "미기재"].value_counts(sort=False).to_dict()
+    )
 
     # 4. 불량률 계산 및 등급 부여
     print(f"\n📊 {test_month} 불량률 분석 결과:")
@@ -1810,6 +3189,197 @@ def test_production_data_loading(test_month=SELECTED_MONTH):
     return True
 
 
+def _reference_production_counts(production_df, target_month):
+    """calculate_production_counts() 기준 구현 (벡터화 이전 행 단위 로직, 테스트 비교용)"""
+    counts = {"BAT": 0, "FNI": 0, "TMS(M)": 0, "P&S": 0, "C&A": 0, "TMS(E)": 0}
+    dates = pd.to_datetime(production_df["공정검사일"], errors="coerce")
+    production_df = production_df[
+        dates.notna() & (dates.dt.strftime("%Y-%m") == target_month)
+    ]
+    for _, row in production_df.iterrows():
+        product_name = str(row.get("제품명", "")).strip()
+        if not product_name:
+            continue
+        count = 2 if "DUAL" in product_name.upper() else 1
+        mech_partner = clean_partner_name(str(row.get("협력사(기구)명", "")), "mech")
+        elec_partner = clean_partner_name(str(row.get("협력사(전장)명", "")), "elec")
+        if mech_partner in counts:
+            counts[mech_partner] += count
+        if elec_partner in counts:
+            counts[elec_partner] += count
+        semi_partner = clean_partner_name(str(row.get("협력사(반제품)명", "")), "semi")
+        if semi_partner == "TMS(M)":
+            counts["TMS(M)"] += count
+    return counts
+
+
+def _partner_attribution_fixture():
+    """협력사 판별 규칙의 분기를 모두 지나는 메모리 DataFrame (불량, 생산대수)"""
+    import itertools
+
+    mech_names = ["주식회사 비에이티", " 에프앤아이(FnI) ", "(주)티엠에스이엔지", "기타기구", ""]
+    elec_names = ["(주)티엠에스이엔지", "피엔에스 시스템", "(주)씨앤에이시스템", "기타전장", ""]
+    defect_df = pd.DataFrame(
+        [
+            {
+                "작업자": action,
+                "대분류": major,
+                "중분류": minor,
+                "협력사(기구)명": mech,
+                "협력사(전장)명": elec,
+            }
+            for action, major, minor, mech, elec in itertools.product(
+                ["", "  ", "BAT 홍길동", "FNI", "TMS 김철수", "P&S/C&A", "C&A", "기타"],
+                ["작업불량", "기구작업불량", "전장작업불량", "부품불량", "설계불량", ""],
+                ["기구", "전장 배선", "기구/전장", "기타"],
+                mech_names,
+                elec_names,
+            )
+        ]
+    )
+    production_df = pd.DataFrame(
+        [
+            {
+                "제품명": product,
+                "협력사(기구)명": mech,
+                "협력사(전장)명": elec,
+                "협력사(반제품)명": semi,
+                "공정검사일": date,
+            }
+            for product, mech, elec, semi, date in itertools.product(
+                ["GAIA-I", "GAIA-I DUAL", "dragon dual", " ", ""],
+                mech_names,
+                elec_names,
+                ["(주)티엠에스이엔지", "주식회사 비에이티", ""],
+                ["2025-08-04", "2025-07-31", "날짜 오류"],
+            )
+        ]
+    )
+    return defect_df, production_df
+
+
+def test_partner_attribution(live=False):
+    """
+    assign_partners()/calculate_production_counts()와 행 단위 기준 구현의 결과 일치 여부 테스트
+    메모리 fixture로 항상 비교하고, live=True면 실제 불량 시트로도 비교 (Sheets 자격 증명 필요)
+    """
+    print("🧪 협력사 판별 일치 테스트 시작")
+    print("=" * 60)
+
+    defect_df, production_df = _partner_attribution_fixture()
+    frames = [("fixture", defect_df)]
+    if live:
+        live_df = load_sheets_data()
+        if live_df is None:
+            print("❌ 불량 데이터 로드 실패")
+            return False
+        frames.append(("불량 시트", live_df))
+
+    ok = True
+    for name, df in frames:
+        expected = [get_partner_for_row(row) for _, row in df.iterrows()]
+        actual = assign_partners(df).tolist()
+        mismatches = [
+            (i, e, a) for i, (e, a) in enumerate(zip(expected, actual)) if e != a
+        ]
+        if mismatches:
+            print(f"❌ [{name}] 불일치 {len(mismatches)}건 / 전체 {len(expected)}건")
+            for i, e, a in mismatches[:10]:
+                print(f"  행 {i}: 기존={e}, 벡터화={a}")
+            ok = False
+        else:
+            print(f"✅ [{name}] 협력사 판별 전체 {len(expected)}건 일치")
+
+    expected_counts = _reference_production_counts(production_df, "2025-08")
+    actual_counts = calculate_production_counts(production_df, "2025-08")
+    if actual_counts != expected_counts:
+        print(f"❌ [fixture] 생산대수 불일치: 기존={expected_counts}, 벡터화={actual_counts}")
+        ok = False
+    else:
+        print(f"✅ [fixture] 생산대수 일치: {actual_counts}")
+    return ok
+
+
+def test_nan_ratio_roles():
+    """기구/전장 역할 필드에 같은 협력사명이 있어도 협력사별 역할 비율만 평균하는지 테스트 (두 모드)"""
+    print("🧪 역할별 NaN 비율 테스트 시작")
+    print("=" * 60)
+
+    def record(order_no, mech_partner, mech_ratio, elec_ratio):
+        return {
+            "order_no": order_no,
+            "mech_partner": mech_partner,
+            "elec_partner": "(주)씨앤에이시스템",
+            "total_tasks": 100,
+            "ratios": {"mech_nan_ratio": mech_ratio, "elec_nan_ratio": elec_ratio},
+            "file_date": "2025-08-17",
+            "group_month": "2025-08",
+        }
+
+    # 두 번째 레코드는 기구 협력사 필드에 "C&A"가 들어 있음 → C&A의 기구 비율 90%는 제외
+    records = [
+        record("A", "주식회사 비에이티", 10.0, 20.0),
+        record("B", "C&A", 90.0, 40.0),
+    ]
+    expected = {"BAT": 5.0, "C&A": 30.0}
+    ok = True
+    for streaming in (False, True):
+        nan_stats = nan_stats_from_records(iter(records), streaming=streaming)
+        monthly = nan_stats.df_monthly.loc["2025-08"]
+        weekly = {
+            partner: nan_stats.nan_details[partner][0]["ratio"] for partner in expected
+        }
+        checks = {
+            "월별 비율": {p: round(float(monthly[p]), 2) for p in expected} == expected,
+            "주차별 비율": weekly == expected,
+        }
+        for name, passed in checks.items():
+            print(f"  {'✅' if passed else '❌'} [streaming={streaming}] {name}")
+        ok = ok and all(checks.values())
+    return ok
+
+
+def test_iter_json_array_items():
+    """청크 스트리밍 파서가 json.loads와 같은 결과를 내고, 잘리거나 덧붙은 파일은 오류로 처리하는지 테스트"""
+    print("🧪 JSON 스트리밍 파서 테스트 시작")
+    print("=" * 60)
+
+    content = json.dumps(
+        {
+            "meta": {"note": "결과 파일"},
+            "results": [{"order_no": f"O{i}", "ratio": i * 1.5} for i in range(20)],
+            "tail": [1, 2],
+        },
+        ensure_ascii=False,
+    ).encode("utf-8")
+
+    def parse(data, size):
+        return list(
+            iter_json_array_items(data[i : i + size] for i in range(0, len(data), size))
+        )
+
+    def fails(data):
+        try:
+            parse(data, 7)
+        except (ValueError, KeyError):
+            return True
+        return False
+
+    expected = json.loads(content)["results"]
+    checks = {
+        "청크 크기와 무관하게 json.loads와 동일": all(
+            parse(content, size) == expected for size in (1, 7, 64, len(content))
+        ),
+        "배열 중간에서 잘린 파일 오류": fails(content[: len(content) // 2]),
+        "닫는 '}' 없이 잘린 파일 오류": fails(content[:-1]),
+        "객체 뒤 추가 데이터 오류": fails(content + b" x"),
+        "results 키 없음 오류": fails(b'{"other": []}'),
+    }
+    for name, passed in checks.items():
+        print(f"  {'✅' if passed else '❌'} {name}")
+    return all(checks.values())
+
+
 if __name__ == "__main__":
     print(f"TEST_MODE 상태: {TEST_MODE}")
 
@@ -0,0 +1,187 @@
+"""partner_kpi GitHub 게시 테스트 (PyGithub 대신 로컬 대체 객체 사용, 네트워크 없음)"""
+
+import base64
+import gzip
+from types import SimpleNamespace
+
+import pytest
+from github import RateLimitExceededException, UnknownObjectException
+
+import partner_kpi
+from partner_kpi import GithubTarget, git_blob_sha, publish_kpi_dashboard
+
+
+class TreeElement:
+    """InputGitTreeElement 대체: publish 코드가 넘긴 인자를 그대로 보관"""
+
+    def __init__(self, path, mode, type, content=None, sha=None):
+        self.path = path
+        self.mode = mode
+        self.type = type
+        self.content = content
+        self.sha = sha
+
+
+class FakeRepo:
+    """Contents API + Git Data API 로컬 대체 (커밋/트리 SHA = 파일 스냅샷 해시)"""
+
+    def __init__(self, files, rate_limited_calls=0):
+        self.files = files
+        self.rate_limited_calls = rate_limited_calls
+        self.writes = []
+        self.snapshots = {}
+        self.blobs = {}
+
+    def get_contents(self, path, ref=None):
+        if self.rate_limited_calls:
+            self.rate_limited_calls -= 1
+            raise RateLimitExceededException(
+                403, {"message": "API rate limit exceeded"}, {"Retry-After": "0"}
+            )
+        if path not in self.files:
+            raise UnknownObjectException(404, {"message": "Not Found"}, {})
+        return SimpleNamespace(path=path, sha=git_blob_sha(self.files[path]))
+
+    def create_file(self, path, message, content, branch=None):
+        self.files[path] = content
+        self.writes.append(("create", path))
+
+    def update_file(self, path, message, content, sha, branch=None):
+        assert sha == git_blob_sha(self.files[path]), "원격 SHA 불일치"
+        self.files[path] = content
+        self.writes.append(("update", path))
+
+    def _snapshot(self, files):
+        sha = git_blob_sha(repr(sorted(files.items())).encode())
+        self.snapshots[sha] = dict(files)
+        return sha
+
+    def get_git_ref(self, ref):
+        head_sha = self._snapshot(self.files)
+        return SimpleNamespace(object=SimpleNamespace(sha=head_sha), edit=self._edit_ref)
+
+    def get_git_commit(self, sha):
+        return SimpleNamespace(sha=sha, tree=SimpleNamespace(sha=sha))
+
+    def get_git_tree(self, sha, recursive=False):
+        return SimpleNamespace(
+            tree=[
+                SimpleNamespace(path=path, sha=git_blob_sha(content), type="blob")
+                for path, content in self.snapshots[sha].items()
+            ]
+        )
+
+    def create_git_blob(self, content, encoding):
+        data = base64.b64decode(content)
+        self.blobs[git_blob_sha(data)] = data
+        return SimpleNamespace(sha=git_blob_sha(data))
+
+    def create_git_tree(self, elements, base_tree):
+        files = dict(self.snapshots[base_tree.sha])
+        for element in elements:
+            if element.content is not None:
+                files[element.path] = element.content.encode("utf-8")
+            else:
+                files[element.path] = self.blobs[element.sha]
+        return SimpleNamespace(sha=self._snapshot(files))
+
+    def create_git_commit(self, message, tree, parents):
+        return SimpleNamespace(sha=tree.sha)
+
+    def _edit_ref(self, sha):
+        self.files = self.snapshots[sha]
+        self.writes.append(("commit", sorted(self.files)))
+
+
+class FakeGithub:
+    def __init__(self, repos):
+        self.repos = repos
+
+    def get_repo(self, name):
+        return self.repos[name]
+
+
+HTML = b"<html>kpi</html>"
+
+
+@pytest.fixture
+def site(tmp_path):
+    """HTML 1개 + CSS 자산 1개"""
+    html_file = tmp_path / "partner_kpi.html"
+    html_file.write_bytes(HTML)
+    asset_file = tmp_path / "partner_kpi.css"
+    asset_file.write_bytes(b"body{}")
+    return str(html_file), [(str(asset_file), "assets/partner_kpi.css")]
+
+
+def test_contents_mode_skips_creates_and_updates(site):
+    html_file, asset_files = site
+    repos = {
+        # 자산·HTML 모두 최신 → 업로드 없음
+        "a/same": FakeRepo({"kpi/assets/partner_kpi.css": b"body{}", "kpi/index.html": HTML}),
+        # 파일 없음(404) → 생성, 첫 조회는 rate limit → 재시도
+        "b/new": FakeRepo({}, rate_limited_calls=1),
+        # HTML 내용 변경 → 업데이트
+        "c/changed": FakeRepo({"assets/partner_kpi.css": b"body{}", "index.html": b"old"}),
+    }
+    targets = [
+        GithubTarget("same", "a/same", "main", "kpi/index.html", None),
+        GithubTarget("new", "b/new", "main", "index.html", None),
+        GithubTarget("changed", "c/changed", "main", "index.html", None),
+    ]
+
+    urls = publish_kpi_dashboard(
+        html_file,
+        asset_files,
+        targets=targets,
+        client_factory=lambda token: FakeGithub(repos),
+    )
+
+    assert list(urls) == ["same", "new", "changed"] and all(urls.values())
+    assert repos["a/same"].writes == []
+    assert repos["b/new"].writes == [
+        ("create", "assets/partner_kpi.css"),
+        ("create", "index.html"),
+    ]
+    assert repos["c/changed"].writes == [("update", "index.html")]
+
+
+def test_tree_mode_single_commit(site, tmp_path, monkeypatch):
+    html_file, asset_files = site
+    monkeypatch.setattr(partner_kpi, "InputGitTreeElement", TreeElement)
+    data_file = tmp_path / "index.json"
+    data_file.write_bytes(b'{"months": []}')
+    gz_content = gzip.compress(b'{"months": []}', mtime=0)
+    gz_file = tmp_path / "index.json.gz"
+    gz_file.write_bytes(gz_content)
+    files = asset_files + [
+        (str(data_file), "data/index.json"),
+        (str(gz_file), "data/index.json.gz"),
+    ]
+    repos = {"d/tree": FakeRepo({"assets/partner_kpi.css": b"body{}"})}
+    targets = [GithubTarget("tree", "d/tree", "main", "index.html", None)]
+
+    # 바뀐 HTML·데이터(.gz는 blob)가 커밋 1개로, 두 번째 실행은 변경 없음 → 커밋 없음
+    for _ in range(2):
+        urls = publish_kpi_dashboard(
+            html_file,
+            files,
+            targets=targets,
+            client_factory=lambda token: FakeGithub(repos),
+            mode="tree",
+        )
+        assert urls["tree"]
+
+    repo = repos["d/tree"]
+    assert repo.writes == [
+        (
+            "commit",
+            ["assets/partner_kpi.css", "data/index.json", "data/index.json.gz", "index.html"],
+        )
+    ]
+    assert repo.files["data/index.json.gz"] == gz_content
+    assert repo.files["index.html"] == HTML
+
+
+def test_git_blob_sha():
+    assert git_blob_sha(b"") == "e69de29bb2d1d6434b8b29ae775ad8c2e48c5391"